@@ -0,0 +1,477 @@
+"""
+Serviço HTTP de verificação de boletos
+
+Expõe o cadastro de contas de referência, a verificação (individual e em lote)
+e a listagem de contas para outros sistemas internos, sem depender do Streamlit.
+
+Endpoints (JSON, arquivos PDF, PNG ou JPEG em base64):
+    GET  /saude                 -> {"status": "ok", "modelos": {modelo: estatísticas}}
+    GET  /contas                -> {"contas": [...]}
+    POST /contas                -> {"apelido_conta", "boletos": [{"nome_arquivo", "conteudo_base64"}]}
+    POST /verificacoes          -> {"apelido_conta", "conteudo_base64"}
+    POST /verificacoes/lote     -> {"apelido_conta", "boletos": [{"nome_arquivo", "conteudo_base64"}]}
+    POST /verificacoes/carne    -> {"apelido_conta", "conteudo_base64"} (um boleto por página/região)
+
+Tenant: header "X-Tenant" ou parâmetro "?tenant=". Cada tenant tem contas e
+ledger próprios (ver app.tenants); sem tenant, usa o storage e o ledger do
+servidor. Um tenant só passa a existir no primeiro cadastro de conta (POST
+/contas); nas demais rotas, um tenant desconhecido responde 404.
+
+Autenticação: header "Authorization: Bearer <token>". API_TOKEN dá acesso à
+partição do servidor; cada token de API_TOKENS_TENANTS, apenas aos seus
+tenants. Sem nenhum token configurado, a API é aberta.
+
+Uso:
+    python -m app.api
+"""
+
+import base64
+import binascii
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from app.ledger import LedgerVerificacoes, ledger
+from app.perfilamento import perfilar
+from app.roteamento import roteador
+from app.storage import ContaReferenciaStorage, storage
+from app.tenants import (
+    TenantNaoEncontrado,
+    obter_ledger,
+    obter_storage,
+    validar_tenant,
+)
+from app.verificacao import (
+    ERRO_CONTA_EXISTENTE,
+    ERRO_CONTA_NAO_ENCONTRADA,
+    ERRO_DADOS_INVALIDOS,
+    cadastrar_conta_referencia,
+    verificar_boleto,
+    verificar_carne,
+)
+from config.settings import (
+    API_HOST,
+    API_MAX_CONCORRENCIA,
+    API_MAX_CORPO_MB,
+    API_MAX_LOTE,
+    API_PORTA,
+    API_TIMEOUT_FILA,
+    API_TOKEN,
+    API_TOKENS_TENANTS,
+    GEMINI_MAX_CONEXOES,
+)
+
+# Status HTTP para cada código de erro dos fluxos de cadastro/verificação
+STATUS_POR_ERRO = {
+    ERRO_DADOS_INVALIDOS: HTTPStatus.BAD_REQUEST,
+    ERRO_CONTA_EXISTENTE: HTTPStatus.CONFLICT,
+    ERRO_CONTA_NAO_ENCONTRADA: HTTPStatus.NOT_FOUND,
+}
+
+
+class RequisicaoInvalida(Exception):
+    """Corpo da requisição ausente ou malformado"""
+
+
+class AcessoNegado(Exception):
+    """O token da requisição não dá acesso à partição pedida"""
+
+
+def _decodificar_arquivos(boletos: List[Dict]) -> List[Tuple[bytes, str]]:
+    """Converte [{"nome_arquivo", "conteudo_base64"}] em [(bytes, nome_arquivo)]"""
+    if not isinstance(boletos, list):
+        raise RequisicaoInvalida("'boletos' deve ser uma lista")
+
+    arquivos = []
+    for i, boleto in enumerate(boletos):
+        if not isinstance(boleto, dict):
+            raise RequisicaoInvalida(f"boletos[{i}] deve ser um objeto")
+        arquivos.append(
+            (
+                _decodificar_base64(boleto.get("conteudo_base64"), f"boletos[{i}]"),
+                boleto.get("nome_arquivo") or f"boleto_{i + 1}.pdf",
+            )
+        )
+    return arquivos
+
+
+def _decodificar_base64(conteudo: Optional[str], campo: str) -> bytes:
+    """Decodifica um arquivo em base64"""
+    if not conteudo:
+        raise RequisicaoInvalida(f"{campo}: 'conteudo_base64' é obrigatório")
+    try:
+        return base64.b64decode(conteudo, validate=True)
+    except (binascii.Error, ValueError):
+        raise RequisicaoInvalida(f"{campo}: 'conteudo_base64' inválido")
+
+
+class ServidorVerificacao(ThreadingHTTPServer):
+    """
+    Servidor HTTP multi-thread com controle de carga
+
+    Cada requisição roda em sua própria thread, mas no máximo `max_concorrencia`
+    processam ao mesmo tempo. Quando o servidor está saturado, novas requisições
+    esperam até `timeout_fila` segundos por uma vaga e, se não houver, recebem
+    503 com Retry-After em vez de acumular filas ilimitadas.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        endereco: Tuple[str, int],
+        storage_contas: ContaReferenciaStorage = storage,
+        ledger_verificacoes: LedgerVerificacoes = ledger,
+        max_concorrencia: int = API_MAX_CONCORRENCIA,
+        timeout_fila: float = API_TIMEOUT_FILA,
+        max_lote: int = API_MAX_LOTE,
+        max_corpo: int = API_MAX_CORPO_MB * 1024 * 1024,
+        token: Optional[str] = API_TOKEN,
+        tokens_tenants: Dict[str, List[str]] = API_TOKENS_TENANTS,
+    ):
+        super().__init__(endereco, ManipuladorVerificacao)
+        self.storage_contas = storage_contas
+        self.ledger_verificacoes = ledger_verificacoes
+        self.timeout_fila = timeout_fila
+        self.max_lote = max_lote
+        self.max_corpo = max_corpo
+        self.token = token
+        self.tokens_tenants = tokens_tenants
+        self.vagas = threading.BoundedSemaphore(max_concorrencia)
+        # Executor compartilhado pelos lotes, do tamanho do pool de conexões Gemini
+        self.executor_lote = ThreadPoolExecutor(
+            max_workers=GEMINI_MAX_CONEXOES, thread_name_prefix="lote"
+        )
+
+    def server_close(self):
+        super().server_close()
+        self.executor_lote.shutdown(wait=False, cancel_futures=True)
+
+
+class ManipuladorVerificacao(BaseHTTPRequestHandler):
+    """Roteia as requisições HTTP para os fluxos de cadastro e verificação"""
+
+    server: ServidorVerificacao
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._despachar(
+            {
+                "/saude": self._saude,
+                "/contas": self._listar_contas,
+            },
+            controlar_carga=False,
+        )
+
+    def do_POST(self):
+        self._despachar(
+            {
+                "/contas": self._cadastrar_conta,
+                "/verificacoes": self._verificar,
+                "/verificacoes/lote": self._verificar_lote,
+                "/verificacoes/carne": self._verificar_carne,
+            },
+            controlar_carga=True,
+        )
+
+    def _despachar(self, rotas: Dict, controlar_carga: bool):
+        # O corpo é lido antes de qualquer resposta: numa conexão keep-alive,
+        # bytes deixados no socket seriam lidos como a próxima requisição
+        if not self._ler_corpo():
+            return
+
+        rota = rotas.get(self.path.split("?", 1)[0].rstrip("/") or "/")
+        if rota is None:
+            self._responder(HTTPStatus.NOT_FOUND, {"erro": "Rota não encontrada"})
+            return
+
+        if not self._autenticar():
+            self._responder(HTTPStatus.UNAUTHORIZED, {"erro": "Token inválido"})
+            return
+
+        if controlar_carga and not self.server.vagas.acquire(
+            timeout=self.server.timeout_fila
+        ):
+            self._responder(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"erro": "Servidor saturado, tente novamente em instantes"},
+                cabecalhos={"Retry-After": "1"},
+            )
+            return
+
+        try:
+            status, corpo = rota()
+            self._responder(status, corpo)
+        except RequisicaoInvalida as e:
+            self._responder(HTTPStatus.BAD_REQUEST, {"erro": str(e)})
+        except AcessoNegado as e:
+            self._responder(HTTPStatus.FORBIDDEN, {"erro": str(e)})
+        except TenantNaoEncontrado as e:
+            self._responder(
+                HTTPStatus.NOT_FOUND, {"erro": f"Tenant '{e}' não encontrado"}
+            )
+        except Exception as e:
+            print(f"Erro ao processar requisição {self.command} {self.path}: {e}")
+            self._responder(
+                HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": "Erro interno do servidor"}
+            )
+        finally:
+            if controlar_carga:
+                self.server.vagas.release()
+
+    def _autenticacao_ativa(self) -> bool:
+        return bool(self.server.token or self.server.tokens_tenants)
+
+    def _autenticar(self) -> bool:
+        """
+        Guarda em self._token o token Bearer da requisição
+
+        Returns:
+            bool: False se a API exige token e o enviado não é conhecido
+        """
+        autorizacao = self.headers.get("Authorization") or ""
+        prefixo = "Bearer "
+        self._token = (
+            autorizacao[len(prefixo) :] if autorizacao.startswith(prefixo) else None
+        )
+        if not self._autenticacao_ativa():
+            return True
+        return self._token is not None and (
+            self._token == self.server.token
+            or self._token in self.server.tokens_tenants
+        )
+
+    def _ler_corpo(self) -> bool:
+        """
+        Lê o corpo inteiro da requisição para self._corpo
+
+        Returns:
+            bool: False se o corpo foi recusado (a resposta já foi enviada e a
+                conexão será fechada, pois o corpo não foi consumido)
+        """
+        self._corpo = b""
+        if self.headers.get("Transfer-Encoding"):
+            return self._recusar_corpo(
+                HTTPStatus.LENGTH_REQUIRED, "Envie o corpo com Content-Length"
+            )
+        try:
+            tamanho = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0:
+            return self._recusar_corpo(
+                HTTPStatus.BAD_REQUEST, "Content-Length inválido"
+            )
+        if tamanho > self.server.max_corpo:
+            return self._recusar_corpo(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                f"Corpo excede o limite de {self.server.max_corpo} bytes",
+            )
+        if tamanho:
+            self._corpo = self.rfile.read(tamanho)
+        return True
+
+    def _recusar_corpo(self, status: int, erro: str) -> bool:
+        self.close_connection = True
+        self._responder(status, {"erro": erro}, cabecalhos={"Connection": "close"})
+        return False
+
+    def _ler_json(self) -> Dict:
+        if not self._corpo:
+            raise RequisicaoInvalida("Corpo da requisição vazio")
+        try:
+            corpo = json.loads(self._corpo)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise RequisicaoInvalida("Corpo da requisição não é um JSON válido")
+        if not isinstance(corpo, dict):
+            raise RequisicaoInvalida("Corpo da requisição deve ser um objeto JSON")
+        return corpo
+
+    def _responder(
+        self, status: int, corpo: Dict, cabecalhos: Optional[Dict[str, str]] = None
+    ):
+        conteudo = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(conteudo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def _tenant(self) -> Optional[str]:
+        """
+        Tenant da requisição (header X-Tenant ou ?tenant=), validado e autorizado
+
+        A autorização vem antes da existência: um token sem acesso recebe 403
+        tanto para tenants existentes quanto para desconhecidos.
+
+        Returns:
+            str ou None: Nome do tenant, ou None para a partição do servidor
+
+        Raises:
+            RequisicaoInvalida: Se o nome do tenant é inválido
+            AcessoNegado: Se o token não dá acesso à partição pedida
+        """
+        tenant = self.headers.get("X-Tenant")
+        if tenant is None:
+            parametros = parse_qs(urlsplit(self.path).query)
+            tenant = parametros.get("tenant", [None])[0]
+        if tenant is not None:
+            try:
+                validar_tenant(tenant)
+            except ValueError as e:
+                raise RequisicaoInvalida(str(e))
+
+        if not self._autenticacao_ativa():
+            return tenant
+        if tenant is None:
+            if self._token != self.server.token:
+                raise AcessoNegado(
+                    "Token sem acesso à partição do servidor: informe o tenant"
+                )
+            return None
+
+        permitidos = self.server.tokens_tenants.get(self._token, [])
+        if tenant not in permitidos and "*" not in permitidos:
+            raise AcessoNegado(f"Token sem acesso ao tenant '{tenant}'")
+        return tenant
+
+    def _particao(self) -> Tuple[ContaReferenciaStorage, LedgerVerificacoes]:
+        """Storage e ledger do tenant da requisição (existente)"""
+        tenant = self._tenant()
+        if tenant is None:
+            return self.server.storage_contas, self.server.ledger_verificacoes
+        return obter_storage(tenant), obter_ledger(tenant)
+
+    def _resposta_fluxo(self, resultado: Dict, sucesso: bool, status_sucesso: int):
+        if sucesso:
+            return status_sucesso, resultado
+        status = STATUS_POR_ERRO.get(
+            resultado.get("codigo_erro"), HTTPStatus.UNPROCESSABLE_ENTITY
+        )
+        return status, resultado
+
+    # Rotas
+
+    def _saude(self):
+        return HTTPStatus.OK, {
+            "status": "ok",
+            "modelos": roteador.obter_estatisticas(),
+        }
+
+    def _listar_contas(self):
+        storage_contas, _ = self._particao()
+        return HTTPStatus.OK, {"contas": storage_contas.listar_contas_referencia()}
+
+    def _cadastrar_conta(self):
+        # Único fluxo que aceita um tenant novo: a partição nasce com a conta
+        tenant = self._tenant()
+        storage_contas = (
+            self.server.storage_contas
+            if tenant is None
+            else obter_storage(tenant, criar=True)
+        )
+        corpo = self._ler_json()
+        resultado, sucesso = cadastrar_conta_referencia(
+            corpo.get("apelido_conta"),
+            _decodificar_arquivos(corpo.get("boletos")),
+            storage_contas=storage_contas,
+        )
+        return self._resposta_fluxo(resultado, sucesso, HTTPStatus.CREATED)
+
+    def _verificar(self):
+        storage_contas, ledger_verificacoes = self._particao()
+        corpo = self._ler_json()
+        resultado, sucesso = verificar_boleto(
+            corpo.get("apelido_conta"),
+            _decodificar_base64(corpo.get("conteudo_base64"), "boleto"),
+            storage_contas=storage_contas,
+            ledger_verificacoes=ledger_verificacoes,
+        )
+        return self._resposta_fluxo(resultado, sucesso, HTTPStatus.OK)
+
+    def _verificar_lote(self):
+        storage_contas, ledger_verificacoes = self._particao()
+        corpo = self._ler_json()
+        apelido_conta = corpo.get("apelido_conta")
+        arquivos = _decodificar_arquivos(corpo.get("boletos"))
+
+        if not arquivos:
+            raise RequisicaoInvalida("'boletos' não pode ser vazio")
+        if len(arquivos) > self.server.max_lote:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {
+                "erro": f"Lote excede o limite de {self.server.max_lote} boletos"
+            }
+        if not storage_contas.conta_existe(apelido_conta):
+            return HTTPStatus.NOT_FOUND, {
+                "codigo_erro": ERRO_CONTA_NAO_ENCONTRADA,
+                "erro": f"Boletos de referência não encontrados para '{apelido_conta}'",
+            }
+
+        with perfilar("lote"):
+            futuros = [
+                self.server.executor_lote.submit(
+                    verificar_boleto,
+                    apelido_conta,
+                    arquivo_bytes,
+                    storage_contas=storage_contas,
+                    ledger_verificacoes=ledger_verificacoes,
+                )
+                for arquivo_bytes, _ in arquivos
+            ]
+
+            verificacoes = []
+            for (_, nome_arquivo), futuro in zip(arquivos, futuros):
+                resultado, sucesso = futuro.result()
+                verificacoes.append(
+                    {"nome_arquivo": nome_arquivo, "sucesso": sucesso, **resultado}
+                )
+        return HTTPStatus.OK, {"verificacoes": verificacoes}
+
+    def _verificar_carne(self):
+        storage_contas, ledger_verificacoes = self._particao()
+        corpo = self._ler_json()
+        with perfilar("carne"):
+            resultado, sucesso = verificar_carne(
+                corpo.get("apelido_conta"),
+                _decodificar_base64(corpo.get("conteudo_base64"), "carnê"),
+                storage_contas=storage_contas,
+                ledger_verificacoes=ledger_verificacoes,
+            )
+        return self._resposta_fluxo(resultado, sucesso, HTTPStatus.OK)
+
+    def log_message(self, format, *args):
+        print(f"[api] {self.address_string()} - {format % args}")
+
+
+def criar_servidor(
+    host: str = API_HOST, porta: int = API_PORTA, **kwargs
+) -> ServidorVerificacao:
+    """
+    Cria o servidor HTTP de verificação
+
+    Args:
+        host: Endereço de escuta
+        porta: Porta de escuta (0 escolhe uma porta livre)
+        **kwargs: Repassados para ServidorVerificacao (storage, ledger, limites)
+
+    Returns:
+        ServidorVerificacao: Servidor pronto para serve_forever()
+    """
+    return ServidorVerificacao((host, porta), **kwargs)
+
+
+if __name__ == "__main__":
+    servidor = criar_servidor()
+    print(f"ValidaJá! API ouvindo em http://{API_HOST}:{servidor.server_port}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -0,0 +1,209 @@
+import io
+from typing import Dict, List, Tuple
+
+import pypdfium2
+from PIL import Image
+
+from app.pdf_local import (
+    PADRAO_LINHA_ARRECADACAO,
+    PADRAO_LINHA_BANCARIA,
+    detectar_tipo_arquivo,
+    encontrar_linhas_digitaveis,
+    lock_pdfium,
+)
+from app.preprocessamento import reduzir_imagem
+from app.validacao import linha_digitavel_valida, somente_digitos
+from config.settings import PREPROCESSAMENTO_DPI
+
+# Distância (pt) acima da linha digitável onde começa cada boleto de uma página
+# com vários (cabeçalho com logotipo e código do banco)
+MARGEM_ACIMA_LINHA = 30
+
+
+def _ler_pagina(pagina: pypdfium2.PdfPage) -> Tuple[str, List[Tuple[float, str]]]:
+    """
+    Texto de uma página e suas linhas digitáveis válidas, com a posição
+    vertical de cada uma
+
+    A mesma linha costuma aparecer duas vezes no boleto (recibo do pagador e
+    ficha de compensação); vale a primeira ocorrência.
+
+    Returns:
+        Tuple[str, List[Tuple[float, str]]]: (texto, [(topo, linha)]), com o
+        topo em pt a partir do alto da página, em ordem de cima para baixo
+    """
+    altura = pagina.get_height()
+    texto_pagina = pagina.get_textpage()
+    try:
+        texto = texto_pagina.get_text_range()
+        posicoes = {}
+        for padrao in (PADRAO_LINHA_BANCARIA, PADRAO_LINHA_ARRECADACAO):
+            for encontrada in padrao.finditer(texto):
+                linha = somente_digitos(encontrada.group())
+                if linha_digitavel_valida(linha):
+                    # Caixa do primeiro caractere, em coordenadas do PDF (origem
+                    # no canto inferior esquerdo): (esquerda, base, direita, topo)
+                    caixa = texto_pagina.get_charbox(encontrada.start())
+                    topo = altura - caixa[3]
+                    posicoes[linha] = min(posicoes.get(linha, topo), topo)
+    finally:
+        texto_pagina.close()
+    return texto, sorted((topo, linha) for linha, topo in posicoes.items())
+
+
+def _recortar_regioes(
+    pagina: pypdfium2.PdfPage, linhas: List[Tuple[float, str]]
+) -> List[Image.Image]:
+    """Recorta uma página com vários boletos em uma imagem por boleto"""
+    altura = pagina.get_height()
+    regioes = []
+    for indice, (topo, _) in enumerate(linhas):
+        inicio = 0 if indice == 0 else max(topo - MARGEM_ACIMA_LINHA, 0)
+        fim = (
+            min(linhas[indice + 1][0] - MARGEM_ACIMA_LINHA, altura)
+            if indice + 1 < len(linhas)
+            else altura
+        )
+        # crop: quanto cortar de cada lado (esquerda, baixo, direita, cima), em pt
+        recorte = pagina.render(
+            scale=PREPROCESSAMENTO_DPI / 72, crop=(0, altura - fim, 0, inicio)
+        )
+        regioes.append(recorte.to_pil())
+    return regioes
+
+
+def _separar_pagina(documento: pypdfium2.PdfDocument, indice: int) -> bytes:
+    """Copia uma página para um PDF próprio, preservando a camada de texto"""
+    novo_documento = pypdfium2.PdfDocument.new()
+    try:
+        novo_documento.import_pages(documento, [indice])
+        saida = io.BytesIO()
+        novo_documento.save(saida)
+        return saida.getvalue()
+    finally:
+        novo_documento.close()
+
+
+def _dividir_pdf(arquivo_bytes: bytes) -> List[Dict]:
+    """
+    Localiza os boletos de um PDF, lendo cada página uma única vez (chamar com
+    lock_pdfium)
+
+    Regiões de páginas com vários boletos voltam como imagens ainda não
+    reduzidas.
+    """
+    documento = pypdfium2.PdfDocument(arquivo_bytes)
+    try:
+        paginas = list(documento)
+        leituras = [_ler_pagina(pagina) for pagina in paginas]
+
+        # Digitalização (nenhuma página com texto): sem linhas para localizar os
+        # boletos, cada página é tratada como um boleto
+        if len(paginas) > 1 and not any(texto.strip() for texto, _ in leituras):
+            return [
+                {
+                    "pagina": indice + 1,
+                    "regiao": None,
+                    "arquivo_bytes": _separar_pagina(documento, indice),
+                    "linhas_digitaveis": [],
+                }
+                for indice in range(len(paginas))
+            ]
+
+        linhas_distintas = {linha for _, linhas in leituras for _, linha in linhas}
+        if len(linhas_distintas) <= 1:
+            texto = "\n".join(texto for texto, _ in leituras)
+            return [
+                {
+                    "pagina": 1,
+                    "regiao": None,
+                    "arquivo_bytes": arquivo_bytes,
+                    "linhas_digitaveis": encontrar_linhas_digitaveis(texto),
+                }
+            ]
+
+        partes = []
+        for indice, (pagina, (_, linhas)) in enumerate(zip(paginas, leituras)):
+            # Páginas inteiras são copiadas como PDF, sem perder o texto
+            if len(linhas) == 1:
+                partes.append(
+                    {
+                        "pagina": indice + 1,
+                        "regiao": None,
+                        "arquivo_bytes": _separar_pagina(documento, indice),
+                        "linhas_digitaveis": [linhas[0][1]],
+                    }
+                )
+            elif len(linhas) > 1:
+                for regiao, (imagem, (_, linha)) in enumerate(
+                    zip(_recortar_regioes(pagina, linhas), linhas)
+                ):
+                    partes.append(
+                        {
+                            "pagina": indice + 1,
+                            "regiao": regiao + 1,
+                            "arquivo_bytes": imagem,
+                            "linhas_digitaveis": [linha],
+                        }
+                    )
+        return partes
+    finally:
+        documento.close()
+
+
+def dividir_carne(arquivo_bytes: bytes) -> List[Dict]:
+    """
+    Divide um carnê (vários boletos em um único PDF) em um arquivo por boleto
+
+    Os boletos são localizados pelas linhas digitáveis válidas de cada página.
+    Páginas com um boleto viram PDFs de uma página; páginas com vários
+    boletos são recortadas em uma imagem por boleto. Páginas sem linha
+    digitável (capa, instruções) são descartadas. PDFs sem texto com várias
+    páginas (digitalizações) são divididos em uma página por boleto. Arquivos
+    com um único boleto e imagens seguem inteiros.
+
+    As linhas digitáveis lidas aqui acompanham cada parte, para que a
+    verificação não precise ler o PDF de novo.
+
+    Args:
+        arquivo_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+
+    Returns:
+        List[Dict]: Partes {"pagina", "regiao", "arquivo_bytes",
+        "linhas_digitaveis"}, onde "regiao" é a posição do boleto na página
+        (1, 2, ...) ou None se ocupa a página, e "linhas_digitaveis" é None
+        quando o arquivo não foi lido (imagens)
+    """
+    arquivo_inteiro = [
+        {
+            "pagina": 1,
+            "regiao": None,
+            "arquivo_bytes": arquivo_bytes,
+            "linhas_digitaveis": None,
+        }
+    ]
+    if detectar_tipo_arquivo(arquivo_bytes) != "pdf":
+        return arquivo_inteiro
+
+    try:
+        with lock_pdfium:
+            partes = _dividir_pdf(arquivo_bytes)
+
+        # A redução das regiões só usa o Pillow: roda fora do lock
+        for parte in partes:
+            if isinstance(parte["arquivo_bytes"], Image.Image):
+                parte["arquivo_bytes"] = reduzir_imagem(
+                    parte["arquivo_bytes"], PREPROCESSAMENTO_DPI
+                )
+        return partes
+
+    except Exception as e:
+        print(f"Aviso: não foi possível dividir o carnê, usando o arquivo inteiro: {e}")
+        return arquivo_inteiro
+
+
+def descrever_parte(nome_arquivo: str, parte: Dict) -> str:
+    """Nome de exibição de uma parte do carnê (ex: "carne.pdf (p. 3, boleto 2)")"""
+    if parte["regiao"] is not None:
+        return f"{nome_arquivo} (p. {parte['pagina']}, boleto {parte['regiao']})"
+    return f"{nome_arquivo} (p. {parte['pagina']})"
@@ -0,0 +1,183 @@
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from config.settings import CONSENSO_FREQUENCIA_MINIMA
+
+# Campos que devem coincidir com as referências: (rótulo, ponto suspeito)
+CAMPOS_ESSENCIAIS = {
+    "nome_beneficiario": ("Nome do beneficiário", "Nome do beneficiário não confere"),
+    "documento_beneficiario": (
+        "Documento do beneficiário",
+        "CNPJ/CPF do beneficiário não confere",
+    ),
+    "codigo_banco_emissor": ("Banco emissor", "Banco emissor não confere"),
+    "agencia_codigo_cedente": (
+        "Agência/cedente",
+        "Agência/código cedente não confere",
+    ),
+}
+# Campos essenciais comparados apenas quando presentes (nem todo boleto os traz)
+CAMPOS_OPCIONAIS = {"agencia_codigo_cedente"}
+
+# Perfis de consenso: (escopo, apelido) -> ((data_criacao, total_referencias), perfil)
+_cache_perfis = {}
+_lock_perfis = threading.Lock()
+
+
+def normalizar_dados_comparacao(boleto: Dict) -> Dict:
+    """
+    Normaliza dados do boleto focando nos campos essenciais para comparação
+    """
+    return {
+        # Campos essenciais que devem ser idênticos (campos opcionais podem vir None)
+        "nome_beneficiario": (boleto.get("nome_beneficiario") or "").strip().upper(),
+        "documento_beneficiario": (boleto.get("documento_beneficiario") or "")
+        .replace(".", "")
+        .replace("/", "")
+        .replace("-", "")
+        .strip(),
+        "codigo_banco_emissor": (boleto.get("codigo_banco_emissor") or "")
+        .replace("-", "")
+        .strip(),
+        "agencia_codigo_cedente": (boleto.get("agencia_codigo_cedente") or "").strip(),
+        "endereco_beneficiario": (boleto.get("endereco_beneficiario") or "")
+        .strip()
+        .upper(),
+        # Campos que podem variar (para contexto)
+        "valor_documento": boleto.get("valor_documento"),
+        "nosso_numero": boleto.get("nosso_numero"),
+        "linha_digitavel": boleto.get("linha_digitavel"),
+        "data_vencimento": boleto.get("data_vencimento"),
+    }
+
+
+def padrao_nosso_numero(nosso_numero: str) -> str:
+    """Formato do nosso número, com os dígitos trocados por '#'"""
+    return re.sub(r"\d", "#", nosso_numero)
+
+
+def construir_perfil_conta(boletos_referencia: List[Dict]) -> Dict:
+    """
+    Constrói as tabelas de frequência dos campos essenciais de uma conta
+
+    Todas as referências contam igualmente, sem depender da ordem de envio.
+
+    Args:
+        boletos_referencia: Lista de boletos originais da mesma conta
+
+    Returns:
+        Dict: {"total_referencias", "frequencias", "exemplos", "padroes_nosso_numero"}
+    """
+    frequencias = {campo: Counter() for campo in CAMPOS_ESSENCIAIS}
+    exemplos = {campo: {} for campo in CAMPOS_ESSENCIAIS}
+    padroes_nosso_numero = Counter()
+
+    for boleto in boletos_referencia:
+        normalizado = normalizar_dados_comparacao(boleto)
+        for campo in CAMPOS_ESSENCIAIS:
+            valor = normalizado[campo]
+            if not valor and campo in CAMPOS_OPCIONAIS:
+                continue
+            frequencias[campo][valor] += 1
+            exemplos[campo].setdefault(valor, boleto.get(campo))
+        if boleto.get("nosso_numero"):
+            padroes_nosso_numero[padrao_nosso_numero(boleto["nosso_numero"])] += 1
+
+    return {
+        "total_referencias": len(boletos_referencia),
+        "frequencias": frequencias,
+        "exemplos": exemplos,
+        "padroes_nosso_numero": padroes_nosso_numero,
+    }
+
+
+def obter_perfil_conta(apelido_conta: str, conta: Dict, escopo: str = "") -> Dict:
+    """
+    Retorna o perfil de consenso da conta, construído uma única vez
+
+    O perfil é reconstruído só quando a conta muda (recriada ou com outro
+    número de referências), então o custo de cada verificação não cresce
+    com a quantidade de boletos de referência.
+
+    Args:
+        apelido_conta: Nome/apelido da conta
+        conta: Dados da conta (obter_conta_referencia)
+        escopo: Partição de onde vem a conta (ex: arquivo do storage do tenant),
+            para que contas homônimas de tenants diferentes não se misturem
+
+    Returns:
+        Dict: Perfil retornado por construir_perfil_conta
+    """
+    boletos_referencia = conta.get("boletos_referencia", [])
+    versao = (conta.get("data_criacao"), len(boletos_referencia))
+
+    chave = (escopo, apelido_conta)
+    with _lock_perfis:
+        entrada = _cache_perfis.get(chave)
+    if entrada and entrada[0] == versao:
+        return entrada[1]
+
+    perfil = construir_perfil_conta(boletos_referencia)
+    with _lock_perfis:
+        _cache_perfis[chave] = (versao, perfil)
+    return perfil
+
+
+def comparar_com_perfil(
+    perfil_conta: Dict, boleto_analise: Dict
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Pontua o boleto contra as distribuições de valores das referências
+
+    Um valor essencial que nenhuma referência tem é um problema real; um valor
+    presente em menos de CONSENSO_FREQUENCIA_MINIMA das referências é uma
+    anomalia menor (as próprias referências divergem neste campo).
+
+    Args:
+        perfil_conta: Perfil retornado por construir_perfil_conta
+        boleto_analise: Boleto a ser analisado
+
+    Returns:
+        Tuple[List[str], List[str], List[str]]:
+        (problemas_reais, pontos_suspeitos, anomalias_menores)
+    """
+    analise_normalizado = normalizar_dados_comparacao(boleto_analise)
+    problemas_reais = []
+    pontos_suspeitos = []
+    anomalias_menores = []
+
+    for campo, (rotulo, ponto_suspeito) in CAMPOS_ESSENCIAIS.items():
+        frequencias = perfil_conta["frequencias"][campo]
+        valor = analise_normalizado[campo]
+        total = sum(frequencias.values())
+        if not total or (not valor and campo in CAMPOS_OPCIONAIS):
+            continue
+
+        ocorrencias = frequencias.get(valor, 0)
+        if ocorrencias == 0:
+            mais_comum = frequencias.most_common(1)[0][0]
+            problemas_reais.append(
+                f"{rotulo} diferente: '{boleto_analise.get(campo)}' vs "
+                f"'{perfil_conta['exemplos'][campo][mais_comum]}'"
+            )
+            pontos_suspeitos.append(ponto_suspeito)
+        elif ocorrencias / total < CONSENSO_FREQUENCIA_MINIMA:
+            anomalias_menores.append(
+                f"{rotulo} '{boleto_analise.get(campo)}' aparece em apenas "
+                f"{ocorrencias} de {total} boletos de referência"
+            )
+
+    # Formato do nosso número (apenas o formato, não o número)
+    padroes_ref = perfil_conta["padroes_nosso_numero"]
+    nosso_num_analise = boleto_analise.get("nosso_numero", "")
+    if padroes_ref and nosso_num_analise:
+        padrao_analise = padrao_nosso_numero(nosso_num_analise)
+        if padrao_analise not in padroes_ref and len(padroes_ref) == 1:
+            anomalias_menores.append(
+                f"Formato do nosso número diferente: {padrao_analise} vs "
+                f"{next(iter(padroes_ref))}"
+            )
+
+    return problemas_reais, pontos_suspeitos, anomalias_menores
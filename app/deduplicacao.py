@@ -0,0 +1,110 @@
+from typing import Dict, List, Optional, Tuple
+
+from app.ledger import calcular_hash_pdf
+from app.pdf_local import extrair_linhas_digitaveis_pdf
+from app.validacao import somente_digitos
+
+
+def chave_boleto(dados: Dict) -> Optional[str]:
+    """
+    Chave de quase-duplicata de um boleto: nosso número + linha digitável
+
+    Só dígitos são considerados, então o mesmo boleto reimpresso ou
+    digitalizado de novo (bytes diferentes) gera a mesma chave.
+
+    Args:
+        dados: Dados extraídos do boleto
+
+    Returns:
+        str ou None: Chave, ou None se a linha digitável não foi extraída
+    """
+    linha_digitavel = somente_digitos(dados.get("linha_digitavel"))
+    if len(linha_digitavel) < 44:
+        return None
+    return f"{somente_digitos(dados.get('nosso_numero'))}:{linha_digitavel}"
+
+
+def deduplicar_arquivos(
+    arquivos_pdf: List[Tuple[bytes, str]],
+) -> Tuple[List[Tuple[bytes, str, str]], List[Dict]]:
+    """
+    Remove arquivos repetidos de um lote antes de qualquer chamada à API
+
+    Dois arquivos são considerados o mesmo boleto quando têm o mesmo conteúdo
+    (hash SHA-256) ou a mesma linha digitável lida localmente do PDF.
+
+    Args:
+        arquivos_pdf: Lista de tuplas (bytes_do_arquivo, nome_do_arquivo)
+
+    Returns:
+        Tuple: ([(bytes, nome_arquivo, hash_conteudo, linhas_digitaveis)] únicos,
+        duplicados), onde cada duplicado é {"nome_arquivo", "duplicado_de",
+        "motivo"} e linhas_digitaveis são as lidas localmente do arquivo
+    """
+    unicos = []
+    duplicados = []
+    vistos_por_hash = {}
+    vistos_por_linha = {}
+
+    for arquivo_bytes, nome_arquivo in arquivos_pdf:
+        hash_conteudo = calcular_hash_pdf(arquivo_bytes)
+        if hash_conteudo in vistos_por_hash:
+            duplicados.append(
+                {
+                    "nome_arquivo": nome_arquivo,
+                    "duplicado_de": vistos_por_hash[hash_conteudo],
+                    "motivo": "arquivo idêntico no mesmo envio",
+                }
+            )
+            continue
+
+        linhas = extrair_linhas_digitaveis_pdf(arquivo_bytes)
+        repetida = next((l for l in linhas if l in vistos_por_linha), None)
+        if repetida:
+            duplicados.append(
+                {
+                    "nome_arquivo": nome_arquivo,
+                    "duplicado_de": vistos_por_linha[repetida],
+                    "motivo": "mesma linha digitável no mesmo envio",
+                }
+            )
+            continue
+
+        vistos_por_hash[hash_conteudo] = nome_arquivo
+        for linha in linhas:
+            vistos_por_linha[linha] = nome_arquivo
+        unicos.append((arquivo_bytes, nome_arquivo, hash_conteudo, linhas))
+
+    return unicos, duplicados
+
+
+def deduplicar_boletos(boletos: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Remove boletos extraídos que são o mesmo boleto (mesma chave_boleto)
+
+    Args:
+        boletos: Dados extraídos, cada um com "nome_arquivo"
+
+    Returns:
+        Tuple[List[Dict], List[Dict]]: (boletos únicos, duplicados)
+    """
+    unicos = []
+    duplicados = []
+    vistos = {}
+
+    for boleto in boletos:
+        chave = chave_boleto(boleto)
+        if chave and chave in vistos:
+            duplicados.append(
+                {
+                    "nome_arquivo": boleto.get("nome_arquivo"),
+                    "duplicado_de": vistos[chave],
+                    "motivo": "mesmo nosso número e linha digitável no mesmo envio",
+                }
+            )
+            continue
+        if chave:
+            vistos[chave] = boleto.get("nome_arquivo")
+        unicos.append(boleto)
+
+    return unicos, duplicados
@@ -1,14 +1,83 @@
+import asyncio
 import os
 import tempfile
+import time
 import json
-from typing import Dict, List, Tuple, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Type
+import httpx
 from google import genai
 from google.genai import types
-from pydantic import BaseModel, Field
-from config.settings import GEMINI_API_KEY
+from pydantic import BaseModel, Field, create_model
+from app.consenso import (
+    comparar_com_perfil,
+    construir_perfil_conta,
+    normalizar_dados_comparacao,
+)
+from app.preprocessamento import preparar_arquivo_envio
+from app.roteamento import roteador
+from app.validacao import identificar_campos_invalidos, somente_digitos
+from config.settings import GEMINI_API_KEY, GEMINI_MAX_CONEXOES
+
+
+def criar_cliente_gemini() -> genai.Client:
+    """
+    Cria o cliente Gemini do processo
+
+    O cliente mantém um pool de conexões HTTP (keep-alive) e deve ser criado uma
+    única vez por processo e reutilizado por todas as sessões e requisições.
+    """
+    limites = httpx.Limits(
+        max_connections=GEMINI_MAX_CONEXOES,
+        max_keepalive_connections=GEMINI_MAX_CONEXOES,
+    )
+    return genai.Client(
+        api_key=GEMINI_API_KEY,
+        http_options=types.HttpOptions(
+            client_args={"limits": limites},
+            async_client_args={"limits": limites},
+        ),
+    )
+
+
+# Cliente Gemini do processo, criado no primeiro uso (ver obter_cliente)
+client = None
+_lock_cliente = threading.Lock()
+
+
+def obter_cliente():
+    """
+    Retorna o cliente Gemini do processo, criando-o no primeiro uso
+
+    Criar o cliente só quando ele é necessário permite importar o módulo sem
+    GEMINI_API_KEY (ex: nos testes, que injetam um cliente falso com
+    configurar_cliente).
+    """
+    global client
+    with _lock_cliente:
+        if client is None:
+            client = criar_cliente_gemini()
+        return client
+
+
+def cliente_disponivel() -> bool:
+    """Indica se há um cliente configurado ou uma GEMINI_API_KEY para criá-lo"""
+    return client is not None or bool(GEMINI_API_KEY)
+
+
+def configurar_cliente(novo_cliente):
+    """
+    Substitui o cliente Gemini usado pelo processo
 
-# Inicializar cliente Gemini
-client = genai.Client(api_key=GEMINI_API_KEY)
+    Args:
+        novo_cliente: Cliente compatível com genai.Client (ex: o cliente falso dos testes)
+    """
+    global client
+    with _lock_cliente:
+        client = novo_cliente
 
 
 class BoletoSchema(BaseModel):
@@ -99,6 +168,53 @@ Retorne os dados no formato JSON estruturado conforme o schema.
 """
 
 
+# Prompt para reextrair apenas os campos ausentes ou inválidos
+PROMPT_REEXTRACAO_CAMPOS = """
+Analise este boleto bancário brasileiro e extraia SOMENTE os campos abaixo.
+Eles vieram ausentes ou inválidos em uma leitura anterior:
+
+{campos}
+
+INSTRUÇÕES IMPORTANTES:
+1. Extraia exatamente o que está escrito no boleto
+2. Para datas, use o formato DD/MM/AAAA
+3. Para valores, use números decimais (ex: 1234.56)
+4. Confira dígito a dígito a linha digitável e o código de barras
+
+Retorne os dados no formato JSON estruturado conforme o schema.
+"""
+
+
+@lru_cache(maxsize=None)
+def criar_schema_parcial(campos: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Cria um schema reduzido do BoletoSchema contendo apenas os campos informados
+
+    Args:
+        campos: Nomes dos campos (tupla ordenada, usada como chave de cache)
+
+    Returns:
+        Type[BaseModel]: Schema com as mesmas anotações e descrições do BoletoSchema
+    """
+    definicoes = {
+        campo: (
+            BoletoSchema.model_fields[campo].annotation,
+            BoletoSchema.model_fields[campo],
+        )
+        for campo in campos
+    }
+    return create_model("BoletoParcialSchema", **definicoes)
+
+
+def criar_prompt_reextracao(campos_invalidos: Dict[str, str]) -> str:
+    """Cria prompt para reextrair os campos inválidos, com descrição e motivo de cada um"""
+    campos = "\n".join(
+        f"- {campo}: {BoletoSchema.model_fields[campo].description} (motivo: {motivo})"
+        for campo, motivo in sorted(campos_invalidos.items())
+    )
+    return PROMPT_REEXTRACAO_CAMPOS.format(campos=campos)
+
+
 class AnaliseComparacaoSchema(BaseModel):
     """Schema para análise de comparação entre boletos"""
 
@@ -163,50 +279,157 @@ Seja rigoroso na análise. É melhor ser cauteloso demais do que permitir uma fr
 """
 
 
-def extrair_dados_boleto(arquivo_pdf_bytes: bytes) -> Tuple[Dict, bool]:
-    """
-    Extrai dados do boleto usando Gemini
+def _configuracao_extracao(schema: Type[BaseModel]) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=schema,
+    )
 
-    Args:
-        arquivo_pdf_bytes: Bytes do arquivo PDF
 
-    Returns:
-        Tuple[Dict, bool]: (dados_extraidos, sucesso)
-    """
-    temp_file_path = None
+def _gerar_extracao(
+    modelo: str, file_upload, prompt: str, schema: Type[BaseModel]
+) -> Dict:
+    """Chama um modelo para extrair o boleto, registrando latência e erro no roteador"""
+    inicio = time.perf_counter()
     try:
-        # Cria arquivo temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(arquivo_pdf_bytes)
-            temp_file_path = temp_file.name
+        response = obter_cliente().models.generate_content(
+            model=modelo,
+            contents=[prompt, file_upload],
+            config=_configuracao_extracao(schema),
+        )
+        dados_boleto = json.loads(response.text)
+    except Exception:
+        roteador.registrar(modelo, time.perf_counter() - inicio, erro=True)
+        raise
+
+    roteador.registrar(modelo, time.perf_counter() - inicio, erro=False)
+    return dados_boleto
+
+
+async def _gerar_extracao_async(
+    modelo: str, file_upload, prompt: str, schema: Type[BaseModel]
+) -> Dict:
+    """Versão assíncrona de _gerar_extracao (obter_cliente().aio)"""
+    inicio = time.perf_counter()
+    try:
+        response = await obter_cliente().aio.models.generate_content(
+            model=modelo,
+            contents=[prompt, file_upload],
+            config=_configuracao_extracao(schema),
+        )
+        dados_boleto = json.loads(response.text)
+    except Exception:
+        roteador.registrar(modelo, time.perf_counter() - inicio, erro=True)
+        raise
 
-        # Garante que o arquivo foi fechado antes de tentar usá-lo
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                # Upload para Gemini
-                file_upload = client.files.upload(file=temp_file_path)
-
-                # Extrai dados
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash-001",
-                    contents=[PROMPT_EXTRACAO, file_upload],
-                    config=types.GenerateContentConfig(
-                        response_mime_type="application/json",
-                        response_schema=BoletoSchema,
-                    ),
-                )
+    roteador.registrar(modelo, time.perf_counter() - inicio, erro=False)
+    return dados_boleto
 
-                dados_boleto = json.loads(response.text)
-                return dados_boleto, True
 
-            except Exception as e:
-                print(f"Erro ao processar o boleto: {e}")
-                return {}, False
+class _EstadoExtracao:
+    """
+    Acompanha a extração de um boleto ao longo dos modelos tentados
+
+    Compartilhado pelas versões síncrona e assíncrona de extrair_dados_boleto.
+    """
+
+    def __init__(self):
+        self.dados_boleto = None
+        self.modelo_usado = None
+        self.campos_invalidos = {}
+        self.tentativas = []
+
+    def proxima_solicitacao(self) -> Tuple[str, Type[BaseModel], List[str]]:
+        """Retorna (prompt, schema, campos_solicitados) da próxima chamada"""
+        if self.dados_boleto is None:
+            return PROMPT_EXTRACAO, BoletoSchema, ["*"]
+        campos_solicitados = sorted(self.campos_invalidos)
+        return (
+            criar_prompt_reextracao(self.campos_invalidos),
+            criar_schema_parcial(tuple(campos_solicitados)),
+            campos_solicitados,
+        )
+
+    def registrar_erro(
+        self, modelo: str, campos_solicitados: List[str], erro: Exception
+    ):
+        print(f"Erro ao extrair o boleto com {modelo}: {erro}")
+        self.tentativas.append(
+            {
+                "modelo": modelo,
+                "campos_solicitados": campos_solicitados,
+                "erro": str(erro),
+            }
+        )
+
+    def incorporar_resposta(
+        self,
+        modelo: str,
+        campos_solicitados: List[str],
+        resposta: Dict,
+        ultimo_modelo: bool = False,
+    ) -> bool:
+        """
+        Incorpora a resposta de um modelo aos dados extraídos
+
+        Args:
+            ultimo_modelo: Se não há outro modelo para escalar depois deste
+
+        Returns:
+            bool: True se os dados ficaram válidos (não é preciso escalar)
+        """
+        # Reextração parcial: só os campos solicitados são substituídos
+        self.dados_boleto = (
+            resposta if self.dados_boleto is None else {**self.dados_boleto, **resposta}
+        )
+        self.modelo_usado = modelo
+        self.campos_invalidos = identificar_campos_invalidos(self.dados_boleto)
+        self.tentativas.append(
+            {
+                "modelo": modelo,
+                "campos_solicitados": campos_solicitados,
+                "campos_invalidos": list(self.campos_invalidos),
+            }
+        )
+
+        if not self.campos_invalidos:
+            return True
+
+        campos = ", ".join(self.campos_invalidos)
+        if ultimo_modelo:
+            print(
+                f"Extração com {modelo} inválida ({campos}) e não há outro modelo; "
+                "os campos seguem sinalizados como inválidos"
+            )
+        else:
+            print(
+                f"Extração com {modelo} inválida ({campos}), "
+                "reextraindo estes campos com o próximo modelo"
+            )
+        return False
+
+    def resultado(self, info_extracao: Optional[Dict]) -> Tuple[Dict, bool]:
+        if self.dados_boleto is None:
+            return {}, False
+
+        if info_extracao is not None:
+            info_extracao["modelo"] = self.modelo_usado
+            info_extracao["tentativas"] = self.tentativas
+            # Campos que nenhum modelo conseguiu extrair de forma válida
+            info_extracao["campos_invalidos"] = dict(self.campos_invalidos)
+
+        return self.dados_boleto, True
 
-    except Exception as e:
-        print(f"Erro ao criar arquivo temporário: {e}")
-        return {}, False
 
+@contextmanager
+def _arquivo_temporario(arquivo_bytes: bytes, sufixo: str = ".pdf"):
+    """Grava os bytes em um arquivo temporário e o remove ao final"""
+    temp_file_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=sufixo) as temp_file:
+            temp_file.write(arquivo_bytes)
+            temp_file_path = temp_file.name
+        yield temp_file_path
     finally:
         # Remove o arquivo temporário se existir
         if temp_file_path and os.path.exists(temp_file_path):
@@ -218,35 +441,124 @@ def extrair_dados_boleto(arquivo_pdf_bytes: bytes) -> Tuple[Dict, bool]:
                 )
 
 
-def normalizar_dados_comparacao(boleto: Dict) -> Dict:
+def extrair_dados_boleto(
+    arquivo_pdf_bytes: bytes, info_extracao: Optional[Dict] = None
+) -> Tuple[Dict, bool]:
     """
-    Normaliza dados do boleto focando nos campos essenciais para comparação
+    Extrai dados do boleto usando Gemini
+
+    Começa pelo modelo mais rápido indicado pelo roteador e só escala para um
+    modelo mais robusto quando a resposta não passa na validação do
+    BoletoSchema ou nos dígitos verificadores. Na escalada, o documento não é
+    reextraído inteiro: o próximo modelo recebe um prompt e um schema reduzidos
+    com apenas os campos inválidos, e a resposta é mesclada aos dados já obtidos.
+
+    Args:
+        arquivo_pdf_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+        info_extracao: Se informado, é preenchido com o modelo usado, as
+            tentativas, os bytes enviados e os campos que seguiram inválidos
+            após todos os modelos
+
+    Returns:
+        Tuple[Dict, bool]: (dados_extraidos, sucesso)
     """
-    return {
-        # Campos essenciais que devem ser idênticos
-        "nome_beneficiario": boleto.get("nome_beneficiario", "").strip().upper(),
-        "documento_beneficiario": boleto.get("documento_beneficiario", "")
-        .replace(".", "")
-        .replace("/", "")
-        .replace("-", "")
-        .strip(),
-        "codigo_banco_emissor": boleto.get("codigo_banco_emissor", "")
-        .replace("-", "")
-        .strip(),
-        "agencia_codigo_cedente": boleto.get("agencia_codigo_cedente", "").strip(),
-        "endereco_beneficiario": boleto.get("endereco_beneficiario", "")
-        .strip()
-        .upper(),
-        # Campos que podem variar (para contexto)
-        "valor_documento": boleto.get("valor_documento"),
-        "nosso_numero": boleto.get("nosso_numero"),
-        "linha_digitavel": boleto.get("linha_digitavel"),
-        "data_vencimento": boleto.get("data_vencimento"),
-    }
+    try:
+        # Imagens e PDFs digitalizados são reduzidos antes do upload
+        arquivo_envio, sufixo, mime_type = preparar_arquivo_envio(arquivo_pdf_bytes)
+        if info_extracao is not None:
+            info_extracao["bytes_enviados"] = len(arquivo_envio)
+
+        with _arquivo_temporario(arquivo_envio, sufixo) as temp_file_path:
+            # Upload para Gemini
+            file_upload = obter_cliente().files.upload(
+                file=temp_file_path, config=types.UploadFileConfig(mime_type=mime_type)
+            )
+
+            # Extrai dados, escalando de modelo enquanto a resposta for inválida
+            estado = _EstadoExtracao()
+            modelos = roteador.ordem_tentativas()
+            for indice, modelo in enumerate(modelos):
+                prompt, schema, campos_solicitados = estado.proxima_solicitacao()
+                try:
+                    resposta = _gerar_extracao(modelo, file_upload, prompt, schema)
+                except Exception as e:
+                    estado.registrar_erro(modelo, campos_solicitados, e)
+                    continue
+                if estado.incorporar_resposta(
+                    modelo,
+                    campos_solicitados,
+                    resposta,
+                    ultimo_modelo=indice == len(modelos) - 1,
+                ):
+                    break
+
+            return estado.resultado(info_extracao)
+
+    except Exception as e:
+        print(f"Erro ao processar o boleto: {e}")
+        return {}, False
+
+
+async def extrair_dados_boleto_async(
+    arquivo_pdf_bytes: bytes, info_extracao: Optional[Dict] = None
+) -> Tuple[Dict, bool]:
+    """
+    Versão assíncrona de extrair_dados_boleto, usando o cliente assíncrono do Gemini
+
+    Args:
+        arquivo_pdf_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+        info_extracao: Se informado, é preenchido com o modelo usado, as
+            tentativas, os bytes enviados e os campos que seguiram inválidos
+            após todos os modelos
+
+    Returns:
+        Tuple[Dict, bool]: (dados_extraidos, sucesso)
+    """
+    try:
+        # Imagens e PDFs digitalizados são reduzidos antes do upload
+        arquivo_envio, sufixo, mime_type = await asyncio.to_thread(
+            preparar_arquivo_envio, arquivo_pdf_bytes
+        )
+        if info_extracao is not None:
+            info_extracao["bytes_enviados"] = len(arquivo_envio)
+
+        with _arquivo_temporario(arquivo_envio, sufixo) as temp_file_path:
+            # Upload para Gemini
+            file_upload = await obter_cliente().aio.files.upload(
+                file=temp_file_path, config=types.UploadFileConfig(mime_type=mime_type)
+            )
+
+            # Extrai dados, escalando de modelo enquanto a resposta for inválida
+            estado = _EstadoExtracao()
+            modelos = roteador.ordem_tentativas()
+            for indice, modelo in enumerate(modelos):
+                prompt, schema, campos_solicitados = estado.proxima_solicitacao()
+                try:
+                    resposta = await _gerar_extracao_async(
+                        modelo, file_upload, prompt, schema
+                    )
+                except Exception as e:
+                    estado.registrar_erro(modelo, campos_solicitados, e)
+                    continue
+                if estado.incorporar_resposta(
+                    modelo,
+                    campos_solicitados,
+                    resposta,
+                    ultimo_modelo=indice == len(modelos) - 1,
+                ):
+                    break
+
+            return estado.resultado(info_extracao)
+
+    except Exception as e:
+        print(f"Erro ao processar o boleto: {e}")
+        return {}, False
 
 
 def analisar_fraude_boleto(
-    boletos_referencia: List[Dict], boleto_analise: Dict
+    boletos_referencia: List[Dict],
+    boleto_analise: Dict,
+    perfil_conta: Optional[Dict] = None,
 ) -> Tuple[Dict, bool]:
     """
     Analisa se o boleto é fraudulento comparando com boletos de referência
@@ -254,61 +566,19 @@ def analisar_fraude_boleto(
     Args:
         boletos_referencia: Lista de boletos originais da mesma conta
         boleto_analise: Boleto a ser analisado
+        perfil_conta: Perfil de consenso da conta (obter_perfil_conta). Se None,
+            é construído a partir de boletos_referencia
 
     Returns:
         Tuple[Dict, bool]: (resultado_analise, sucesso)
     """
     try:
-        # Verificação dos campos essenciais (que DEVEM ser idênticos)
-        ref_normalizado = normalizar_dados_comparacao(boletos_referencia[0])
-        analise_normalizado = normalizar_dados_comparacao(boleto_analise)
-
-        # Lista para armazenar apenas problemas REAIS
-        problemas_reais = []
-        pontos_suspeitos = []
-
-        # Verifica nome do beneficiário (deve ser exato)
-        if (
-            ref_normalizado["nome_beneficiario"]
-            != analise_normalizado["nome_beneficiario"]
-        ):
-            problemas_reais.append(
-                f"Nome do beneficiário diferente: '{boleto_analise.get('nome_beneficiario')}' vs '{boletos_referencia[0].get('nome_beneficiario')}'"
-            )
-            pontos_suspeitos.append("Nome do beneficiário não confere")
-
-        # Verifica documento do beneficiário (deve ser idêntico)
-        if (
-            ref_normalizado["documento_beneficiario"]
-            != analise_normalizado["documento_beneficiario"]
-        ):
-            problemas_reais.append(
-                f"Documento do beneficiário diferente: '{boleto_analise.get('documento_beneficiario')}' vs '{boletos_referencia[0].get('documento_beneficiario')}'"
-            )
-            pontos_suspeitos.append("CNPJ/CPF do beneficiário não confere")
-
-        # Verifica banco emissor (deve ser o mesmo)
-        if (
-            ref_normalizado["codigo_banco_emissor"]
-            != analise_normalizado["codigo_banco_emissor"]
-        ):
-            problemas_reais.append(
-                f"Banco emissor diferente: '{boleto_analise.get('codigo_banco_emissor')}' vs '{boletos_referencia[0].get('codigo_banco_emissor')}'"
-            )
-            pontos_suspeitos.append("Banco emissor não confere")
-
-        # Verifica agência/cedente (deve ser igual)
-        if ref_normalizado.get("agencia_codigo_cedente") and analise_normalizado.get(
-            "agencia_codigo_cedente"
-        ):
-            if (
-                ref_normalizado["agencia_codigo_cedente"]
-                != analise_normalizado["agencia_codigo_cedente"]
-            ):
-                problemas_reais.append(
-                    f"Agência/cedente diferente: '{boleto_analise.get('agencia_codigo_cedente')}' vs '{boletos_referencia[0].get('agencia_codigo_cedente')}'"
-                )
-                pontos_suspeitos.append("Agência/código cedente não confere")
+        # Compara os campos essenciais com o consenso de todas as referências
+        if perfil_conta is None:
+            perfil_conta = construir_perfil_conta(boletos_referencia)
+        problemas_reais, pontos_suspeitos, anomalias_menores = comparar_com_perfil(
+            perfil_conta, boleto_analise
+        )
 
         # Se há problemas REAIS, é fraude
         if problemas_reais:
@@ -322,33 +592,9 @@ def analisar_fraude_boleto(
             }, True
 
         # Se chegou aqui, os campos essenciais conferem
-        # Agora vamos fazer uma análise mais refinada, mas sendo menos rigoroso
         #
         # Nota: Valores, datas, nosso número e linha digitável DIFERENTES são NORMAIS!
 
-        # Vamos verificar se há padrões muito estranhos nos campos variáveis
-        anomalias_menores = []
-
-        # Verifica se o padrão do nosso número é muito diferente (apenas o formato, não o número)
-        nosso_nums_ref = [
-            b.get("nosso_numero", "")
-            for b in boletos_referencia
-            if b.get("nosso_numero")
-        ]
-        nosso_num_analise = boleto_analise.get("nosso_numero", "")
-
-        if nosso_nums_ref and nosso_num_analise:
-            # Extrai o padrão (formato) do nosso número
-            import re
-
-            padroes_ref = [re.sub(r"\d", "#", n) for n in nosso_nums_ref]
-            padrao_analise = re.sub(r"\d", "#", nosso_num_analise)
-
-            if padrao_analise not in padroes_ref and len(set(padroes_ref)) == 1:
-                anomalias_menores.append(
-                    f"Formato do nosso número diferente: {padrao_analise} vs {padroes_ref[0]}"
-                )
-
         # Se os campos essenciais estão OK e não há anomalias graves, classifica como legítimo
         if not anomalias_menores:
             return {
@@ -380,26 +626,79 @@ def analisar_fraude_boleto(
         return {}, False
 
 
+def analisar_linhas_digitaveis_locais(
+    boletos_referencia: List[Dict], linhas_digitaveis: List[str]
+) -> Optional[Dict]:
+    """
+    Análise rápida, sem IA, das linhas digitáveis lidas localmente do PDF
+
+    Só produz resultado quando é decisivo: todas as linhas digitáveis válidas
+    do documento apontam para um banco que não emitiu nenhum dos boletos de
+    referência.
+
+    Args:
+        boletos_referencia: Lista de boletos originais da mesma conta
+        linhas_digitaveis: Linhas digitáveis válidas (somente dígitos) lidas do PDF
+
+    Returns:
+        Dict ou None: Resultado NAO_PAGAR, ou None se a análise não é conclusiva
+    """
+    # Linhas de arrecadação (48 dígitos) não trazem o código do banco
+    bancos_documento = {linha[:3] for linha in linhas_digitaveis if len(linha) == 47}
+    bancos_referencia = {
+        somente_digitos(b.get("codigo_banco_emissor"))[:3] for b in boletos_referencia
+    }
+    bancos_referencia.discard("")
+
+    if not bancos_documento or not bancos_referencia:
+        return None
+    if bancos_documento & bancos_referencia:
+        return None
+
+    diferenca = (
+        f"Banco da linha digitável diferente: '{', '.join(sorted(bancos_documento))}' "
+        f"vs '{', '.join(sorted(bancos_referencia))}'"
+    )
+    return {
+        "eh_fraudulento": True,
+        "nivel_confianca": 0.95,
+        "resumo_analise": f"Boleto fraudulento detectado antes da extração por IA: {diferenca}",
+        "diferencas_encontradas": [diferenca],
+        "pontos_suspeitos": ["Banco emissor não confere"],
+        "recomendacao": "NAO_PAGAR",
+    }
+
+
 def processar_multiplos_boletos_referencia(
     arquivos_pdf: List[Tuple[bytes, str]],
 ) -> Tuple[List[Dict], bool]:
     """
     Processa múltiplos boletos para criar referência
 
+    As extrações rodam em paralelo (até GEMINI_MAX_CONEXOES ao mesmo tempo),
+    então um carnê com um ano de boletos custa pouco mais que um boleto só.
+
     Args:
         arquivos_pdf: Lista de tuplas (bytes_do_arquivo, nome_do_arquivo)
 
     Returns:
-        Tuple[List[Dict], bool]: (boletos_processados, sucesso)
+        Tuple[List[Dict], bool]: (boletos_processados, sucesso), na ordem dos arquivos
     """
-    boletos_processados = []
+    if not arquivos_pdf:
+        return [], False
 
-    for arquivo_bytes, nome_arquivo in arquivos_pdf:
-        dados_boleto, sucesso = extrair_dados_boleto(arquivo_bytes)
-        if sucesso:
-            dados_boleto["nome_arquivo"] = nome_arquivo
-            boletos_processados.append(dados_boleto)
-        else:
+    with ThreadPoolExecutor(
+        max_workers=min(len(arquivos_pdf), GEMINI_MAX_CONEXOES)
+    ) as executor:
+        extracoes = list(
+            executor.map(lambda arquivo: extrair_dados_boleto(arquivo[0]), arquivos_pdf)
+        )
+
+    boletos_processados = []
+    for (dados_boleto, sucesso), (_, nome_arquivo) in zip(extracoes, arquivos_pdf):
+        if not sucesso:
             return [], False
+        dados_boleto["nome_arquivo"] = nome_arquivo
+        boletos_processados.append(dados_boleto)
 
     return boletos_processados, len(boletos_processados) >= 2
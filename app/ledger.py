@@ -0,0 +1,404 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.validacao import somente_digitos
+from config.settings import LEDGER_VERIFICACOES
+
+ESQUEMA_LEDGER = """
+CREATE TABLE IF NOT EXISTS verificacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data_verificacao TEXT NOT NULL,
+    hash_pdf TEXT NOT NULL,
+    apelido_conta TEXT NOT NULL,
+    eh_fraudulento INTEGER NOT NULL,
+    recomendacao TEXT NOT NULL,
+    nivel_confianca REAL,
+    modelo TEXT,
+    tempos_etapas TEXT,
+    resultado TEXT,
+    dados_boleto TEXT,
+    linha_digitavel TEXT,
+    etapa_decisiva TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_verificacoes_data
+    ON verificacoes (data_verificacao);
+CREATE INDEX IF NOT EXISTS idx_verificacoes_hash
+    ON verificacoes (hash_pdf);
+
+-- O ledger é append-only: registros nunca são alterados, apenas expirados pela retenção
+CREATE TRIGGER IF NOT EXISTS trg_verificacoes_append_only
+    BEFORE UPDATE ON verificacoes
+BEGIN
+    SELECT RAISE(ABORT, 'ledger de verificações é append-only');
+END;
+"""
+
+
+# Etapas que reaproveitam o veredito de uma verificação anterior: o registro
+# documenta a nova consulta, mas não é uma nova análise
+ETAPAS_REAPROVEITADAS = ("duplicado", "bloqueio")
+
+
+def calcular_hash_pdf(arquivo_bytes: bytes) -> str:
+    """Calcula o hash SHA-256 (hex) do conteúdo de um arquivo"""
+    return hashlib.sha256(arquivo_bytes).hexdigest()
+
+
+class LedgerVerificacoes:
+    """Registro append-only das verificações de boletos, persistido em SQLite"""
+
+    def __init__(self, arquivo_ledger: str = None):
+        """
+        Inicializa o ledger
+
+        Args:
+            arquivo_ledger: Caminho para o banco SQLite. Se None, usa LEDGER_VERIFICACOES
+        """
+        self.arquivo_ledger = arquivo_ledger or LEDGER_VERIFICACOES
+        self._local = threading.local()
+
+        # Cria diretório se não existir
+        diretorio = os.path.dirname(self.arquivo_ledger)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        conexao = self._conexao()
+        conexao.executescript(ESQUEMA_LEDGER)
+
+        # Ledgers criados antes das colunas linha_digitavel e etapa_decisiva
+        colunas = {
+            linha["name"]
+            for linha in conexao.execute("PRAGMA table_info(verificacoes)")
+        }
+        for coluna in ("linha_digitavel", "etapa_decisiva"):
+            if coluna not in colunas:
+                conexao.execute(f"ALTER TABLE verificacoes ADD COLUMN {coluna} TEXT")
+        conexao.execute(
+            "CREATE INDEX IF NOT EXISTS idx_verificacoes_linha "
+            "ON verificacoes (linha_digitavel)"
+        )
+        # Índice de cobertura: a taxa de fraude por conta/mês é respondida só pelo
+        # índice (substitui o antigo, sem etapa_decisiva)
+        conexao.execute("DROP INDEX IF EXISTS idx_verificacoes_conta_data")
+        conexao.execute(
+            "CREATE INDEX IF NOT EXISTS idx_verificacoes_conta_data_etapa ON "
+            "verificacoes (apelido_conta, data_verificacao, eh_fraudulento, "
+            "etapa_decisiva)"
+        )
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual (o Streamlit usa uma thread por sessão)"""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.arquivo_ledger, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            # WAL + synchronous=NORMAL: um append custa uma escrita sequencial no log,
+            # sem fsync por transação e sem bloquear leitores das consultas agregadas
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def registrar_verificacao(
+        self,
+        hash_pdf: str,
+        apelido_conta: str,
+        resultado: Dict,
+        tempos_etapas: Optional[Dict[str, float]] = None,
+        modelo: Optional[str] = None,
+        dados_boleto: Optional[Dict] = None,
+        etapa_decisiva: Optional[str] = None,
+    ) -> bool:
+        """
+        Acrescenta uma verificação ao ledger
+
+        Args:
+            hash_pdf: Hash SHA-256 do PDF verificado
+            apelido_conta: Conta de referência usada na comparação
+            resultado: Resultado retornado por analisar_fraude_boleto
+            tempos_etapas: Duração de cada etapa da verificação, em segundos
+            modelo: Modelo Gemini usado na extração
+            dados_boleto: Dados extraídos do boleto verificado
+            etapa_decisiva: Etapa que decidiu sem a análise completa ("texto_local",
+                ou uma de ETAPAS_REAPROVEITADAS); None para a análise completa
+
+        Returns:
+            bool: True se registrou com sucesso
+        """
+        try:
+            self._conexao().execute(
+                """
+                INSERT INTO verificacoes (
+                    data_verificacao, hash_pdf, apelido_conta, eh_fraudulento,
+                    recomendacao, nivel_confianca, modelo, tempos_etapas,
+                    resultado, dados_boleto, linha_digitavel, etapa_decisiva
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    datetime.now().isoformat(),
+                    hash_pdf,
+                    apelido_conta,
+                    int(bool(resultado.get("eh_fraudulento"))),
+                    resultado.get("recomendacao", "VERIFICAR_MANUALMENTE"),
+                    resultado.get("nivel_confianca"),
+                    modelo,
+                    json.dumps(tempos_etapas or {}),
+                    json.dumps(resultado, ensure_ascii=False),
+                    json.dumps(dados_boleto or {}, ensure_ascii=False),
+                    somente_digitos((dados_boleto or {}).get("linha_digitavel"))
+                    or None,
+                    etapa_decisiva,
+                ),
+            )
+            return True
+        except sqlite3.Error as e:
+            print(f"Erro ao registrar verificação no ledger: {e}")
+            return False
+
+    def _linha_para_dict(self, linha: sqlite3.Row) -> Dict:
+        """Converte uma linha do ledger em dicionário, decodificando os campos JSON"""
+        registro = dict(linha)
+        registro["eh_fraudulento"] = bool(registro["eh_fraudulento"])
+        for campo in ("tempos_etapas", "resultado", "dados_boleto"):
+            registro[campo] = json.loads(registro[campo]) if registro[campo] else {}
+        return registro
+
+    def buscar_por_hash(self, hash_pdf: str) -> List[Dict]:
+        """
+        Busca verificações anteriores de um mesmo PDF
+
+        Args:
+            hash_pdf: Hash SHA-256 do PDF
+
+        Returns:
+            List[Dict]: Verificações do PDF, da mais recente para a mais antiga
+        """
+        linhas = self._conexao().execute(
+            "SELECT * FROM verificacoes WHERE hash_pdf = ? ORDER BY id DESC",
+            (hash_pdf,),
+        )
+        return [self._linha_para_dict(linha) for linha in linhas]
+
+    def buscar_por_linha_digitavel(
+        self, linha_digitavel: str, apelido_conta: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Busca verificações anteriores do mesmo boleto, ainda que em outro arquivo
+
+        Args:
+            linha_digitavel: Linha digitável (com ou sem formatação)
+            apelido_conta: Restringe a busca a uma conta
+
+        Returns:
+            List[Dict]: Verificações do boleto, da mais recente para a mais antiga
+        """
+        condicoes = "linha_digitavel = ?"
+        parametros = [somente_digitos(linha_digitavel)]
+        if apelido_conta is not None:
+            condicoes += " AND apelido_conta = ?"
+            parametros.append(apelido_conta)
+        linhas = self._conexao().execute(
+            f"SELECT * FROM verificacoes WHERE {condicoes} ORDER BY id DESC",
+            parametros,
+        )
+        return [self._linha_para_dict(linha) for linha in linhas]
+
+    def buscar_bloqueio(self, hash_pdf: str, apelido_conta: str) -> Optional[Dict]:
+        """
+        Verifica se o PDF já foi reprovado (NAO_PAGAR) nesta conta
+
+        O bloqueio vale só para a conta em que o boleto foi reprovado: um boleto
+        legítimo verificado por engano contra a conta errada não fica bloqueado
+        nas demais.
+
+        Args:
+            hash_pdf: Hash SHA-256 do PDF
+            apelido_conta: Conta de referência da verificação
+
+        Returns:
+            Dict ou None: Verificação mais recente com NAO_PAGAR, se houver
+        """
+        linha = self._conexao().execute(
+            "SELECT * FROM verificacoes WHERE hash_pdf = ? AND apelido_conta = ? "
+            "AND recomendacao = ? ORDER BY id DESC LIMIT 1",
+            (hash_pdf, apelido_conta, "NAO_PAGAR"),
+        ).fetchone()
+        return self._linha_para_dict(linha) if linha else None
+
+    def listar_verificacoes(
+        self,
+        apelido_conta: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        ate: Optional[datetime] = None,
+        limite: int = 100,
+    ) -> List[Dict]:
+        """
+        Lista verificações filtrando por conta e/ou período
+
+        Args:
+            apelido_conta: Filtra por conta de referência
+            desde: Data/hora inicial (inclusiva)
+            ate: Data/hora final (exclusiva)
+            limite: Número máximo de registros
+
+        Returns:
+            List[Dict]: Verificações, da mais recente para a mais antiga
+        """
+        condicoes, parametros = self._filtros(apelido_conta, desde, ate)
+        linhas = self._conexao().execute(
+            f"SELECT * FROM verificacoes {condicoes} "
+            "ORDER BY data_verificacao DESC LIMIT ?",
+            (*parametros, limite),
+        )
+        return [self._linha_para_dict(linha) for linha in linhas]
+
+    def taxa_fraude_por_conta_mes(
+        self,
+        apelido_conta: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        ate: Optional[datetime] = None,
+    ) -> List[Dict]:
+        """
+        Calcula a taxa de fraude por conta e por mês
+
+        Vereditos reaproveitados (ETAPAS_REAPROVEITADAS) ficam de fora: reenviar
+        o mesmo boleto não conta como uma nova fraude (nem como um novo boleto).
+        Registros anteriores à coluna etapa_decisiva contam como análises novas.
+
+        Args:
+            apelido_conta: Restringe o cálculo a uma conta
+            desde: Data/hora inicial (inclusiva)
+            ate: Data/hora final (exclusiva)
+
+        Returns:
+            List[Dict]: Um item por (conta, mês) com total, fraudes e taxa_fraude
+        """
+        condicoes, parametros = self._filtros(
+            apelido_conta, desde, ate, sem_reaproveitadas=True
+        )
+        linhas = self._conexao().execute(
+            f"""
+            SELECT
+                apelido_conta,
+                substr(data_verificacao, 1, 7) AS mes,
+                COUNT(*) AS total,
+                SUM(eh_fraudulento) AS fraudes
+            FROM verificacoes {condicoes}
+            GROUP BY apelido_conta, mes
+            ORDER BY apelido_conta, mes
+            """,
+            parametros,
+        )
+        return [
+            {
+                "apelido_conta": linha["apelido_conta"],
+                "mes": linha["mes"],
+                "total": linha["total"],
+                "fraudes": linha["fraudes"],
+                "taxa_fraude": linha["fraudes"] / linha["total"],
+            }
+            for linha in linhas
+        ]
+
+    def _filtros(
+        self,
+        apelido_conta: Optional[str],
+        desde: Optional[datetime],
+        ate: Optional[datetime],
+        sem_reaproveitadas: bool = False,
+    ) -> tuple:
+        """Monta a cláusula WHERE (indexada) para conta e período"""
+        condicoes = []
+        parametros = []
+        if sem_reaproveitadas:
+            marcadores = ", ".join("?" for _ in ETAPAS_REAPROVEITADAS)
+            condicoes.append(
+                f"(etapa_decisiva IS NULL OR etapa_decisiva NOT IN ({marcadores}))"
+            )
+            parametros.extend(ETAPAS_REAPROVEITADAS)
+        if apelido_conta is not None:
+            condicoes.append("apelido_conta = ?")
+            parametros.append(apelido_conta)
+        if desde is not None:
+            condicoes.append("data_verificacao >= ?")
+            parametros.append(desde.isoformat())
+        if ate is not None:
+            condicoes.append("data_verificacao < ?")
+            parametros.append(ate.isoformat())
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return where, parametros
+
+    def aplicar_retencao(self, dias: int) -> int:
+        """
+        Remove verificações mais antigas que o período de retenção
+
+        Args:
+            dias: Número de dias a manter
+
+        Returns:
+            int: Quantidade de verificações removidas
+        """
+        limite = datetime.now() - timedelta(days=dias)
+        cursor = self._conexao().execute(
+            "DELETE FROM verificacoes WHERE data_verificacao < ?",
+            (limite.isoformat(),),
+        )
+        return cursor.rowcount
+
+    def compactar(self):
+        """Incorpora o WAL ao banco e recupera o espaço liberado pela retenção"""
+        conexao = self._conexao()
+        # O VACUUM reescreve o banco pelo WAL: o checkpoint vem depois dele
+        conexao.execute("VACUUM")
+        conexao.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+# Instância global para uso no projeto
+ledger = LedgerVerificacoes()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manutenção do ledger de verificações")
+    parser.add_argument(
+        "--tenant", default=None, help="Ledger do tenant (padrão: ledger global)"
+    )
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_taxa = subparsers.add_parser("taxa", help="Taxa de fraude por conta/mês")
+    parser_taxa.add_argument("--conta", default=None)
+
+    parser_retencao = subparsers.add_parser(
+        "retencao", help="Remove registros antigos e compacta o banco"
+    )
+    parser_retencao.add_argument("--dias", type=int, required=True)
+
+    args = parser.parse_args()
+
+    if args.tenant is not None:
+        from app.tenants import TenantNaoEncontrado, obter_ledger
+
+        try:
+            ledger = obter_ledger(args.tenant)
+        except TenantNaoEncontrado:
+            parser.error(f"tenant '{args.tenant}' não encontrado neste servidor")
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.comando == "taxa":
+        for item in ledger.taxa_fraude_por_conta_mes(args.conta):
+            print(
+                f"{item['apelido_conta']}\t{item['mes']}\t"
+                f"{item['fraudes']}/{item['total']}\t{item['taxa_fraude']:.1%}"
+            )
+    else:
+        removidos = ledger.aplicar_retencao(args.dias)
+        ledger.compactar()
+        print(f"{removidos} verificações removidas")
@@ -0,0 +1,105 @@
+import re
+import threading
+from typing import List, Optional
+
+import pypdfium2
+
+from app.validacao import linha_digitavel_valida, somente_digitos
+
+# O pdfium não é thread-safe: chamadas simultâneas, mesmo sobre documentos
+# diferentes, precisam ser serializadas (sessões e etapas rodam em threads)
+lock_pdfium = threading.Lock()
+
+# Linha digitável bancária: 00000.00000 00000.000000 00000.000000 0 00000000000000
+PADRAO_LINHA_BANCARIA = re.compile(
+    r"\d{5}\.?\d{5}\s*\d{5}\.?\d{6}\s*\d{5}\.?\d{6}\s*\d\s*\d{14}"
+)
+# Linha digitável de arrecadação: 00000000000-0 00000000000-0 00000000000-0 00000000000-0
+PADRAO_LINHA_ARRECADACAO = re.compile(r"(?:\d{11}[-\s]?\d\s*){3}\d{11}[-\s]?\d")
+
+
+def detectar_tipo_arquivo(arquivo_bytes: bytes) -> Optional[str]:
+    """
+    Detecta o tipo do arquivo pela assinatura (magic bytes)
+
+    Args:
+        arquivo_bytes: Bytes do arquivo
+
+    Returns:
+        str ou None: "pdf", "png", "jpeg" ou None se não suportado
+    """
+    if arquivo_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if arquivo_bytes.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    # O cabeçalho %PDF pode vir depois de alguns bytes de lixo
+    if b"%PDF-" in arquivo_bytes[:1024]:
+        return "pdf"
+    return None
+
+
+def _texto_pagina(pagina: pypdfium2.PdfPage) -> str:
+    """Camada de texto de uma página (chamar com lock_pdfium)"""
+    texto = pagina.get_textpage()
+    try:
+        return texto.get_text_range()
+    finally:
+        texto.close()
+
+
+def extrair_texto_pdf(arquivo_pdf_bytes: bytes) -> str:
+    """
+    Extrai localmente a camada de texto de um PDF
+
+    Args:
+        arquivo_pdf_bytes: Bytes do arquivo PDF
+
+    Returns:
+        str: Texto de todas as páginas ("" para PDFs só com imagem, imagens ou inválidos)
+    """
+    # Fotos e digitalizações (PNG/JPEG) não têm camada de texto
+    if detectar_tipo_arquivo(arquivo_pdf_bytes) != "pdf":
+        return ""
+
+    try:
+        with lock_pdfium:
+            documento = pypdfium2.PdfDocument(arquivo_pdf_bytes)
+            try:
+                return "\n".join(_texto_pagina(pagina) for pagina in documento)
+            finally:
+                documento.close()
+    except Exception as e:
+        print(f"Aviso: não foi possível ler o texto do PDF localmente: {e}")
+        return ""
+
+
+def encontrar_linhas_digitaveis(texto: str) -> List[str]:
+    """
+    Encontra no texto as linhas digitáveis com dígitos verificadores válidos
+
+    Args:
+        texto: Texto extraído do boleto
+
+    Returns:
+        List[str]: Linhas digitáveis (somente dígitos), sem repetição e na ordem do texto
+    """
+    linhas = []
+    for padrao in (PADRAO_LINHA_BANCARIA, PADRAO_LINHA_ARRECADACAO):
+        for encontrada in padrao.finditer(texto):
+            digitos = somente_digitos(encontrada.group())
+            if digitos not in linhas and linha_digitavel_valida(digitos):
+                linhas.append(digitos)
+    return linhas
+
+
+def extrair_linhas_digitaveis_pdf(arquivo_pdf_bytes: bytes) -> List[str]:
+    """
+    Lê localmente as linhas digitáveis válidas de um PDF, sem chamar o Gemini
+
+    Args:
+        arquivo_pdf_bytes: Bytes do arquivo PDF
+
+    Returns:
+        List[str]: Linhas digitáveis válidas encontradas (vazia se não houver texto)
+    """
+    return encontrar_linhas_digitaveis(extrair_texto_pdf(arquivo_pdf_bytes))
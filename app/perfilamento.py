@@ -0,0 +1,234 @@
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config.settings import (
+    PERFILAMENTO_ATIVO,
+    PERFILAMENTO_DIRETORIO,
+    PERFILAMENTO_TOP_ALOCACOES,
+)
+
+# Contexto reutilizável devolvido quando o perfilamento está desligado
+_SEM_PERFILAMENTO = nullcontext()
+
+# O tracemalloc é global ao processo: fica ligado enquanto houver execução perfilada
+_lock_tracemalloc = threading.Lock()
+_execucoes_ativas = 0
+
+# Só um cProfile pode estar ativo por processo (Python 3.12+): execuções
+# simultâneas disputam este lock sem esperar, e quem não o obtém é perfilada
+# apenas com o tracemalloc
+_lock_cprofile = threading.Lock()
+
+
+class ExecucaoPerfilada:
+    """
+    Perfila uma execução com cProfile e snapshots do tracemalloc
+
+    Ao sair, grava em PERFILAMENTO_DIRETORIO um arquivo .prof (pstats) e um
+    resumo .json com a duração, as funções mais caras e os principais pontos
+    de alocação de memória.
+
+    Observação: o cProfile só enxerga a thread que entrou no contexto; trabalho
+    delegado a outras threads (ex: pipeline assíncrono) aparece como espera.
+    O tracemalloc, por ser global, contabiliza as alocações de todas as threads.
+    Com várias execuções simultâneas, só uma delas usa o cProfile; as demais
+    gravam apenas o resumo de duração e alocações.
+    """
+
+    def __init__(self, nome: str, diretorio: str = None):
+        self.nome = nome
+        self.diretorio = diretorio or PERFILAMENTO_DIRETORIO
+        self.identificador = (
+            f"{datetime.now():%Y%m%d-%H%M%S}_{nome}_{uuid.uuid4().hex[:8]}"
+        )
+
+    def __enter__(self):
+        global _execucoes_ativas
+        with _lock_tracemalloc:
+            if _execucoes_ativas == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _execucoes_ativas += 1
+        try:
+            self._snapshot_inicial = tracemalloc.take_snapshot()
+            self._perfil = self._iniciar_cprofile()
+        except BaseException:
+            self._encerrar_tracemalloc()
+            raise
+
+        self._inicio = datetime.now()
+        self._inicio_relogio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, traceback):
+        if self._perfil is not None:
+            self._perfil.disable()
+            _lock_cprofile.release()
+        duracao = time.perf_counter() - self._inicio_relogio
+        snapshot_final = tracemalloc.take_snapshot()
+        self._encerrar_tracemalloc()
+
+        try:
+            self._gravar(duracao, snapshot_final, tipo_excecao)
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o perfil de '{self.nome}': {e}")
+
+        # Nunca suprime exceções (inclusive st.rerun/st.stop do Streamlit)
+        return False
+
+    def _iniciar_cprofile(self) -> Optional[cProfile.Profile]:
+        """Liga o cProfile se nenhuma outra execução (ou ferramenta) o estiver usando"""
+        if not _lock_cprofile.acquire(blocking=False):
+            return None
+        try:
+            perfil = cProfile.Profile()
+            perfil.enable()
+            return perfil
+        except ValueError as e:
+            # Outro profiler fora deste módulo já está ativo
+            _lock_cprofile.release()
+            print(f"Aviso: perfilando '{self.nome}' sem cProfile: {e}")
+            return None
+
+    @staticmethod
+    def _encerrar_tracemalloc():
+        global _execucoes_ativas
+        with _lock_tracemalloc:
+            _execucoes_ativas -= 1
+            if _execucoes_ativas == 0:
+                tracemalloc.stop()
+
+    def _gravar(self, duracao: float, snapshot_final, tipo_excecao):
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho_base = os.path.join(self.diretorio, self.identificador)
+
+        if self._perfil is not None:
+            self._perfil.dump_stats(f"{caminho_base}.prof")
+
+        filtros = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]
+        diferencas = snapshot_final.filter_traces(filtros).compare_to(
+            self._snapshot_inicial.filter_traces(filtros), "lineno"
+        )
+        top_alocacoes = [
+            {
+                "local": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+                "tamanho_kb": round(d.size_diff / 1024, 1),
+                "blocos": d.count_diff,
+            }
+            for d in diferencas[:PERFILAMENTO_TOP_ALOCACOES]
+        ]
+
+        estatisticas = (
+            pstats.Stats(self._perfil, stream=io.StringIO()).stats
+            if self._perfil is not None
+            else {}
+        )
+        mais_caras = sorted(
+            estatisticas.items(), key=lambda item: item[1][3], reverse=True
+        )
+        top_funcoes = [
+            {
+                "funcao": f"{arquivo}:{linha}({funcao})",
+                "chamadas": totais[1],
+                "tempo_acumulado": round(totais[3], 4),
+            }
+            for (arquivo, linha, funcao), totais in mais_caras[
+                :PERFILAMENTO_TOP_ALOCACOES
+            ]
+        ]
+
+        resumo = {
+            "identificador": self.identificador,
+            "nome": self.nome,
+            "inicio": self._inicio.isoformat(),
+            "duracao": duracao,
+            "excecao": tipo_excecao.__name__ if tipo_excecao else None,
+            "cprofile": self._perfil is not None,
+            "top_alocacoes": top_alocacoes,
+            "top_funcoes": top_funcoes,
+        }
+        with open(f"{caminho_base}.json", "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+
+
+def perfilar(nome: str):
+    """
+    Context manager que perfila o bloco quando PERFILAMENTO está ativo
+
+    Com o perfilamento desligado devolve um contexto nulo pré-criado, sem
+    nenhum custo além da chamada.
+
+    Args:
+        nome: Nome do tipo de execução (ex: "rerun", "lote")
+    """
+    if not PERFILAMENTO_ATIVO:
+        return _SEM_PERFILAMENTO
+    return ExecucaoPerfilada(nome)
+
+
+def listar_execucoes_mais_lentas(
+    limite: int = 10, nome: Optional[str] = None, diretorio: str = None
+) -> List[Dict]:
+    """
+    Lista as execuções perfiladas mais lentas
+
+    Args:
+        limite: Número máximo de execuções
+        nome: Filtra pelo tipo de execução (ex: "rerun", "lote")
+        diretorio: Diretório dos perfis. Se None, usa PERFILAMENTO_DIRETORIO
+
+    Returns:
+        List[Dict]: Resumos das execuções, da mais lenta para a mais rápida
+    """
+    execucoes = []
+    for caminho in glob.glob(
+        os.path.join(diretorio or PERFILAMENTO_DIRETORIO, "*.json")
+    ):
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                resumo = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if nome is None or resumo.get("nome") == nome:
+            execucoes.append(resumo)
+
+    execucoes.sort(key=lambda resumo: resumo.get("duracao", 0), reverse=True)
+    return execucoes[:limite]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Execuções perfiladas mais lentas")
+    parser.add_argument("--limite", type=int, default=10)
+    parser.add_argument("--nome", default=None, help="Ex: rerun, lote")
+    parser.add_argument(
+        "--detalhar",
+        action="store_true",
+        help="Mostra funções e alocações de cada execução",
+    )
+    args = parser.parse_args()
+
+    for resumo in listar_execucoes_mais_lentas(args.limite, args.nome):
+        print(
+            f"{resumo['duracao']:8.3f}s  {resumo['nome']:<8} {resumo['inicio']}  "
+            f"{resumo['identificador']}"
+        )
+        if args.detalhar:
+            for funcao in resumo["top_funcoes"]:
+                print(f"    {funcao['tempo_acumulado']:8.4f}s  {funcao['funcao']}")
+            for alocacao in resumo["top_alocacoes"]:
+                print(f"    {alocacao['tamanho_kb']:8.1f}KB  {alocacao['local']}")
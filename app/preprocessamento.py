@@ -0,0 +1,205 @@
+import io
+from typing import List, Optional, Tuple
+
+import pypdfium2
+from PIL import Image, ImageOps
+
+from app.pdf_local import detectar_tipo_arquivo, lock_pdfium
+from config.settings import PREPROCESSAMENTO_DPI, PREPROCESSAMENTO_MAX_BYTES
+
+# Tipos de arquivo aceitos: sufixo do arquivo temporário e mime type do upload
+SUFIXO_POR_TIPO = {"pdf": ".pdf", "png": ".png", "jpeg": ".jpg"}
+MIME_POR_TIPO = {"pdf": "application/pdf", "png": "image/png", "jpeg": "image/jpeg"}
+
+# Maior lado da imagem enviada: altura de uma folha A4 (11,69") no DPI alvo
+LADO_MAXIMO = round(11.69 * PREPROCESSAMENTO_DPI)
+
+# Pixels mais escuros que isto contam como conteúdo ao recortar a região do boleto
+LIMIAR_CONTEUDO = 200
+MARGEM_RECORTE = 16
+
+# Qualidades JPEG tentadas, da melhor para a pior, até caber no orçamento de bytes
+QUALIDADES_JPEG = (85, 75, 65, 55, 45, 35)
+
+
+def _recortar_conteudo(imagem: Image.Image) -> Image.Image:
+    """Recorta as bordas claras (fundo, mesa, margens) em volta do boleto"""
+    mascara = imagem.point(lambda valor: 255 if valor < LIMIAR_CONTEUDO else 0)
+    caixa = mascara.getbbox()
+    if not caixa:
+        return imagem
+
+    esquerda, topo, direita, base = caixa
+    return imagem.crop(
+        (
+            max(esquerda - MARGEM_RECORTE, 0),
+            max(topo - MARGEM_RECORTE, 0),
+            min(direita + MARGEM_RECORTE, imagem.width),
+            min(base + MARGEM_RECORTE, imagem.height),
+        )
+    )
+
+
+def _comprimir_jpeg(imagem: Image.Image) -> bytes:
+    """Recomprime em JPEG, reduzindo qualidade e depois tamanho até caber no orçamento"""
+    while True:
+        for qualidade in QUALIDADES_JPEG:
+            saida = io.BytesIO()
+            imagem.save(saida, format="JPEG", quality=qualidade, optimize=True)
+            if saida.tell() <= PREPROCESSAMENTO_MAX_BYTES:
+                return saida.getvalue()
+
+        # Nem a pior qualidade coube: reduz a resolução e tenta de novo
+        if max(imagem.size) <= LADO_MAXIMO // 4:
+            return saida.getvalue()
+        imagem = imagem.resize(
+            (round(imagem.width * 0.75), round(imagem.height * 0.75)),
+            Image.Resampling.LANCZOS,
+        )
+
+
+def reduzir_imagem(imagem: Image.Image, dpi_origem: Optional[float] = None) -> bytes:
+    """
+    Prepara a imagem de um boleto para envio: orientação, tons de cinza,
+    recorte, redução para o DPI alvo e recompressão JPEG
+
+    Args:
+        imagem: Imagem do boleto (foto, digitalização ou página rasterizada)
+        dpi_origem: Resolução da imagem, se conhecida
+
+    Returns:
+        bytes: JPEG em tons de cinza dentro de PREPROCESSAMENTO_MAX_BYTES
+    """
+    # Fotos de celular costumam vir deitadas, com a rotação só no EXIF
+    imagem = ImageOps.exif_transpose(imagem)
+    imagem = _recortar_conteudo(imagem.convert("L"))
+
+    escala = 1.0
+    if dpi_origem and dpi_origem > PREPROCESSAMENTO_DPI:
+        escala = PREPROCESSAMENTO_DPI / dpi_origem
+    escala = min(escala, LADO_MAXIMO / max(imagem.size))
+    if escala < 1.0:
+        imagem = imagem.resize(
+            (
+                max(round(imagem.width * escala), 1),
+                max(round(imagem.height * escala), 1),
+            ),
+            Image.Resampling.LANCZOS,
+        )
+
+    return _comprimir_jpeg(imagem)
+
+
+def _rasterizar_pdf_sem_texto(arquivo_pdf_bytes: bytes) -> Optional[List[Image.Image]]:
+    """
+    Rasteriza cada página de um PDF só com imagem (digitalização) no DPI alvo
+
+    A camada de texto é detectada pela contagem de caracteres do pdfium, sem
+    parse de layout.
+
+    Returns:
+        List[Image] ou None: Uma imagem por página, ou None se o PDF tem
+        camada de texto (nesse caso é enviado como está)
+    """
+    with lock_pdfium:
+        documento = pypdfium2.PdfDocument(arquivo_pdf_bytes)
+        try:
+            for pagina in documento:
+                texto = pagina.get_textpage()
+                try:
+                    if texto.count_chars() > 0:
+                        return None
+                finally:
+                    texto.close()
+            paginas = [
+                pagina.render(scale=PREPROCESSAMENTO_DPI / 72, grayscale=True)
+                .to_pil()
+                .convert("L")
+                for pagina in documento
+            ]
+        finally:
+            documento.close()
+    return paginas or None
+
+
+def _montar_pdf_jpeg(paginas_jpeg: List[bytes]) -> bytes:
+    """
+    Monta um PDF com uma página por JPEG, no tamanho de PREPROCESSAMENTO_DPI
+
+    Os JPEGs são embutidos sem recompressão.
+    """
+    with lock_pdfium:
+        documento = pypdfium2.PdfDocument.new()
+        try:
+            for jpeg in paginas_jpeg:
+                with Image.open(io.BytesIO(jpeg)) as imagem:
+                    largura_px, altura_px = imagem.size
+                largura = largura_px * 72 / PREPROCESSAMENTO_DPI
+                altura = altura_px * 72 / PREPROCESSAMENTO_DPI
+
+                imagem_pdf = pypdfium2.PdfImage.new(documento)
+                imagem_pdf.load_jpeg(io.BytesIO(jpeg), inline=True)
+                imagem_pdf.set_matrix(pypdfium2.PdfMatrix().scale(largura, altura))
+                pagina = documento.new_page(largura, altura)
+                pagina.insert_obj(imagem_pdf)
+                pagina.gen_content()
+
+            saida = io.BytesIO()
+            documento.save(saida)
+            return saida.getvalue()
+        finally:
+            documento.close()
+
+
+def preparar_arquivo_envio(arquivo_bytes: bytes) -> Tuple[bytes, str, str]:
+    """
+    Reduz o arquivo do boleto antes do upload para o Gemini
+
+    PDFs com camada de texto seguem intactos. Imagens PNG/JPEG e PDFs só com
+    imagem são convertidos em JPEG em tons de cinza, recortado na região do
+    boleto, no DPI alvo e dentro do orçamento de bytes. O DPI, o tamanho e o
+    orçamento valem por página: uma digitalização de várias páginas vira um
+    PDF com uma página JPEG para cada. Se a versão reduzida não ficar menor,
+    o original é mantido.
+
+    Args:
+        arquivo_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+
+    Returns:
+        Tuple[bytes, str, str]: (bytes_para_envio, sufixo, mime_type)
+
+    Raises:
+        ValueError: Se o tipo do arquivo não é suportado
+    """
+    tipo = detectar_tipo_arquivo(arquivo_bytes)
+    if tipo is None:
+        raise ValueError("Formato não suportado: envie um PDF, PNG ou JPEG.")
+
+    original = (arquivo_bytes, SUFIXO_POR_TIPO[tipo], MIME_POR_TIPO[tipo])
+    try:
+        if tipo == "pdf":
+            paginas = _rasterizar_pdf_sem_texto(arquivo_bytes)
+            if paginas is None:
+                return original
+            paginas_jpeg = [
+                reduzir_imagem(pagina, PREPROCESSAMENTO_DPI) for pagina in paginas
+            ]
+            if len(paginas_jpeg) > 1:
+                reduzido = _montar_pdf_jpeg(paginas_jpeg)
+                if len(reduzido) >= len(arquivo_bytes):
+                    return original
+                return reduzido, SUFIXO_POR_TIPO["pdf"], MIME_POR_TIPO["pdf"]
+            reduzido = paginas_jpeg[0]
+        else:
+            with Image.open(io.BytesIO(arquivo_bytes)) as imagem:
+                dpi = imagem.info.get("dpi", (None,))[0]
+                reduzido = reduzir_imagem(imagem, dpi)
+    except Exception as e:
+        print(
+            f"Aviso: não foi possível pré-processar o arquivo, enviando o original: {e}"
+        )
+        return original
+
+    if len(reduzido) >= len(arquivo_bytes):
+        return original
+    return reduzido, SUFIXO_POR_TIPO["jpeg"], MIME_POR_TIPO["jpeg"]
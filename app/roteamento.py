@@ -0,0 +1,143 @@
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+from config.settings import (
+    GEMINI_LIMITE_LATENCIA,
+    GEMINI_LIMITE_TAXA_ERRO,
+    GEMINI_MODELOS_EXTRACAO,
+)
+
+
+class EstatisticasModelo:
+    """Latências e erros das últimas chamadas a um modelo (janela deslizante)"""
+
+    def __init__(self, janela: int):
+        self.latencias = deque(maxlen=janela)
+        self.erros = deque(maxlen=janela)
+        self.ultima_tentativa = 0.0
+        # True enquanto um modelo degradado está sendo sondado na sua posição
+        self.em_sonda = False
+
+    def taxa_erro(self) -> float:
+        return sum(self.erros) / len(self.erros) if self.erros else 0.0
+
+    def latencia_mediana(self) -> float:
+        return statistics.median(self.latencias) if self.latencias else 0.0
+
+
+class RoteadorModelos:
+    """
+    Escolhe a ordem em que os modelos de extração são tentados
+
+    Os modelos são configurados em níveis, do mais rápido/barato ao mais
+    robusto. A extração começa pelo primeiro nível e só escala para o próximo
+    quando a resposta não passa na validação. Um nível degradado (taxa de erro
+    ou latência mediana acima do limite na janela recente) é movido para o fim
+    da fila, e volta a ser sondado depois de `intervalo_sonda` segundos. Uma
+    sonda bem-sucedida descarta a janela do modelo, que volta de imediato à sua
+    posição em vez de esperar as falhas antigas saírem da janela.
+    """
+
+    def __init__(
+        self,
+        modelos: List[str] = None,
+        janela: int = 50,
+        minimo_amostras: int = 5,
+        limite_taxa_erro: float = GEMINI_LIMITE_TAXA_ERRO,
+        limite_latencia: float = GEMINI_LIMITE_LATENCIA,
+        intervalo_sonda: float = 60.0,
+    ):
+        """
+        Args:
+            modelos: Modelos em ordem de escalonamento. Se None, usa GEMINI_MODELOS_EXTRACAO
+            janela: Número de chamadas recentes consideradas por modelo
+            minimo_amostras: Chamadas necessárias antes de considerar um modelo degradado
+            limite_taxa_erro: Taxa de erro (0.0 a 1.0) a partir da qual o modelo é degradado
+            limite_latencia: Latência mediana (segundos) a partir da qual o modelo é degradado
+            intervalo_sonda: Segundos até tentar de novo um modelo degradado na sua posição
+        """
+        self.modelos = list(modelos or GEMINI_MODELOS_EXTRACAO)
+        self.minimo_amostras = minimo_amostras
+        self.limite_taxa_erro = limite_taxa_erro
+        self.limite_latencia = limite_latencia
+        self.intervalo_sonda = intervalo_sonda
+        self._estatisticas = {m: EstatisticasModelo(janela) for m in self.modelos}
+        self._lock = threading.Lock()
+
+    def registrar(self, modelo: str, latencia: float, erro: bool):
+        """
+        Registra o resultado de uma chamada
+
+        Args:
+            modelo: Modelo chamado
+            latencia: Duração da chamada, em segundos
+            erro: True se a chamada falhou (exceção da API ou resposta ilegível)
+        """
+        with self._lock:
+            estatisticas = self._estatisticas.get(modelo)
+            if estatisticas is None:
+                return
+            if estatisticas.em_sonda:
+                estatisticas.em_sonda = False
+                if not erro and latencia <= self.limite_latencia:
+                    estatisticas.latencias.clear()
+                    estatisticas.erros.clear()
+            estatisticas.latencias.append(latencia)
+            estatisticas.erros.append(erro)
+
+    def _acima_dos_limites(self, estatisticas: EstatisticasModelo) -> bool:
+        if len(estatisticas.erros) < self.minimo_amostras:
+            return False
+        return (
+            estatisticas.taxa_erro() > self.limite_taxa_erro
+            or estatisticas.latencia_mediana() > self.limite_latencia
+        )
+
+    def ordem_tentativas(self) -> List[str]:
+        """
+        Retorna os modelos na ordem em que devem ser tentados
+
+        Returns:
+            List[str]: Modelos saudáveis em ordem de nível, seguidos dos degradados
+        """
+        agora = time.monotonic()
+        with self._lock:
+            saudaveis = []
+            degradados = []
+            for modelo in self.modelos:
+                estatisticas = self._estatisticas[modelo]
+                if self._acima_dos_limites(estatisticas):
+                    if agora - estatisticas.ultima_tentativa < self.intervalo_sonda:
+                        degradados.append(modelo)
+                        continue
+                    # Sonda: devolve o modelo à sua posição para medir se recuperou
+                    estatisticas.em_sonda = True
+                saudaveis.append(modelo)
+                estatisticas.ultima_tentativa = agora
+            return saudaveis + degradados
+
+    def obter_estatisticas(self) -> Dict[str, Dict]:
+        """
+        Resumo das estatísticas de cada modelo
+
+        Returns:
+            Dict[str, Dict]: Modelo -> {chamadas, taxa_erro, latencia_mediana,
+            degradado}
+        """
+        with self._lock:
+            return {
+                modelo: {
+                    "chamadas": len(estatisticas.erros),
+                    "taxa_erro": estatisticas.taxa_erro(),
+                    "latencia_mediana": estatisticas.latencia_mediana(),
+                    "degradado": self._acima_dos_limites(estatisticas),
+                }
+                for modelo, estatisticas in self._estatisticas.items()
+            }
+
+
+# Instância global para uso no projeto
+roteador = RoteadorModelos()
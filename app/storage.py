@@ -1,8 +1,16 @@
 import json
 import os
+import threading
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from app.deduplicacao import chave_boleto
+from app.validacao import somente_digitos
+
+
+class ContaJaExistente(Exception):
+    """Já existe uma conta de referência com o apelido informado"""
+
 
 class ContaReferenciaStorage:
     """Classe para gerenciar o armazenamento de contas de referência"""
@@ -16,25 +24,58 @@ class ContaReferenciaStorage:
         """
         self.arquivo_storage = arquivo_storage or "data/contas_referencia.json"
 
-        # Cria diretório se não existir
-        os.makedirs(os.path.dirname(self.arquivo_storage), exist_ok=True)
+        # Serializa leitura-modificação-escrita entre sessões/requisições concorrentes
+        self._lock = threading.RLock()
+
+        # Dados do arquivo e índice de boletos por hash, recarregados quando o
+        # arquivo muda
+        self._dados_cache = None
+        self._indice_cache = None
 
-        # Inicializa arquivo se não existir
-        if not os.path.exists(self.arquivo_storage):
-            self._salvar_dados({})
+        # O diretório e o arquivo só são criados na primeira escrita: abrir o
+        # storage de um tenant (ex: numa consulta) não cria a partição
+
+    def _versao_arquivo(self, arquivo: Optional[str] = None) -> Optional[tuple]:
+        """Identifica a versão do arquivo de storage (None se não existe)"""
+        try:
+            estado = os.stat(arquivo or self.arquivo_storage)
+        except FileNotFoundError:
+            return None
+        # A escrita atômica troca o arquivo: o inode muda mesmo quando o mtime
+        # não avança (resolução grossa do sistema de arquivos)
+        return (estado.st_mtime_ns, estado.st_size, estado.st_ino)
 
     def _carregar_dados(self) -> Dict:
-        """Carrega dados do arquivo"""
+        """
+        Carrega dados do arquivo
+
+        O conteúdo é relido apenas quando o arquivo muda; o dicionário retornado
+        é compartilhado e não deve ser alterado (quem escreve trabalha numa cópia).
+        """
+        versao = self._versao_arquivo()
+        cache = self._dados_cache
+        if cache is not None and cache["versao"] == versao:
+            return cache["dados"]
+
         try:
             with open(self.arquivo_storage, "r", encoding="utf-8") as f:
-                return json.load(f)
+                dados = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+            dados = {}
+
+        self._dados_cache = {"versao": versao, "dados": dados}
+        return dados
 
     def _salvar_dados(self, dados: Dict):
-        """Salva dados no arquivo"""
-        with open(self.arquivo_storage, "w", encoding="utf-8") as f:
+        """Salva dados no arquivo (escrita atômica: leitores nunca veem arquivo parcial)"""
+        os.makedirs(os.path.dirname(self.arquivo_storage) or ".", exist_ok=True)
+        arquivo_temporario = f"{self.arquivo_storage}.tmp"
+        with open(arquivo_temporario, "w", encoding="utf-8") as f:
             json.dump(dados, f, ensure_ascii=False, indent=2)
+        # O rename preserva inode e mtime: a versão do temporário é a do novo arquivo
+        versao = self._versao_arquivo(arquivo_temporario)
+        os.replace(arquivo_temporario, self.arquivo_storage)
+        self._dados_cache = {"versao": versao, "dados": dados}
 
     def salvar_conta_referencia(
         self, apelido_conta: str, boletos_dados: List[Dict]
@@ -48,6 +89,11 @@ class ContaReferenciaStorage:
 
         Returns:
             bool: True se salvou com sucesso
+
+        Raises:
+            ContaJaExistente: Se o apelido já está em uso (checado sob o lock,
+                junto com a escrita, para que cadastros simultâneos não se
+                sobrescrevam)
         """
         if not boletos_dados or len(boletos_dados) < 2:
             return False
@@ -65,14 +111,17 @@ class ContaReferenciaStorage:
             "boletos_referencia": boletos_dados,  # Todos os boletos para comparação
         }
 
-        # Carrega dados existentes
-        dados = self._carregar_dados()
+        with self._lock:
+            # Carrega dados existentes (cópia: o cache é compartilhado com leitores)
+            dados = dict(self._carregar_dados())
+            if apelido_conta in dados:
+                raise ContaJaExistente(apelido_conta)
 
-        # Salva nova conta
-        dados[apelido_conta] = conta_referencia
+            # Salva nova conta
+            dados[apelido_conta] = conta_referencia
 
-        # Persiste no arquivo
-        self._salvar_dados(dados)
+            # Persiste no arquivo
+            self._salvar_dados(dados)
         return True
 
     def obter_conta_referencia(self, apelido_conta: str) -> Optional[Dict]:
@@ -111,20 +160,33 @@ class ContaReferenciaStorage:
             List[Dict]: Lista de contas de referência (dados resumidos)
         """
         dados = self._carregar_dados()
-        contas_resumidas = []
+        return [self._resumir_conta(conta) for conta in dados.values()]
+
+    def obter_resumo_conta(self, apelido_conta: str) -> Optional[Dict]:
+        """
+        Obtém os dados resumidos de uma conta (sem os boletos completos)
 
-        for conta in dados.values():
-            conta_resumida = {
-                "apelido_conta": conta.get("apelido_conta"),
-                "nome_beneficiario": conta.get("nome_beneficiario"),
-                "documento_beneficiario": conta.get("documento_beneficiario"),
-                "codigo_banco_emissor": conta.get("codigo_banco_emissor"),
-                "numero_boletos_base": conta.get("numero_boletos_base"),
-                "data_criacao": conta.get("data_criacao"),
-            }
-            contas_resumidas.append(conta_resumida)
+        Args:
+            apelido_conta: Nome/apelido da conta
 
-        return contas_resumidas
+        Returns:
+            Dict ou None: Dados resumidos da conta ou None se não encontrada
+        """
+        conta = self.obter_conta_referencia(apelido_conta)
+        if conta:
+            return self._resumir_conta(conta)
+        return None
+
+    def _resumir_conta(self, conta: Dict) -> Dict:
+        """Extrai os campos de identificação de uma conta"""
+        return {
+            "apelido_conta": conta.get("apelido_conta"),
+            "nome_beneficiario": conta.get("nome_beneficiario"),
+            "documento_beneficiario": conta.get("documento_beneficiario"),
+            "codigo_banco_emissor": conta.get("codigo_banco_emissor"),
+            "numero_boletos_base": conta.get("numero_boletos_base"),
+            "data_criacao": conta.get("data_criacao"),
+        }
 
     def remover_conta_referencia(self, apelido_conta: str) -> bool:
         """
@@ -136,13 +198,89 @@ class ContaReferenciaStorage:
         Returns:
             bool: True se removeu com sucesso
         """
-        dados = self._carregar_dados()
-        if apelido_conta in dados:
-            del dados[apelido_conta]
-            self._salvar_dados(dados)
-            return True
+        with self._lock:
+            dados = dict(self._carregar_dados())
+            if apelido_conta in dados:
+                del dados[apelido_conta]
+                self._salvar_dados(dados)
+                return True
         return False
 
+    def _indice_boletos(self) -> Dict:
+        """
+        Índice dos boletos de referência pelo hash do arquivo, pela chave de
+        quase-duplicata (chave_boleto) e pela linha digitável
+
+        Reconstruído apenas quando o arquivo de storage muda.
+        """
+        versao = self._versao_arquivo()
+
+        indice = self._indice_cache
+        if indice is not None and indice["versao"] == versao:
+            return indice
+
+        indice = {"versao": versao, "hash": {}, "chave": {}, "linha": {}}
+        for apelido_conta, conta in self._carregar_dados().items():
+            for boleto in conta.get("boletos_referencia", []):
+                entrada = {"apelido_conta": apelido_conta, "boleto": boleto}
+                if boleto.get("hash_conteudo"):
+                    indice["hash"][boleto["hash_conteudo"]] = entrada
+                chave = chave_boleto(boleto)
+                if chave:
+                    indice["chave"][chave] = entrada
+                linha_digitavel = somente_digitos(boleto.get("linha_digitavel"))
+                if linha_digitavel:
+                    indice["linha"][linha_digitavel] = entrada
+
+        self._indice_cache = indice
+        return indice
+
+    def localizar_boleto_por_hash(self, hash_conteudo: str) -> Optional[Dict]:
+        """
+        Localiza um boleto de referência já cadastrado pelo hash do arquivo
+
+        Args:
+            hash_conteudo: Hash SHA-256 do arquivo
+
+        Returns:
+            Dict ou None: {"apelido_conta", "boleto"} ou None se não cadastrado
+        """
+        return self._indice_boletos()["hash"].get(hash_conteudo)
+
+    def localizar_boleto_por_linha(
+        self, linhas_digitaveis: List[str]
+    ) -> Optional[Dict]:
+        """
+        Localiza um boleto de referência já cadastrado pela linha digitável
+
+        Encontra o mesmo boleto em outro arquivo (reimpressão, nova
+        digitalização) a partir das linhas lidas localmente, sem chamar a IA.
+
+        Args:
+            linhas_digitaveis: Linhas digitáveis lidas do arquivo
+
+        Returns:
+            Dict ou None: {"apelido_conta", "boleto"} ou None se não cadastrado
+        """
+        indice = self._indice_boletos()["linha"]
+        for linha_digitavel in linhas_digitaveis:
+            entrada = indice.get(somente_digitos(linha_digitavel))
+            if entrada:
+                return entrada
+        return None
+
+    def localizar_boleto_por_chave(self, chave: Optional[str]) -> Optional[Dict]:
+        """
+        Localiza um boleto de referência já cadastrado pela chave_boleto
+
+        Args:
+            chave: Chave de quase-duplicata (nosso número + linha digitável)
+
+        Returns:
+            Dict ou None: {"apelido_conta", "boleto"} ou None se não cadastrado
+        """
+        return self._indice_boletos()["chave"].get(chave) if chave else None
+
     def conta_existe(self, apelido_conta: str) -> bool:
         """
         Verifica se uma conta existe
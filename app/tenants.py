@@ -0,0 +1,134 @@
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from app.ledger import LedgerVerificacoes, ledger
+from app.storage import ContaReferenciaStorage, storage
+from config.settings import TENANTS_DIRETORIO
+
+# Nome de tenant: vira nome de diretório, então só minúsculas, dígitos, "_" e "-"
+PADRAO_TENANT = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# Partições já abertas no processo (cada uma com seu lock, índice e conexões)
+_storages: Dict[str, ContaReferenciaStorage] = {}
+_ledgers: Dict[str, LedgerVerificacoes] = {}
+_lock_particoes = threading.Lock()
+
+
+class TenantNaoEncontrado(Exception):
+    """O tenant não tem partição neste nó (nenhuma conta cadastrada)"""
+
+
+def validar_tenant(tenant: str) -> str:
+    """
+    Valida o nome de um tenant
+
+    Args:
+        tenant: Identificador do tenant (ex: "acme", "cliente-42")
+
+    Returns:
+        str: Nome do tenant validado
+
+    Raises:
+        ValueError: Se o nome não segue PADRAO_TENANT
+    """
+    if not isinstance(tenant, str) or not PADRAO_TENANT.match(tenant):
+        raise ValueError(
+            f"Tenant inválido: '{tenant}'. Use de 1 a 64 letras minúsculas, "
+            "dígitos, '_' ou '-', começando por letra ou dígito."
+        )
+    return tenant
+
+
+def diretorio_tenant(tenant: str) -> str:
+    """
+    Diretório da partição de um tenant
+
+    Contém tudo o que pertence ao tenant (contas de referência e ledger);
+    mover o tenant para outro nó é copiar este diretório.
+    """
+    return os.path.join(TENANTS_DIRETORIO, validar_tenant(tenant))
+
+
+def tenant_existe(tenant: str) -> bool:
+    """
+    Indica se o tenant tem partição neste nó
+
+    A partição é criada no primeiro cadastro de conta do tenant.
+    """
+    return os.path.isdir(diretorio_tenant(tenant))
+
+
+def obter_storage(
+    tenant: Optional[str] = None, criar: bool = False
+) -> ContaReferenciaStorage:
+    """
+    Retorna o storage de contas de referência do tenant
+
+    Args:
+        tenant: Identificador do tenant. Se None, usa o storage global
+        criar: Aceita um tenant ainda sem partição (cadastro de conta); o
+            diretório só é criado quando a primeira conta é salva
+
+    Returns:
+        ContaReferenciaStorage: Storage isolado do tenant
+
+    Raises:
+        TenantNaoEncontrado: Se o tenant não tem partição e criar é False
+    """
+    if tenant is None:
+        return storage
+    if not criar and not tenant_existe(tenant):
+        raise TenantNaoEncontrado(tenant)
+
+    with _lock_particoes:
+        if tenant not in _storages:
+            _storages[tenant] = ContaReferenciaStorage(
+                os.path.join(diretorio_tenant(tenant), "contas_referencia.json")
+            )
+        return _storages[tenant]
+
+
+def obter_ledger(tenant: Optional[str] = None) -> LedgerVerificacoes:
+    """
+    Retorna o ledger de verificações do tenant
+
+    Args:
+        tenant: Identificador do tenant. Se None, usa o ledger global
+
+    Returns:
+        LedgerVerificacoes: Ledger isolado do tenant
+
+    Raises:
+        TenantNaoEncontrado: Se o tenant não tem partição (nenhuma conta
+            cadastrada), para que consultas não criem partições vazias
+    """
+    if tenant is None:
+        return ledger
+    if not tenant_existe(tenant):
+        raise TenantNaoEncontrado(tenant)
+
+    with _lock_particoes:
+        if tenant not in _ledgers:
+            _ledgers[tenant] = LedgerVerificacoes(
+                os.path.join(diretorio_tenant(tenant), "verificacoes.db")
+            )
+        return _ledgers[tenant]
+
+
+def listar_tenants() -> List[str]:
+    """
+    Lista os tenants com partição criada neste nó
+
+    Returns:
+        List[str]: Nomes dos tenants, em ordem alfabética
+    """
+    if not os.path.isdir(TENANTS_DIRETORIO):
+        return []
+    return sorted(
+        nome
+        for nome in os.listdir(TENANTS_DIRETORIO)
+        if PADRAO_TENANT.match(nome)
+        and os.path.isdir(os.path.join(TENANTS_DIRETORIO, nome))
+    )
@@ -3,12 +3,14 @@ from typing import Dict
 import traceback
 
 # Imports internos
-from app.gemini_integration import (
-    extrair_dados_boleto,
-    analisar_fraude_boleto,
-    processar_multiplos_boletos_referencia,
-)
-from app.storage import storage
+from app.perfilamento import perfilar
+from app.ledger import LedgerVerificacoes, ledger
+from app.storage import ContaReferenciaStorage, storage
+from app.tenants import obter_ledger, obter_storage, tenant_existe, validar_tenant
+from app.verificacao import cadastrar_conta_referencia, verificar_carne
+
+# PDFs, fotos e digitalizações (imagens são reduzidas antes do envio ao Gemini)
+TIPOS_ARQUIVO_ACEITOS = ["pdf", "png", "jpg", "jpeg"]
 
 
 def mostrar_dados_boleto(
@@ -48,11 +50,13 @@ def mostrar_dados_boleto(
         st.json(dados)
 
 
-def mostrar_contas_referencia_cadastradas():
+def mostrar_contas_referencia_cadastradas(
+    storage_contas: ContaReferenciaStorage = storage,
+):
     """Mostra as contas de referência cadastradas"""
     st.subheader("Contas de Referência Cadastradas")
 
-    contas = storage.listar_contas_referencia()
+    contas = storage_contas.listar_contas_referencia()
 
     if contas:
         for conta in contas:
@@ -75,7 +79,9 @@ def mostrar_contas_referencia_cadastradas():
 
                 with col2:
                     if st.button("🗑️ Remover", key=f"remove_{conta['apelido_conta']}"):
-                        if storage.remover_conta_referencia(conta["apelido_conta"]):
+                        if storage_contas.remover_conta_referencia(
+                            conta["apelido_conta"]
+                        ):
                             st.success(f"Conta '{conta['apelido_conta']}' removida!")
                             st.rerun()
                         else:
@@ -84,12 +90,13 @@ def mostrar_contas_referencia_cadastradas():
         st.info("Nenhuma conta de referência cadastrada ainda.")
 
 
-def aba_cadastrar_referencia_conta():
+def aba_cadastrar_referencia_conta(storage_contas: ContaReferenciaStorage = storage):
     """Aba para cadastrar conta de referência"""
     st.header("📁 Cadastre uma Conta de Referência")
     st.markdown(
         """
         Faça upload de **pelo menos 2 boletos ORIGINAIS** da mesma conta, preferencialmente de meses diferentes.
+        Um carnê em PDF com vários boletos também serve: cada página (ou boleto da página) conta como um boleto.
         Estes boletos serão usados como referência para detectar fraudes.
         
         ⚠️ **IMPORTANTE**: Use apenas boletos que você tem certeza absoluta que são legítimos!
@@ -104,8 +111,8 @@ def aba_cadastrar_referencia_conta():
         )
 
         uploaded_files_referencia = st.file_uploader(
-            "Selecione os PDFs dos boletos ORIGINAIS (pelo menos 2)",
-            type=["pdf"],
+            "Selecione os boletos ORIGINAIS em PDF ou imagem (pelo menos 2, ou um carnê)",
+            type=TIPOS_ARQUIVO_ACEITOS,
             accept_multiple_files=True,
             key="files_referencia_cad",
             help="Faça upload de boletos que você tem certeza que são legítimos. Quanto mais boletos, melhor a detecção.",
@@ -120,18 +127,14 @@ def aba_cadastrar_referencia_conta():
             st.warning("⚠️ Por favor, forneça um nome para a conta de referência.")
             return
 
-        if not uploaded_files_referencia or len(uploaded_files_referencia) < 2:
-            st.warning("⚠️ Por favor, selecione pelo menos 2 arquivos PDF.")
-            return
-
-        if storage.conta_existe(apelido_conta):
-            st.error(
-                f"❌ Já existe uma conta com o nome '{apelido_conta}'. Escolha outro nome."
-            )
+        if not uploaded_files_referencia:
+            st.warning("⚠️ Por favor, selecione pelo menos 2 arquivos ou um carnê.")
             return
 
         # Processa os boletos
-        with st.spinner(f"🔄 Processando {len(uploaded_files_referencia)} boletos..."):
+        with st.spinner(
+            f"🔄 Processando {len(uploaded_files_referencia)} arquivo(s)..."
+        ):
             try:
                 # Prepara arquivos para processamento
                 arquivos_para_processar = []
@@ -139,19 +142,23 @@ def aba_cadastrar_referencia_conta():
                     arquivo_bytes = uploaded_file.read()
                     arquivos_para_processar.append((arquivo_bytes, uploaded_file.name))
 
-                # Processa boletos com Gemini
-                boletos_dados, sucesso = processar_multiplos_boletos_referencia(
-                    arquivos_para_processar
+                # Processa boletos com Gemini e salva a conta de referência
+                cadastro, sucesso = cadastrar_conta_referencia(
+                    apelido_conta,
+                    arquivos_para_processar,
+                    storage_contas=storage_contas,
                 )
 
-                if not sucesso or not boletos_dados:
-                    st.error(
-                        "❌ Erro ao processar os boletos. Verifique se os arquivos são PDFs válidos."
-                    )
-                    return
+                avisos_duplicados = [
+                    f"⚠️ {duplicado['nome_arquivo']}: {duplicado['motivo']} "
+                    f"({duplicado['duplicado_de']})"
+                    for duplicado in cadastro.get("duplicados", [])
+                ]
+                for aviso in avisos_duplicados:
+                    st.warning(aviso)
 
-                # Salva a conta de referência
-                if storage.salvar_conta_referencia(apelido_conta, boletos_dados):
+                if sucesso:
+                    boletos_dados = cadastro["boletos"]
                     st.success(f"✅ Conta '{apelido_conta}' salva com sucesso!")
 
                     # Mostra resumo
@@ -176,17 +183,23 @@ def aba_cadastrar_referencia_conta():
                                 boleto, f"Boleto {i+1}", mostrar_expander=False
                             )
 
+                    # O st.rerun apaga o que foi exibido nesta execução; os avisos
+                    # de duplicados são guardados para aparecer na próxima
+                    st.session_state["avisos_cadastro"] = avisos_duplicados
                     st.rerun()
                 else:
-                    st.error("❌ Erro ao salvar a conta de referência.")
+                    st.error(f"❌ {cadastro['erro']}")
 
             except Exception as e:
                 st.error(f"❌ Erro inesperado: {str(e)}")
                 with st.expander("Ver detalhes do erro"):
                     st.code(traceback.format_exc())
 
+    for aviso in st.session_state.pop("avisos_cadastro", []):
+        st.warning(aviso)
+
     st.divider()
-    mostrar_contas_referencia_cadastradas()
+    mostrar_contas_referencia_cadastradas(storage_contas)
 
 
 def mostrar_resultado_analise(resultado: Dict):
@@ -231,13 +244,51 @@ def mostrar_resultado_analise(resultado: Dict):
             st.write(f"• {ponto}")
 
 
-def aba_verificar_novo_boleto():
+def mostrar_verificacao(verificacao: Dict):
+    """Mostra o resultado da verificação de um boleto"""
+    if not verificacao["sucesso"]:
+        st.error(f"❌ {verificacao['erro']}")
+        return
+
+    if verificacao.get("etapa_decisiva") == "bloqueio":
+        st.info("⚡ Este arquivo já foi reprovado em uma verificação anterior.")
+    elif verificacao.get("etapa_decisiva") == "duplicado":
+        st.info(
+            "♻️ Este boleto já foi verificado nesta conta; o resultado anterior foi reaproveitado."
+        )
+    elif verificacao.get("etapa_decisiva"):
+        st.info(
+            "⚡ Fraude detectada na leitura local do PDF, sem aguardar a extração por IA."
+        )
+
+    campos_invalidos = verificacao.get("campos_invalidos")
+    if campos_invalidos:
+        st.warning(
+            "⚠️ Nenhum modelo conseguiu ler estes campos de forma válida: "
+            + ", ".join(campos_invalidos)
+        )
+
+    # Mostra dados extraídos
+    st.subheader("📄 Dados Extraídos do Boleto")
+    mostrar_dados_boleto(verificacao["dados_boleto"])
+
+    # Mostra resultado da análise
+    st.divider()
+    mostrar_resultado_analise(verificacao["resultado"])
+
+
+def aba_verificar_novo_boleto(
+    storage_contas: ContaReferenciaStorage = storage,
+    ledger_verificacoes: LedgerVerificacoes = ledger,
+):
     """Aba para verificar um novo boleto"""
     st.header("🔍 Verifique um Novo Boleto")
-    st.markdown("Faça o upload de um boleto para verificar se é fraudulento.")
+    st.markdown(
+        "Faça o upload de um boleto (ou de um carnê com vários boletos) para verificar se é fraudulento."
+    )
 
     # Selecionar conta de referência
-    contas_referencia = storage.listar_contas_referencia()
+    contas_referencia = storage_contas.listar_contas_referencia()
 
     if not contas_referencia:
         st.warning(
@@ -255,57 +306,46 @@ def aba_verificar_novo_boleto():
     )
 
     uploaded_file_verificar = st.file_uploader(
-        "Selecione o PDF do boleto para verificar",
-        type=["pdf"],
+        "Selecione o boleto para verificar (PDF, foto ou digitalização)",
+        type=TIPOS_ARQUIVO_ACEITOS,
         key="file_verificar",
         help="Faça upload do boleto que você suspeita que pode ser fraudulento",
     )
 
     if st.button("🚀 Analisar Boleto", key="btn_analisar"):
         if not uploaded_file_verificar:
-            st.warning("⚠️ Por favor, selecione um arquivo PDF para verificar.")
+            st.warning("⚠️ Por favor, selecione um arquivo para verificar.")
             return
 
         with st.spinner("🔄 Analisando boleto com IA..."):
             try:
-                # Extrai dados do novo boleto
+                # Extrai dados do novo boleto e compara com as referências
                 arquivo_bytes = uploaded_file_verificar.read()
-                dados_boleto_novo, sucesso_extracao = extrair_dados_boleto(
-                    arquivo_bytes
+                verificacao, sucesso = verificar_carne(
+                    conta_selecionada,
+                    arquivo_bytes,
+                    storage_contas=storage_contas,
+                    ledger_verificacoes=ledger_verificacoes,
                 )
 
-                if not sucesso_extracao:
-                    st.error(
-                        "❌ Erro ao processar o boleto. Verifique se o arquivo é um PDF válido."
-                    )
-                    return
-
-                # Mostra dados extraídos
-                st.subheader("📄 Dados Extraídos do Boleto")
-                mostrar_dados_boleto(dados_boleto_novo)
-
-                # Obtém boletos de referência
-                boletos_referencia = storage.obter_boletos_referencia(conta_selecionada)
-
-                if not boletos_referencia:
-                    st.error(
-                        f"❌ Erro: boletos de referência não encontrados para '{conta_selecionada}'"
-                    )
+                if not sucesso:
+                    st.error(f"❌ {verificacao['erro']}")
                     return
 
-                # Analisa fraude usando Gemini
-                st.divider()
-                with st.spinner("🤖 Análise de fraude em progresso..."):
-                    resultado_analise, sucesso_analise = analisar_fraude_boleto(
-                        boletos_referencia, dados_boleto_novo
+                partes = verificacao["verificacoes"]
+                if len(partes) == 1:
+                    mostrar_verificacao(partes[0])
+                else:
+                    st.info(
+                        f"📚 Carnê com {len(partes)} boletos: cada um foi verificado separadamente."
                     )
-
-                if not sucesso_analise:
-                    st.error("❌ Erro ao analisar o boleto para detecção de fraude.")
-                    return
-
-                # Mostra resultado da análise
-                mostrar_resultado_analise(resultado_analise)
+                    for parte in partes:
+                        st.divider()
+                        titulo = f"📑 Boleto da página {parte['pagina']}"
+                        if parte["regiao"] is not None:
+                            titulo += f" ({parte['regiao']}º da página)"
+                        st.subheader(titulo)
+                        mostrar_verificacao(parte)
 
                 # Aviso final
                 st.divider()
@@ -320,8 +360,33 @@ def aba_verificar_novo_boleto():
                     st.code(traceback.format_exc())
 
 
+def selecionar_tenant():
+    """Campo da barra lateral para escolher a empresa (tenant)"""
+    tenant = st.sidebar.text_input(
+        "🏢 Empresa (tenant)",
+        key="tenant",
+        help="Cada empresa tem contas de referência e histórico próprios. "
+        "Deixe em branco para usar o armazenamento padrão.",
+    ).strip()
+    if not tenant:
+        return None
+
+    try:
+        return validar_tenant(tenant)
+    except ValueError as e:
+        st.sidebar.error(f"❌ {e}")
+        st.stop()
+
+
 def rodar_ui():
     """Função principal para executar a interface"""
+    # Cada rerun do Streamlit é perfilado quando PERFILAMENTO está ativo
+    with perfilar("rerun"):
+        _renderizar_ui()
+
+
+def _renderizar_ui():
+    """Renderiza a interface (executado a cada rerun do Streamlit)"""
     st.set_page_config(
         page_title="ValidaJá! - Detector de Boletos Fraudulentos",
         page_icon="🔍",
@@ -344,9 +409,9 @@ def rodar_ui():
 
     # Verificações iniciais
     if not st.session_state.get("gemini_api_key_checked"):
-        from config.settings import GEMINI_API_KEY
+        from app.gemini_integration import cliente_disponivel
 
-        if not GEMINI_API_KEY:
+        if not cliente_disponivel():
             st.error(
                 "❌ **GEMINI_API_KEY não configurada!** "
                 "Configure a variável de ambiente GEMINI_API_KEY no arquivo .env"
@@ -354,16 +419,35 @@ def rodar_ui():
             st.stop()
         st.session_state.gemini_api_key_checked = True
 
+    # Empresa (tenant) cujas contas e histórico serão usados
+    tenant = selecionar_tenant()
+    if tenant is None or tenant_existe(tenant):
+        storage_contas = obter_storage(tenant)
+        ledger_verificacoes = obter_ledger(tenant)
+    else:
+        # Empresa nova (ou nome digitado errado): nada é criado em disco até o
+        # primeiro cadastro de conta
+        st.sidebar.info(
+            f"ℹ️ A empresa '{tenant}' ainda não tem contas. Ela será criada no primeiro cadastro."
+        )
+        storage_contas = obter_storage(tenant, criar=True)
+        ledger_verificacoes = None
+
     # Tabs principais
     tab_cadastrar, tab_verificar = st.tabs(
         ["📁 Cadastrar Conta de Referência", "🔍 Verificar Novo Boleto"]
     )
 
     with tab_cadastrar:
-        aba_cadastrar_referencia_conta()
+        aba_cadastrar_referencia_conta(storage_contas)
 
     with tab_verificar:
-        aba_verificar_novo_boleto()
+        if ledger_verificacoes is None:
+            st.warning(
+                "⚠️ Você precisa cadastrar pelo menos uma conta de referência antes de verificar boletos."
+            )
+        else:
+            aba_verificar_novo_boleto(storage_contas, ledger_verificacoes)
 
     # Footer
     st.markdown("---")
@@ -0,0 +1,184 @@
+import re
+from datetime import datetime
+from typing import Dict, Optional
+
+from pydantic import ValidationError
+
+# Campos obrigatórios do BoletoSchema que o modelo costuma preencher com "N/A"
+CAMPOS_OBRIGATORIOS = [
+    "nome_beneficiario",
+    "documento_beneficiario",
+    "codigo_banco_emissor",
+    "linha_digitavel",
+    "data_vencimento",
+    "valor_documento",
+]
+
+VALORES_AUSENTES = {"", "N/A", "NA", "NULL", "NONE"}
+
+
+def somente_digitos(texto: Optional[str]) -> str:
+    """Remove tudo que não for dígito"""
+    return re.sub(r"\D", "", texto or "")
+
+
+def modulo_10(numero: str) -> int:
+    """Dígito verificador módulo 10 (pesos 2 e 1 da direita para a esquerda)"""
+    total = 0
+    for i, digito in enumerate(reversed(numero)):
+        produto = int(digito) * (2 if i % 2 == 0 else 1)
+        total += produto // 10 + produto % 10
+    return (10 - total % 10) % 10
+
+
+def modulo_11(numero: str) -> int:
+    """Dígito verificador geral do boleto bancário (módulo 11, pesos 2 a 9)"""
+    total = 0
+    peso = 2
+    for digito in reversed(numero):
+        total += int(digito) * peso
+        peso = 2 if peso == 9 else peso + 1
+    dv = 11 - total % 11
+    return 1 if dv in (0, 10, 11) else dv
+
+
+def _modulo_11_arrecadacao(numero: str) -> int:
+    """Dígito verificador módulo 11 usado nos boletos de arrecadação (convênios)"""
+    total = 0
+    peso = 2
+    for digito in reversed(numero):
+        total += int(digito) * peso
+        peso = 2 if peso == 9 else peso + 1
+    resto = total % 11
+    return 0 if resto in (0, 1) else 11 - resto
+
+
+def codigo_barras_valido(codigo_barras: str) -> bool:
+    """
+    Verifica o dígito geral de um código de barras de 44 dígitos (bancário ou arrecadação)
+
+    Args:
+        codigo_barras: Código de barras (com ou sem formatação)
+
+    Returns:
+        bool: True se o dígito verificador confere
+    """
+    digitos = somente_digitos(codigo_barras)
+    if len(digitos) != 44:
+        return False
+
+    if digitos[0] == "8":
+        # Arrecadação: DV na 4ª posição, módulo definido pelo 3º dígito
+        calcular_dv = modulo_10 if digitos[2] in "67" else _modulo_11_arrecadacao
+        return calcular_dv(digitos[:3] + digitos[4:]) == int(digitos[3])
+
+    return modulo_11(digitos[:4] + digitos[5:]) == int(digitos[4])
+
+
+def linha_digitavel_valida(linha_digitavel: str) -> bool:
+    """
+    Verifica os dígitos verificadores de uma linha digitável
+
+    Aceita boletos bancários (47 dígitos) e de arrecadação/convênio (48 dígitos).
+
+    Args:
+        linha_digitavel: Linha digitável (com ou sem formatação)
+
+    Returns:
+        bool: True se todos os dígitos verificadores conferem
+    """
+    digitos = somente_digitos(linha_digitavel)
+
+    if len(digitos) == 47:
+        campos = [
+            (digitos[0:9], digitos[9]),
+            (digitos[10:20], digitos[20]),
+            (digitos[21:31], digitos[31]),
+        ]
+        if any(modulo_10(campo) != int(dv) for campo, dv in campos):
+            return False
+        return codigo_barras_valido(linha_para_codigo_barras(digitos))
+
+    if len(digitos) == 48:
+        # Quatro blocos de 11 dígitos + DV; o 3º dígito define o módulo (6/7 = 10, 8/9 = 11)
+        calcular_dv = modulo_10 if digitos[2] in "67" else _modulo_11_arrecadacao
+        blocos = [digitos[i : i + 12] for i in range(0, 48, 12)]
+        return all(calcular_dv(bloco[:11]) == int(bloco[11]) for bloco in blocos)
+
+    return False
+
+
+def linha_para_codigo_barras(linha_digitavel: str) -> str:
+    """Converte uma linha digitável bancária (47 dígitos) no código de barras (44)"""
+    d = somente_digitos(linha_digitavel)
+    return d[0:4] + d[32] + d[33:47] + d[4:9] + d[10:20] + d[21:31]
+
+
+def data_valida(data: Optional[str]) -> bool:
+    """Verifica se a data está no formato DD/MM/AAAA"""
+    try:
+        datetime.strptime((data or "").strip(), "%d/%m/%Y")
+        return True
+    except ValueError:
+        return False
+
+
+def _ausente(valor) -> bool:
+    return valor is None or (
+        isinstance(valor, str) and valor.strip().upper() in VALORES_AUSENTES
+    )
+
+
+def identificar_campos_invalidos(dados: Dict) -> Dict[str, str]:
+    """
+    Identifica os campos ausentes ou inválidos em dados extraídos de um boleto
+
+    Valida os dados contra o BoletoSchema e aplica as verificações locais
+    (dígitos verificadores, formato de data e código do banco).
+
+    Args:
+        dados: Dados extraídos do boleto
+
+    Returns:
+        Dict[str, str]: Campo -> motivo. Vazio se os dados estão consistentes
+    """
+    # Import tardio: gemini_integration importa este módulo
+    from app.gemini_integration import BoletoSchema
+
+    campos_invalidos = {}
+
+    try:
+        BoletoSchema.model_validate(dados)
+    except ValidationError as e:
+        for erro in e.errors():
+            if erro["loc"]:
+                campos_invalidos[str(erro["loc"][0])] = erro["msg"]
+
+    for campo in CAMPOS_OBRIGATORIOS:
+        if campo not in campos_invalidos and _ausente(dados.get(campo)):
+            campos_invalidos[campo] = "campo obrigatório ausente"
+
+    linha = dados.get("linha_digitavel")
+    if "linha_digitavel" not in campos_invalidos and not linha_digitavel_valida(linha):
+        campos_invalidos["linha_digitavel"] = "dígitos verificadores não conferem"
+
+    codigo_barras = dados.get("codigo_barras_numerico")
+    if (
+        "codigo_barras_numerico" not in campos_invalidos
+        and not _ausente(codigo_barras)
+        and not codigo_barras_valido(codigo_barras)
+    ):
+        campos_invalidos["codigo_barras_numerico"] = "dígito verificador não confere"
+
+    if "data_vencimento" not in campos_invalidos and not data_valida(
+        dados.get("data_vencimento")
+    ):
+        campos_invalidos["data_vencimento"] = "data fora do formato DD/MM/AAAA"
+
+    codigo_banco = dados.get("codigo_banco_emissor")
+    if "codigo_banco_emissor" not in campos_invalidos and not re.fullmatch(
+        r"\d{3}(-\w)?", (codigo_banco or "").strip()
+    ):
+        campos_invalidos["codigo_banco_emissor"] = "código do banco deve ter 3 dígitos"
+
+    return campos_invalidos
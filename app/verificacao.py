@@ -0,0 +1,593 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.gemini_integration import (
+    extrair_dados_boleto_async,
+    analisar_fraude_boleto,
+    analisar_linhas_digitaveis_locais,
+    processar_multiplos_boletos_referencia,
+)
+from app.carne import descrever_parte, dividir_carne
+from app.consenso import obter_perfil_conta
+from app.deduplicacao import chave_boleto, deduplicar_arquivos, deduplicar_boletos
+from app.ledger import LedgerVerificacoes, calcular_hash_pdf, ledger
+from app.pdf_local import extrair_linhas_digitaveis_pdf
+from app.storage import ContaJaExistente, ContaReferenciaStorage, storage
+
+# Códigos de erro retornados pelos fluxos (usados pela API para escolher o status HTTP)
+ERRO_DADOS_INVALIDOS = "dados_invalidos"
+ERRO_CONTA_EXISTENTE = "conta_existente"
+ERRO_CONTA_NAO_ENCONTRADA = "conta_nao_encontrada"
+ERRO_EXTRACAO = "falha_extracao"
+ERRO_ANALISE = "falha_analise"
+ERRO_PERSISTENCIA = "falha_persistencia"
+
+
+def _erro(codigo: str, mensagem: str) -> Tuple[Dict, bool]:
+    return {"codigo_erro": codigo, "erro": mensagem}, False
+
+
+def _erro_duplicados(duplicados: List[Dict]) -> Tuple[Dict, bool]:
+    erro, sucesso = _erro(
+        ERRO_DADOS_INVALIDOS,
+        "São necessários pelo menos 2 boletos diferentes; os arquivos enviados "
+        "se repetem.",
+    )
+    erro["duplicados"] = duplicados
+    return erro, sucesso
+
+
+def _erro_conta_existente(apelido_conta: str) -> Tuple[Dict, bool]:
+    return _erro(
+        ERRO_CONTA_EXISTENTE,
+        f"Já existe uma conta com o nome '{apelido_conta}'. Escolha outro nome.",
+    )
+
+
+def _dividir_carnes(arquivos_pdf: List[Tuple[bytes, str]]) -> List[Tuple[bytes, str]]:
+    """Troca cada carnê enviado por seus boletos, nomeados pela página de origem"""
+    arquivos_divididos = []
+    for arquivo_bytes, nome_arquivo in arquivos_pdf:
+        partes = dividir_carne(arquivo_bytes)
+        if len(partes) == 1:
+            arquivos_divididos.append((arquivo_bytes, nome_arquivo))
+            continue
+        arquivos_divididos.extend(
+            (parte["arquivo_bytes"], descrever_parte(nome_arquivo, parte))
+            for parte in partes
+        )
+    return arquivos_divididos
+
+
+def cadastrar_conta_referencia(
+    apelido_conta: str,
+    arquivos_pdf: List[Tuple[bytes, str]],
+    storage_contas: ContaReferenciaStorage = storage,
+) -> Tuple[Dict, bool]:
+    """
+    Processa boletos originais e salva a conta de referência
+
+    Carnês (vários boletos em um arquivo) são divididos e cada boleto conta
+    como uma referência, então um único carnê já basta para criar a conta.
+
+    Args:
+        apelido_conta: Nome/apelido da conta
+        arquivos_pdf: Lista de tuplas (bytes_do_arquivo, nome_do_arquivo)
+        storage_contas: Storage onde a conta será salva
+
+    Returns:
+        Tuple[Dict, bool]: ({"conta", "boletos", "duplicados"} ou
+        {"codigo_erro", "erro"}, sucesso)
+    """
+    if not apelido_conta:
+        return _erro(
+            ERRO_DADOS_INVALIDOS, "Forneça um nome para a conta de referência."
+        )
+
+    if not arquivos_pdf:
+        return _erro(
+            ERRO_DADOS_INVALIDOS,
+            "Selecione pelo menos 2 boletos (arquivos ou páginas de um carnê).",
+        )
+
+    # Checagem antecipada, para não gastar extrações; a definitiva é feita
+    # pelo storage junto com a escrita
+    if storage_contas.conta_existe(apelido_conta):
+        return _erro_conta_existente(apelido_conta)
+
+    arquivos_pdf = _dividir_carnes(arquivos_pdf)
+    if len(arquivos_pdf) < 2:
+        return _erro(
+            ERRO_DADOS_INVALIDOS,
+            "Selecione pelo menos 2 boletos (arquivos ou páginas de um carnê).",
+        )
+
+    # Arquivos repetidos no envio são descartados antes de qualquer chamada à API
+    arquivos_unicos, duplicados = deduplicar_arquivos(arquivos_pdf)
+    if len(arquivos_unicos) < 2:
+        return _erro_duplicados(duplicados)
+
+    # Boletos já cadastrados em outra conta (mesmo arquivo, ou mesma linha
+    # digitável lida localmente) reaproveitam os dados extraídos, sem chamar a IA
+    boletos_dados = []
+    arquivos_a_extrair = []
+    for arquivo_bytes, nome_arquivo, hash_conteudo, linhas in arquivos_unicos:
+        existente = storage_contas.localizar_boleto_por_hash(hash_conteudo)
+        motivo = "arquivo já cadastrado em outra conta (dados reaproveitados)"
+        if not existente:
+            existente = storage_contas.localizar_boleto_por_linha(linhas)
+            motivo = (
+                "mesma linha digitável de um boleto já cadastrado em outra conta "
+                "(dados reaproveitados)"
+            )
+        if existente:
+            boletos_dados.append(
+                {
+                    **existente["boleto"],
+                    "nome_arquivo": nome_arquivo,
+                    "hash_conteudo": hash_conteudo,
+                }
+            )
+            duplicados.append(
+                {
+                    "nome_arquivo": nome_arquivo,
+                    "duplicado_de": existente["apelido_conta"],
+                    "motivo": motivo,
+                }
+            )
+        else:
+            arquivos_a_extrair.append((arquivo_bytes, nome_arquivo, hash_conteudo))
+
+    if arquivos_a_extrair:
+        extraidos, _ = processar_multiplos_boletos_referencia(
+            [(arquivo_bytes, nome) for arquivo_bytes, nome, _ in arquivos_a_extrair]
+        )
+        if len(extraidos) != len(arquivos_a_extrair):
+            return _erro(
+                ERRO_EXTRACAO,
+                "Erro ao processar os boletos. Verifique se os arquivos são PDFs ou "
+                "imagens válidos.",
+            )
+        for boleto, (_, _, hash_conteudo) in zip(extraidos, arquivos_a_extrair):
+            boleto["hash_conteudo"] = hash_conteudo
+            boletos_dados.append(boleto)
+
+            # Sem linha legível no arquivo (foto, digitalização), a repetição
+            # só aparece depois da extração
+            existente = storage_contas.localizar_boleto_por_chave(chave_boleto(boleto))
+            if existente:
+                duplicados.append(
+                    {
+                        "nome_arquivo": boleto["nome_arquivo"],
+                        "duplicado_de": existente["apelido_conta"],
+                        "motivo": "mesmo boleto já cadastrado em outra conta",
+                    }
+                )
+
+    # Mesmo boleto em arquivos diferentes (reimpressão, nova digitalização)
+    boletos_dados, repetidos = deduplicar_boletos(boletos_dados)
+    duplicados.extend(repetidos)
+
+    if len(boletos_dados) < 2:
+        return _erro_duplicados(duplicados)
+
+    try:
+        salvou = storage_contas.salvar_conta_referencia(apelido_conta, boletos_dados)
+    except ContaJaExistente:
+        return _erro_conta_existente(apelido_conta)
+    if not salvou:
+        return _erro(ERRO_PERSISTENCIA, "Erro ao salvar a conta de referência.")
+
+    return {
+        "conta": storage_contas.obter_resumo_conta(apelido_conta),
+        "boletos": boletos_dados,
+        "duplicados": duplicados,
+    }, True
+
+
+# Event loop de fundo compartilhado pelo processo (ver _obter_loop)
+_loop_pipeline = None
+_lock_loop = threading.Lock()
+
+
+def _obter_loop() -> asyncio.AbstractEventLoop:
+    """
+    Retorna o event loop de fundo usado pelas verificações síncronas
+
+    O cliente assíncrono do Gemini mantém seu pool de conexões preso ao event
+    loop em que foi usado. Um único loop de longa duração permite reaproveitar
+    as conexões entre verificações vindas de threads diferentes (sessões do
+    Streamlit, requisições da API).
+    """
+    global _loop_pipeline
+    with _lock_loop:
+        if _loop_pipeline is None:
+            _loop_pipeline = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop_pipeline.run_forever,
+                name="pipeline-verificacao",
+                daemon=True,
+            ).start()
+    return _loop_pipeline
+
+
+async def _cronometrar(tempos_etapas: Dict[str, float], etapa: str, aguardavel):
+    """Aguarda uma etapa registrando sua duração, mesmo se cancelada"""
+    inicio = time.perf_counter()
+    try:
+        return await aguardavel
+    finally:
+        tempos_etapas[etapa] = time.perf_counter() - inicio
+
+
+def _verificacao_reaproveitavel(
+    verificacoes: List[Dict], apelido_conta: str, data_criacao: Optional[str]
+) -> Optional[Dict]:
+    """
+    Escolhe, entre verificações anteriores, uma que ainda vale para a conta
+
+    Só servem verificações da mesma conta feitas depois da criação dela: se a
+    conta foi removida e recriada, as referências podem ter mudado.
+    """
+    for verificacao in verificacoes:
+        if verificacao["apelido_conta"] == apelido_conta and (
+            not data_criacao or verificacao["data_verificacao"] >= data_criacao
+        ):
+            return verificacao
+    return None
+
+
+def _sinalizar_campos_invalidos(resultado: Dict, campos_invalidos: Dict) -> Dict:
+    """
+    Rebaixa para verificação manual um boleto cujos campos nenhum modelo validou
+
+    Um boleto aprovado com, por exemplo, a linha digitável fora dos dígitos
+    verificadores não pode seguir como PAGAR sem que alguém o confira.
+    """
+    if not campos_invalidos:
+        return resultado
+
+    ponto_suspeito = "Campos não validados após todos os modelos: " + ", ".join(
+        f"{campo} ({motivo})" for campo, motivo in campos_invalidos.items()
+    )
+    resultado = {
+        **resultado,
+        "pontos_suspeitos": [*resultado.get("pontos_suspeitos", []), ponto_suspeito],
+    }
+    if resultado.get("recomendacao") == "PAGAR":
+        resultado["recomendacao"] = "VERIFICAR_MANUALMENTE"
+        resultado["nivel_confianca"] = min(resultado.get("nivel_confianca", 0), 0.70)
+    return resultado
+
+
+async def verificar_boleto_async(
+    apelido_conta: str,
+    arquivo_bytes: bytes,
+    storage_contas: ContaReferenciaStorage = storage,
+    ledger_verificacoes: LedgerVerificacoes = ledger,
+    linhas_digitaveis: Optional[List[str]] = None,
+) -> Tuple[Dict, bool]:
+    """
+    Verifica um boleto contra os boletos de referência de uma conta
+
+    As consultas locais rodam ao mesmo tempo: lista de bloqueio (PDFs já
+    classificados como NAO_PAGAR nesta conta), verificações anteriores do mesmo
+    arquivo, leitura das referências e leitura local da linha digitável. Se o
+    boleto (mesmo arquivo ou mesma linha digitável) já foi verificado nesta
+    conta, o resultado anterior é reaproveitado; se a lista de bloqueio ou a
+    análise local já forem decisivas (NAO_PAGAR), o resultado é devolvido
+    imediatamente. Só quando nenhuma delas decide o boleto é enviado ao Gemini,
+    então reimpressões não custam chamadas à API. O resultado é registrado no
+    ledger.
+
+    Args:
+        apelido_conta: Conta de referência usada na comparação
+        arquivo_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+        storage_contas: Storage de onde vêm as referências
+        ledger_verificacoes: Ledger onde a verificação é registrada
+        linhas_digitaveis: Linhas digitáveis já lidas do arquivo (ex: por
+            dividir_carne); se None, o arquivo é lido localmente
+
+    Returns:
+        Tuple[Dict, bool]: (verificação ou {"codigo_erro", "erro"}, sucesso)
+    """
+    inicio_total = time.perf_counter()
+    tempos_etapas = {}
+    info_extracao = {}
+    hash_pdf = calcular_hash_pdf(arquivo_bytes)
+
+    tarefas = []
+
+    def iniciar(etapa: str, aguardavel) -> asyncio.Task:
+        tarefa = asyncio.create_task(_cronometrar(tempos_etapas, etapa, aguardavel))
+        tarefas.append(tarefa)
+        return tarefa
+
+    tarefa_bloqueio = iniciar(
+        "bloqueio",
+        asyncio.to_thread(ledger_verificacoes.buscar_bloqueio, hash_pdf, apelido_conta),
+    )
+    tarefa_anteriores = iniciar(
+        "anteriores", asyncio.to_thread(ledger_verificacoes.buscar_por_hash, hash_pdf)
+    )
+    tarefa_referencias = iniciar(
+        "referencias",
+        asyncio.to_thread(storage_contas.obter_conta_referencia, apelido_conta),
+    )
+    if linhas_digitaveis is None:
+        tarefa_texto_local = iniciar(
+            "texto_local",
+            asyncio.to_thread(extrair_linhas_digitaveis_pdf, arquivo_bytes),
+        )
+
+    async def encerrar_tarefas():
+        # Interrompe as etapas que ficaram sem uso (ex: leitura local após um
+        # bloqueio) e espera o cancelamento, para que nenhuma escreva em
+        # tempos_etapas depois do registro nem deixe exceções sem leitura
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+    async def concluir(
+        dados_boleto: Dict, resultado: Dict, etapa_decisiva: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        await encerrar_tarefas()
+        tempos_etapas["total"] = time.perf_counter() - inicio_total
+        modelo = None if etapa_decisiva else info_extracao.get("modelo")
+        campos_invalidos = (
+            {} if etapa_decisiva else info_extracao.get("campos_invalidos", {})
+        )
+
+        # Registra a verificação no ledger para auditoria
+        await asyncio.to_thread(
+            ledger_verificacoes.registrar_verificacao,
+            hash_pdf=hash_pdf,
+            apelido_conta=apelido_conta,
+            resultado=resultado,
+            tempos_etapas=tempos_etapas,
+            modelo=modelo,
+            dados_boleto=dados_boleto,
+            etapa_decisiva=etapa_decisiva,
+        )
+
+        return {
+            "apelido_conta": apelido_conta,
+            "hash_pdf": hash_pdf,
+            "dados_boleto": dados_boleto,
+            "resultado": resultado,
+            "tempos_etapas": tempos_etapas,
+            "modelo": modelo,
+            "etapa_decisiva": etapa_decisiva,
+            "campos_invalidos": campos_invalidos,
+        }, True
+
+    try:
+        conta = await tarefa_referencias
+        boletos_referencia = (conta or {}).get("boletos_referencia", [])
+        if not boletos_referencia:
+            return _erro(
+                ERRO_CONTA_NAO_ENCONTRADA,
+                f"Boletos de referência não encontrados para '{apelido_conta}'",
+            )
+
+        # Bloqueio só vale se a reprovação foi nesta conta, depois de criada
+        verificacao_bloqueada = await tarefa_bloqueio
+        if verificacao_bloqueada and _verificacao_reaproveitavel(
+            [verificacao_bloqueada], apelido_conta, conta.get("data_criacao")
+        ):
+            data_bloqueio = verificacao_bloqueada["data_verificacao"][:10]
+            resultado = {
+                **verificacao_bloqueada["resultado"],
+                "resumo_analise": (
+                    f"Este mesmo arquivo já foi classificado como NAO_PAGAR nesta "
+                    f"conta em {data_bloqueio}. "
+                    f"{verificacao_bloqueada['resultado'].get('resumo_analise', '')}"
+                ).strip(),
+                "recomendacao": "NAO_PAGAR",
+            }
+            return await concluir(
+                verificacao_bloqueada["dados_boleto"], resultado, "bloqueio"
+            )
+
+        verificacao_anterior = _verificacao_reaproveitavel(
+            await tarefa_anteriores, apelido_conta, conta.get("data_criacao")
+        )
+        if verificacao_anterior:
+            return await concluir(
+                verificacao_anterior["dados_boleto"],
+                verificacao_anterior["resultado"],
+                "duplicado",
+            )
+
+        if linhas_digitaveis is None:
+            linhas_digitaveis = await tarefa_texto_local
+        if linhas_digitaveis:
+            # Mesmo boleto em outro arquivo (reimpressão, nova digitalização)
+            verificacao_anterior = _verificacao_reaproveitavel(
+                await asyncio.to_thread(
+                    ledger_verificacoes.buscar_por_linha_digitavel,
+                    linhas_digitaveis[0],
+                    apelido_conta,
+                ),
+                apelido_conta,
+                conta.get("data_criacao"),
+            )
+            if verificacao_anterior:
+                return await concluir(
+                    verificacao_anterior["dados_boleto"],
+                    verificacao_anterior["resultado"],
+                    "duplicado",
+                )
+
+        resultado = analisar_linhas_digitaveis_locais(
+            boletos_referencia, linhas_digitaveis
+        )
+        if resultado:
+            return await concluir(
+                {"linha_digitavel": linhas_digitaveis[0]}, resultado, "texto_local"
+            )
+
+        # Nenhuma etapa local decidiu: só agora o boleto vai para o Gemini
+        dados_boleto, sucesso_extracao = await iniciar(
+            "extracao", extrair_dados_boleto_async(arquivo_bytes, info_extracao)
+        )
+        if not sucesso_extracao:
+            return _erro(
+                ERRO_EXTRACAO,
+                "Erro ao processar o boleto. Verifique se o arquivo é um PDF ou "
+                "imagem válido.",
+            )
+
+        inicio = time.perf_counter()
+        try:
+            perfil_conta = obter_perfil_conta(
+                apelido_conta, conta, storage_contas.arquivo_storage
+            )
+        except Exception as e:
+            print(f"Erro ao montar o perfil da conta '{apelido_conta}': {e}")
+            return _erro(
+                ERRO_ANALISE, "Erro ao analisar o boleto para detecção de fraude."
+            )
+        resultado, sucesso_analise = analisar_fraude_boleto(
+            boletos_referencia, dados_boleto, perfil_conta
+        )
+        tempos_etapas["analise"] = time.perf_counter() - inicio
+
+        if not sucesso_analise:
+            return _erro(
+                ERRO_ANALISE, "Erro ao analisar o boleto para detecção de fraude."
+            )
+
+        return await concluir(
+            dados_boleto,
+            _sinalizar_campos_invalidos(
+                resultado, info_extracao.get("campos_invalidos", {})
+            ),
+        )
+
+    finally:
+        await encerrar_tarefas()
+
+
+def verificar_boleto(
+    apelido_conta: str,
+    arquivo_bytes: bytes,
+    storage_contas: ContaReferenciaStorage = storage,
+    ledger_verificacoes: LedgerVerificacoes = ledger,
+) -> Tuple[Dict, bool]:
+    """
+    Versão síncrona de verificar_boleto_async, para a interface e a API HTTP
+
+    Args:
+        apelido_conta: Conta de referência usada na comparação
+        arquivo_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+        storage_contas: Storage de onde vêm as referências
+        ledger_verificacoes: Ledger onde a verificação é registrada
+
+    Returns:
+        Tuple[Dict, bool]: (verificação ou {"codigo_erro", "erro"}, sucesso)
+    """
+    futuro = asyncio.run_coroutine_threadsafe(
+        verificar_boleto_async(
+            apelido_conta, arquivo_bytes, storage_contas, ledger_verificacoes
+        ),
+        _obter_loop(),
+    )
+    return futuro.result()
+
+
+async def verificar_carne_async(
+    apelido_conta: str,
+    arquivo_bytes: bytes,
+    storage_contas: ContaReferenciaStorage = storage,
+    ledger_verificacoes: LedgerVerificacoes = ledger,
+) -> Tuple[Dict, bool]:
+    """
+    Verifica cada boleto de um carnê (vários boletos em um único arquivo)
+
+    O arquivo é dividido por página ou região (dividir_carne) e cada boleto
+    passa pela verificação completa ao mesmo tempo que os demais, com seu
+    próprio registro no ledger. Um arquivo com um único boleto gera uma
+    única verificação. As linhas digitáveis lidas na divisão seguem para a
+    verificação, então o PDF é lido uma única vez.
+
+    Args:
+        apelido_conta: Conta de referência usada na comparação
+        arquivo_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+        storage_contas: Storage de onde vêm as referências
+        ledger_verificacoes: Ledger onde as verificações são registradas
+
+    Returns:
+        Tuple[Dict, bool]: ({"apelido_conta", "verificacoes"} ou
+        {"codigo_erro", "erro"}, sucesso), onde cada item de "verificacoes"
+        traz "pagina", "regiao", "sucesso" e a verificação (ou
+        {"codigo_erro", "erro"}) daquele boleto
+    """
+    partes = await asyncio.to_thread(dividir_carne, arquivo_bytes)
+    resultados = await asyncio.gather(
+        *(
+            verificar_boleto_async(
+                apelido_conta,
+                parte["arquivo_bytes"],
+                storage_contas,
+                ledger_verificacoes,
+                parte["linhas_digitaveis"],
+            )
+            for parte in partes
+        ),
+        return_exceptions=True,
+    )
+    # Uma falha inesperada em um boleto não derruba os demais
+    resultados = [
+        (
+            _erro(ERRO_ANALISE, f"Erro inesperado ao verificar o boleto: {resultado}")
+            if isinstance(resultado, BaseException)
+            else resultado
+        )
+        for resultado in resultados
+    ]
+
+    # Nenhum boleto verificado (ex: conta inexistente): o erro vale para o carnê
+    if not any(sucesso for _, sucesso in resultados):
+        return resultados[0]
+
+    verificacoes = [
+        {
+            "pagina": parte["pagina"],
+            "regiao": parte["regiao"],
+            "sucesso": sucesso,
+            **resultado,
+        }
+        for parte, (resultado, sucesso) in zip(partes, resultados)
+    ]
+    return {"apelido_conta": apelido_conta, "verificacoes": verificacoes}, True
+
+
+def verificar_carne(
+    apelido_conta: str,
+    arquivo_bytes: bytes,
+    storage_contas: ContaReferenciaStorage = storage,
+    ledger_verificacoes: LedgerVerificacoes = ledger,
+) -> Tuple[Dict, bool]:
+    """
+    Versão síncrona de verificar_carne_async, para a interface e a API HTTP
+
+    Args:
+        apelido_conta: Conta de referência usada na comparação
+        arquivo_bytes: Bytes do arquivo (PDF, PNG ou JPEG)
+        storage_contas: Storage de onde vêm as referências
+        ledger_verificacoes: Ledger onde as verificações são registradas
+
+    Returns:
+        Tuple[Dict, bool]: ({"apelido_conta", "verificacoes"} ou
+        {"codigo_erro", "erro"}, sucesso)
+    """
+    futuro = asyncio.run_coroutine_threadsafe(
+        verificar_carne_async(
+            apelido_conta, arquivo_bytes, storage_contas, ledger_verificacoes
+        ),
+        _obter_loop(),
+    )
+    return futuro.result()
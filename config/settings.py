@@ -4,3 +4,57 @@ from dotenv import load_dotenv
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Partições por tenant: cada tenant tem seu diretório com contas e ledger
+TENANTS_DIRETORIO = os.getenv("TENANTS_DIRETORIO", "data/tenants")
+
+# Ledger append-only das verificações (SQLite)
+LEDGER_VERIFICACOES = os.getenv("LEDGER_VERIFICACOES", "data/verificacoes.db")
+
+# Tamanho do pool de conexões HTTP do cliente Gemini (compartilhado pelo processo)
+GEMINI_MAX_CONEXOES = int(os.getenv("GEMINI_MAX_CONEXOES", "10"))
+
+# Serviço HTTP de verificação
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORTA = int(os.getenv("API_PORTA", "8080"))
+# Token da partição do servidor (requisições sem tenant)
+API_TOKEN = os.getenv("API_TOKEN")
+# Tokens dos tenants: "token-a=acme,cliente-42;token-b=*" ("*" libera todos os tenants)
+API_TOKENS_TENANTS = {
+    token.strip(): [tenant.strip() for tenant in tenants.split(",") if tenant.strip()]
+    for token, _, tenants in (
+        item.partition("=") for item in os.getenv("API_TOKENS_TENANTS", "").split(";")
+    )
+    if token.strip()
+}
+API_MAX_CONCORRENCIA = int(os.getenv("API_MAX_CONCORRENCIA", "8"))
+API_TIMEOUT_FILA = float(os.getenv("API_TIMEOUT_FILA", "2"))
+API_MAX_LOTE = int(os.getenv("API_MAX_LOTE", "50"))
+# Tamanho máximo do corpo de uma requisição (JSON com os arquivos em base64)
+API_MAX_CORPO_MB = int(os.getenv("API_MAX_CORPO_MB", "50"))
+
+# Modelos de extração em ordem de escalonamento (do mais rápido ao mais robusto)
+GEMINI_MODELOS_EXTRACAO = [
+    modelo.strip()
+    for modelo in os.getenv(
+        "GEMINI_MODELOS_EXTRACAO",
+        "gemini-2.0-flash-lite-001,gemini-2.0-flash-001,gemini-2.5-pro",
+    ).split(",")
+    if modelo.strip()
+]
+# Um modelo é rebaixado quando a taxa de erro ou a latência mediana recentes passam destes limites
+GEMINI_LIMITE_TAXA_ERRO = float(os.getenv("GEMINI_LIMITE_TAXA_ERRO", "0.5"))
+GEMINI_LIMITE_LATENCIA = float(os.getenv("GEMINI_LIMITE_LATENCIA", "30"))
+
+# Perfilamento opcional (cProfile + tracemalloc) de reruns da interface e lotes da API
+PERFILAMENTO_ATIVO = os.getenv("PERFILAMENTO", "").lower() in ("1", "true", "sim")
+PERFILAMENTO_DIRETORIO = os.getenv("PERFILAMENTO_DIRETORIO", "data/perfis")
+PERFILAMENTO_TOP_ALOCACOES = int(os.getenv("PERFILAMENTO_TOP_ALOCACOES", "15"))
+
+# Fração mínima das referências que precisa ter o valor de um campo essencial;
+# abaixo dela (mas acima de zero) o boleto vai para verificação manual
+CONSENSO_FREQUENCIA_MINIMA = float(os.getenv("CONSENSO_FREQUENCIA_MINIMA", "0.5"))
+
+# Pré-processamento de imagens e PDFs digitalizados antes do upload
+PREPROCESSAMENTO_DPI = int(os.getenv("PREPROCESSAMENTO_DPI", "150"))
+PREPROCESSAMENTO_MAX_BYTES = int(os.getenv("PREPROCESSAMENTO_MAX_BYTES", "300000"))
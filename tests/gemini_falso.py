@@ -0,0 +1,143 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+# Boleto sintético com linha digitável e código de barras consistentes
+BOLETO_FALSO = {
+    "nome_beneficiario": "IMOBILIARIA EXEMPLO LTDA",
+    "documento_beneficiario": "12.345.678/0001-90",
+    "agencia_codigo_cedente": "1234-5 / 0012345-6",
+    "endereco_beneficiario": "Rua das Flores, 100 - Centro - São Paulo/SP",
+    "nome_pagador": "FULANO DE TAL",
+    "documento_pagador": "123.456.789-00",
+    "endereco_pagador": "Av. Brasil, 200 - São Paulo/SP",
+    "codigo_banco_emissor": "001-9",
+    "nome_banco_emissor": "Banco do Brasil S.A.",
+    "linha_digitavel": "00190.00009 02123.456705 00001.015171 7 12340000125050",
+    "codigo_barras_numerico": "00197123400001250500000002123456700000101517",
+    "nosso_numero": "00021234567",
+    "numero_documento_boleto": "2024/07",
+    "data_vencimento": "10/07/2024",
+    "data_documento": "01/07/2024",
+    "valor_documento": 1250.50,
+    "valor_cobrado": 1250.50,
+    "especie_doc": "DM",
+    "local_pagamento": "Pagável em qualquer banco até o vencimento",
+    "demonstrativo": ["Aluguel referente a 07/2024"],
+    "instrucoes_caixa": ["Não receber após o vencimento"],
+}
+
+
+class _ArquivosFalsos:
+    """Imita client.files"""
+
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+
+    def upload(self, file, config=None):
+        self._cliente._aguardar()
+        return self._cliente._arquivo_enviado()
+
+
+class _ModelosFalsos:
+    """Imita client.models"""
+
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+
+    def generate_content(self, model, contents, config=None):
+        self._cliente._aguardar()
+        return self._cliente._resposta_extracao(model, contents, config)
+
+
+class _ArquivosFalsosAsync:
+    """Imita client.aio.files"""
+
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+
+    async def upload(self, file, config=None):
+        await asyncio.sleep(self._cliente.latencia)
+        return self._cliente._arquivo_enviado()
+
+
+class _ModelosFalsosAsync:
+    """Imita client.aio.models"""
+
+    def __init__(self, cliente: "ClienteGeminiFalso"):
+        self._cliente = cliente
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self._cliente.latencia)
+        return self._cliente._resposta_extracao(model, contents, config)
+
+
+class ClienteGeminiFalso:
+    """
+    Cliente offline compatível com a parte de genai.Client usada pelo projeto
+
+    Útil para testes e ensaios de carga sem acesso à API: devolve sempre o mesmo
+    boleto (opcionalmente com um nosso número por arquivo), após uma latência
+    configurável por chamada.
+    """
+
+    def __init__(
+        self,
+        latencia: float = 0.0,
+        dados_boleto: Optional[Dict] = None,
+        variar_nosso_numero: bool = False,
+    ):
+        """
+        Args:
+            latencia: Atraso, em segundos, aplicado a cada chamada
+            dados_boleto: Dados devolvidos na extração. Se None, usa BOLETO_FALSO
+            variar_nosso_numero: Se True, cada arquivo enviado recebe um nosso
+                número próprio, como boletos distintos da mesma conta
+        """
+        self.latencia = latencia
+        self.dados_boleto = dados_boleto or BOLETO_FALSO
+        self.variar_nosso_numero = variar_nosso_numero
+        self.chamadas = {"upload": 0, "generate_content": 0}
+        self.modelos_chamados = []
+        self._lock = threading.Lock()
+        self.files = _ArquivosFalsos(self)
+        self.models = _ModelosFalsos(self)
+        self.aio = SimpleNamespace(
+            files=_ArquivosFalsosAsync(self), models=_ModelosFalsosAsync(self)
+        )
+
+    def _aguardar(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _contabilizar(self, tipo: str, modelo: Optional[str] = None) -> int:
+        with self._lock:
+            self.chamadas[tipo] += 1
+            if modelo:
+                self.modelos_chamados.append(modelo)
+            return self.chamadas[tipo]
+
+    def _arquivo_enviado(self):
+        numero = self._contabilizar("upload")
+        return SimpleNamespace(name=f"files/falso-{numero}", numero=numero)
+
+    def _resposta_extracao(self, modelo: str, contents, config):
+        self._contabilizar("generate_content", modelo)
+
+        dados = dict(self.dados_boleto)
+        if self.variar_nosso_numero:
+            arquivo = next((item for item in contents if hasattr(item, "numero")), None)
+            if arquivo is not None:
+                dados["nosso_numero"] = f"{arquivo.numero:011d}"
+        schema = getattr(config, "response_schema", None)
+        if schema is not None and hasattr(schema, "model_fields"):
+            # Responde apenas com os campos pedidos pelo schema
+            dados = {
+                campo: dados.get(campo)
+                for campo in schema.model_fields
+                if campo in dados
+            }
+        return SimpleNamespace(text=json.dumps(dados, ensure_ascii=False))
@@ -0,0 +1,837 @@
+"""
+Ensaio de carga com sessões simultâneas da interface
+
+Sobe a interface com `streamlit run` num subprocesso e conecta a ele várias
+sessões headless ao mesmo tempo, falando o protocolo do navegador (websocket
+/_stcore/stream e upload em /_stcore/upload_file). Cada sessão escolhe um
+tenant na barra lateral, cadastra uma conta de referência pelo formulário e
+verifica boletos pelo botão "Analisar Boleto", como um usuário faria. O Gemini
+é substituído pelo ClienteGeminiFalso, injetado com configurar_cliente só no
+servidor do ensaio e com latência configurável, então o ensaio não consome cota nem depende de rede.
+
+A latência de cada interação é medida no cliente, do envio do rerun até o
+script terminar, e portanto inclui a fila no servidor. O servidor roda a
+interface instrumentada (rodar_ui_instrumentada), que grava em CARGA_EVENTOS o
+tempo de execução de cada rerun, a espera pelo lock do storage, as leituras do
+JSON de contas e as escritas e consultas do ledger SQLite. O relatório traz, por
+interação, percentis de latência, a parte dela gasta fora do script (fila) e a
+taxa de erro, além da contenção de storage e ledger em cada tenant.
+
+Fica fora do pacote app: fala o protocolo interno do Streamlit (protobuf
+BackMsg/ForwardMsg), desliga a proteção XSRF do servidor de ensaio e instrumenta
+classes da aplicação por monkeypatch. Depende do grupo de dependências "dev"
+(httpx e websockets).
+
+Uso:
+    python -m tests.load.carga --sessoes 20 --verificacoes 3 --latencia 0.5
+    python -m tests.load.carga --sessoes 20 --tenants 4 --max-p95 5 --json relatorio.json
+"""
+
+import asyncio
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+RAIZ_PROJETO = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+# Arquivo JSONL onde o servidor instrumentado grava seus eventos
+VARIAVEL_EVENTOS = "CARGA_EVENTOS"
+# Latência, em segundos, do cliente Gemini falso do servidor de ensaio
+VARIAVEL_LATENCIA = "CARGA_LATENCIA_GEMINI"
+SCRIPT_SERVIDOR = (
+    "from tests.load.carga import rodar_ui_instrumentada\n\nrodar_ui_instrumentada()\n"
+)
+
+REFERENCIAS_PADRAO = [
+    os.path.join(RAIZ_PROJETO, "samples", "bem-estar-jul.pdf"),
+    os.path.join(RAIZ_PROJETO, "samples", "bem-estar-ago.pdf"),
+]
+
+# Estados de término de um rerun (ForwardMsg.ScriptFinishedStatus)
+RERUN_CONCLUIDO = ForwardMsg.FINISHED_SUCCESSFULLY
+RERUN_INTERROMPIDO = ForwardMsg.FINISHED_EARLY_FOR_RERUN
+
+
+# --- Instrumentação (roda dentro do processo do servidor) ---
+
+_lock_eventos = threading.Lock()
+_arquivo_eventos = None
+_lock_instrumentacao = threading.Lock()
+_instrumentado = False
+
+
+def _registrar_evento(tipo: str, **campos):
+    """Acrescenta um evento ao arquivo de CARGA_EVENTOS (sem efeito se não definido)"""
+    global _arquivo_eventos
+    caminho = os.getenv(VARIAVEL_EVENTOS)
+    if not caminho:
+        return
+    linha = json.dumps({"tipo": tipo, **campos}, ensure_ascii=False)
+    with _lock_eventos:
+        if _arquivo_eventos is None:
+            _arquivo_eventos = open(caminho, "a", encoding="utf-8", buffering=1)
+        _arquivo_eventos.write(linha + "\n")
+
+
+def _tenant_do_arquivo(caminho: str) -> str:
+    """Nome da partição (diretório do tenant) de um arquivo de storage/ledger"""
+    return os.path.basename(os.path.dirname(os.path.abspath(caminho)))
+
+
+class LockMedido:
+    """
+    Envolve o lock de um storage registrando quanto tempo cada aquisição esperou
+
+    Reentrante se o lock envolvido for (RLock), como o de ContaReferenciaStorage.
+    """
+
+    def __init__(self, lock, tenant: str):
+        self._lock = lock
+        self.tenant = tenant
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        inicio = time.perf_counter()
+        adquirido = self._lock.acquire(blocking, timeout)
+        _registrar_evento(
+            "lock_storage", tenant=self.tenant, duracao=time.perf_counter() - inicio
+        )
+        return adquirido
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, traceback):
+        self.release()
+        return False
+
+
+def _cronometrar(classe, metodo: str, tipo: str, atributo_arquivo: str):
+    """Troca classe.metodo por uma versão que registra a duração de cada chamada"""
+    original = getattr(classe, metodo)
+
+    def medido(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        falhou = True
+        try:
+            resultado = original(self, *args, **kwargs)
+            # registrar_verificacao sinaliza falha (ex.: banco travado) com False
+            falhou = resultado is False
+            return resultado
+        finally:
+            _registrar_evento(
+                tipo,
+                tenant=_tenant_do_arquivo(getattr(self, atributo_arquivo)),
+                metodo=metodo,
+                duracao=time.perf_counter() - inicio,
+                falhou=falhou,
+            )
+
+    setattr(classe, metodo, medido)
+
+
+def _instrumentar_processo():
+    """
+    Troca o Gemini pelo cliente falso e instrumenta storage e ledger do processo
+
+    Executada uma única vez, no primeiro rerun do servidor de ensaio. O lock fica
+    preso até o fim, para nenhuma sessão chegar à interface antes do cliente falso.
+    """
+    global _instrumentado
+    with _lock_instrumentacao:
+        if not _instrumentado:
+            _instrumentar()
+            _instrumentado = True
+
+
+def _instrumentar():
+    from app.gemini_integration import configurar_cliente
+    from app.ledger import LedgerVerificacoes
+    from app.storage import ContaReferenciaStorage
+    from tests.gemini_falso import ClienteGeminiFalso
+
+    configurar_cliente(
+        ClienteGeminiFalso(
+            latencia=float(os.environ[VARIAVEL_LATENCIA]), variar_nosso_numero=True
+        )
+    )
+
+    init_original = ContaReferenciaStorage.__init__
+
+    def init_medido(self, *args, **kwargs):
+        init_original(self, *args, **kwargs)
+        self._lock = LockMedido(self._lock, _tenant_do_arquivo(self.arquivo_storage))
+
+    ContaReferenciaStorage.__init__ = init_medido
+    # Leituras do JSON, inclusive as feitas fora do lock
+    _cronometrar(
+        ContaReferenciaStorage, "_carregar_dados", "leitura_storage", "arquivo_storage"
+    )
+    _cronometrar(
+        LedgerVerificacoes, "registrar_verificacao", "escrita_ledger", "arquivo_ledger"
+    )
+    for metodo in (
+        "buscar_por_hash",
+        "buscar_por_linha_digitavel",
+        "buscar_bloqueio",
+        "listar_verificacoes",
+    ):
+        _cronometrar(LedgerVerificacoes, metodo, "leitura_ledger", "arquivo_ledger")
+
+
+def rodar_ui_instrumentada():
+    """
+    Executa a interface registrando a duração do rerun e a contenção
+
+    Ponto de entrada do script que o ensaio passa ao `streamlit run`.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    _instrumentar_processo()
+    from app.ui import rodar_ui
+
+    contexto = get_script_run_ctx()
+    inicio_relogio = time.time()
+    inicio = time.perf_counter()
+    try:
+        rodar_ui()
+    finally:
+        # Inclusive quando o script é interrompido por st.rerun/st.stop
+        _registrar_evento(
+            "execucao",
+            sessao=contexto.session_id if contexto else None,
+            inicio=inicio_relogio,
+            duracao=time.perf_counter() - inicio,
+        )
+
+
+# --- Cliente headless ---
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil pelo método do posto mais próximo (None se não há valores)"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posto = max(math.ceil(p / 100 * len(ordenados)), 1)
+    return ordenados[posto - 1]
+
+
+def _variar_conteudo(arquivo_bytes: bytes) -> bytes:
+    """
+    Torna o arquivo único (hash diferente) sem mudar seu conteúdo visível
+
+    Evita que a deduplicação por hash transforme o ensaio em leituras de cache.
+    """
+    return arquivo_bytes + f"\n%carga-{uuid.uuid4().hex}\n".encode()
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class SessaoStreamlit:
+    """
+    Uma aba de navegador simulada: mantém os estados dos widgets e dispara reruns
+
+    Os widgets são localizados pela chave (key) usada na interface; o id
+    completo vem dos elementos enviados pelo servidor no último rerun.
+    """
+
+    def __init__(self, url_base: str, cliente_http: httpx.AsyncClient, timeout: float):
+        self.url_base = url_base
+        self.cliente_http = cliente_http
+        self.timeout = timeout
+        self.id_sessao: Optional[str] = None
+        self.widgets: Dict[str, str] = {}
+        self.opcoes: Dict[str, List[str]] = {}
+        self.estados: Dict[str, WidgetState] = {}
+        self._conexao = None
+
+    async def conectar(self):
+        self._conexao = await websockets.connect(
+            self.url_base.replace("http", "ws", 1) + "/_stcore/stream",
+            subprotocols=["streamlit"],
+            max_size=None,
+        )
+
+    async def fechar(self):
+        if self._conexao is not None:
+            await self._conexao.close()
+
+    def id_widget(self, chave: str) -> str:
+        """Id do widget cuja key é `chave` (ou do botão de envio do form `chave`)"""
+        for id_widget in self.widgets:
+            if (
+                id_widget.endswith(f"-{chave}")
+                or f"-FormSubmitter:{chave}-" in id_widget
+            ):
+                return id_widget
+        raise LookupError(f"widget '{chave}' não está na tela")
+
+    def opcoes_widget(self, chave: str) -> List[str]:
+        """Opções do selectbox `chave` no último rerun"""
+        return self.opcoes.get(self.id_widget(chave), [])
+
+    def definir_texto(self, chave: str, valor: str):
+        estado = WidgetState(id=self.id_widget(chave))
+        estado.string_value = valor
+        self.estados[estado.id] = estado
+
+    async def enviar_arquivos(self, chave: str, arquivos: List[Tuple[bytes, str]]):
+        """Faz o upload dos arquivos e os coloca no file_uploader `chave`"""
+        estado = WidgetState(id=self.id_widget(chave))
+        estado.file_uploader_state_value.SetInParent()
+        for arquivo_bytes, nome in arquivos:
+            id_arquivo = uuid.uuid4().hex
+            resposta = await self.cliente_http.put(
+                f"{self.url_base}/_stcore/upload_file/{self.id_sessao}/{id_arquivo}",
+                files={"file": (nome, arquivo_bytes, "application/pdf")},
+            )
+            resposta.raise_for_status()
+            estado.file_uploader_state_value.uploaded_file_info.add(
+                file_id=id_arquivo, name=nome, size=len(arquivo_bytes)
+            )
+        self.estados[estado.id] = estado
+
+    async def rerun(self, gatilho: Optional[str] = None) -> Dict:
+        """
+        Envia um rerun (com o clique em `gatilho`, se houver) e espera o script terminar
+
+        Returns:
+            Dict: {"alertas": [(formato, texto)], "excecoes": [str], "status": int}
+        """
+        mensagem = BackMsg()
+        mensagem.rerun_script.query_string = ""
+        mensagem.rerun_script.page_script_hash = ""
+        estados = mensagem.rerun_script.widget_states.widgets
+        for estado in self.estados.values():
+            estados.add().CopyFrom(estado)
+        if gatilho:
+            estados.add(id=self.id_widget(gatilho), trigger_value=True)
+
+        await self._conexao.send(mensagem.SerializeToString())
+        return await asyncio.wait_for(self._receber_ate_fim(), self.timeout)
+
+    async def _receber_ate_fim(self) -> Dict:
+        alertas, excecoes, widgets, opcoes = [], [], {}, {}
+        while True:
+            mensagem = ForwardMsg()
+            mensagem.ParseFromString(await self._conexao.recv())
+            tipo = mensagem.WhichOneof("type")
+
+            if tipo == "new_session":
+                self.id_sessao = mensagem.new_session.initialize.session_id
+            elif tipo == "delta" and mensagem.delta.WhichOneof("type") == "new_element":
+                elemento = mensagem.delta.new_element
+                tipo_elemento = elemento.WhichOneof("type")
+                if tipo_elemento == "alert":
+                    alertas.append((elemento.alert.format, elemento.alert.body))
+                elif tipo_elemento == "exception":
+                    excecoes.append(elemento.exception.message)
+                else:
+                    widget = getattr(elemento, tipo_elemento)
+                    id_widget = getattr(widget, "id", "")
+                    if id_widget:
+                        widgets[id_widget] = tipo_elemento
+                    if tipo_elemento == "selectbox":
+                        opcoes[id_widget] = list(widget.options)
+            elif tipo == "script_finished":
+                status = mensagem.script_finished
+                if status == RERUN_INTERROMPIDO:
+                    # st.rerun: o servidor já começou outra execução
+                    widgets, opcoes = {}, {}
+                    continue
+                self.widgets, self.opcoes = widgets, opcoes
+                # Widgets que sumiram da tela são descartados pelo servidor
+                self.estados = {
+                    id_widget: estado
+                    for id_widget, estado in self.estados.items()
+                    if id_widget in widgets
+                }
+                return {"alertas": alertas, "excecoes": excecoes, "status": status}
+
+
+class ServidorStreamlit:
+    """Sobe a interface instrumentada com `streamlit run` num subprocesso"""
+
+    def __init__(self, diretorio: str, latencia: float, timeout_inicio: float = 60):
+        self.diretorio = diretorio
+        self.latencia = latencia
+        self.timeout_inicio = timeout_inicio
+        self.porta = _porta_livre()
+        self.url_base = f"http://127.0.0.1:{self.porta}"
+        self.arquivo_eventos = os.path.join(diretorio, "eventos.jsonl")
+        self.arquivo_log = os.path.join(diretorio, "servidor.log")
+        self._processo = None
+
+    def iniciar(self):
+        script = os.path.join(self.diretorio, "ui_instrumentada.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(SCRIPT_SERVIDOR)
+
+        ambiente = {
+            **os.environ,
+            VARIAVEL_LATENCIA: str(self.latencia),
+            "TENANTS_DIRETORIO": os.path.join(self.diretorio, "tenants"),
+            VARIAVEL_EVENTOS: self.arquivo_eventos,
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [RAIZ_PROJETO, os.getenv("PYTHONPATH")])
+            ),
+        }
+        with open(self.arquivo_log, "wb") as log:
+            self._processo = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "streamlit",
+                    "run",
+                    script,
+                    "--server.headless=true",
+                    f"--server.port={self.porta}",
+                    "--server.address=127.0.0.1",
+                    "--server.fileWatcherType=none",
+                    "--server.enableXsrfProtection=false",
+                    "--browser.gatherUsageStats=false",
+                ],
+                cwd=RAIZ_PROJETO,
+                env=ambiente,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+
+        limite = time.monotonic() + self.timeout_inicio
+        while time.monotonic() < limite:
+            if self._processo.poll() is not None:
+                break
+            try:
+                if httpx.get(f"{self.url_base}/_stcore/health").status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.parar()
+        raise RuntimeError(f"Servidor Streamlit não subiu; veja {self.arquivo_log}")
+
+    def parar(self):
+        if self._processo is not None and self._processo.poll() is None:
+            self._processo.terminate()
+            try:
+                self._processo.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self._processo.kill()
+                self._processo.wait()
+
+    def ler_eventos(self) -> List[Dict]:
+        if not os.path.exists(self.arquivo_eventos):
+            return []
+        with open(self.arquivo_eventos, encoding="utf-8") as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
+
+
+class EnsaioCarga:
+    """Executa as sessões headless contra um servidor e acumula as medições"""
+
+    def __init__(
+        self,
+        sessoes: int = 10,
+        verificacoes: int = 3,
+        latencia: float = 0.5,
+        tenants: int = 1,
+        timeout_rerun: float = 60,
+        arquivos_referencia: Optional[List[str]] = None,
+    ):
+        self.sessoes = sessoes
+        self.verificacoes = verificacoes
+        self.latencia = latencia
+        self.timeout_rerun = timeout_rerun
+        self.prefixo = f"carga-{uuid.uuid4().hex[:6]}"
+        self.tenants = [f"{self.prefixo}-{i}" for i in range(max(tenants, 1))]
+        self.diretorio = tempfile.mkdtemp(prefix="validaja-carga-")
+
+        self.arquivos_referencia = []
+        for caminho in arquivos_referencia or REFERENCIAS_PADRAO:
+            with open(caminho, "rb") as f:
+                self.arquivos_referencia.append((f.read(), os.path.basename(caminho)))
+
+        # (interação, id da sessão, início, fim, latência, erro)
+        self.medicoes: List[
+            Tuple[str, Optional[str], float, float, float, Optional[str]]
+        ] = []
+
+    async def _medir(
+        self,
+        interacao: str,
+        sessao: SessaoStreamlit,
+        rerun,
+        validar: Optional[Callable[[Dict], Optional[str]]] = None,
+    ):
+        """
+        Executa um rerun, registrando latência (com fila) e erro
+
+        Args:
+            validar: Recebe o resultado do rerun e retorna o erro (ou None)
+        """
+        inicio_relogio = time.time()
+        inicio = time.perf_counter()
+        try:
+            resultado = await rerun
+            erro = self._erro_do_rerun(resultado, validar)
+        except asyncio.TimeoutError:
+            erro = f"rerun passou de {self.timeout_rerun}s"
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+        latencia = time.perf_counter() - inicio
+        self.medicoes.append(
+            (
+                interacao,
+                sessao.id_sessao,
+                inicio_relogio,
+                inicio_relogio + latencia,
+                latencia,
+                erro,
+            )
+        )
+        return erro is None
+
+    @staticmethod
+    def _erro_do_rerun(resultado: Dict, validar) -> Optional[str]:
+        if resultado["excecoes"]:
+            return resultado["excecoes"][0]
+        if resultado["status"] != RERUN_CONCLUIDO:
+            return f"rerun terminou com status {resultado['status']}"
+        for _, texto in resultado["alertas"]:
+            if texto.startswith("❌"):
+                return texto
+        return validar(resultado) if validar else None
+
+    async def _sessao(self, indice: int, cliente_http: httpx.AsyncClient, url: str):
+        """Uma sessão de usuário: abre a interface, cadastra e verifica boletos"""
+        tenant = self.tenants[indice % len(self.tenants)]
+        apelido_conta = f"conta-{indice}"
+        sessao = SessaoStreamlit(url, cliente_http, self.timeout_rerun)
+
+        def conta_listada(_resultado: Dict) -> Optional[str]:
+            # O alerta de sucesso do cadastro é seguido de st.rerun e pode ser
+            # descartado antes de chegar ao navegador; a conta na lista não
+            if apelido_conta in sessao.opcoes_widget("select_conta_referencia"):
+                return None
+            return f"conta '{apelido_conta}' não aparece na aba de verificação"
+
+        def com_recomendacao(resultado: Dict) -> Optional[str]:
+            if any("RECOMENDAÇÃO" in texto for _, texto in resultado["alertas"]):
+                return None
+            return "verificação terminou sem recomendação"
+
+        await sessao.conectar()
+        try:
+            if not await self._medir("rerun_inicial", sessao, sessao.rerun()):
+                return
+            sessao.definir_texto("tenant", tenant)
+            if not await self._medir("rerun_tenant", sessao, sessao.rerun()):
+                return
+
+            sessao.definir_texto("apelido_conta_cad", apelido_conta)
+            await sessao.enviar_arquivos(
+                "files_referencia_cad",
+                [
+                    (_variar_conteudo(arquivo_bytes), nome)
+                    for arquivo_bytes, nome in self.arquivos_referencia
+                ],
+            )
+            cadastrou = await self._medir(
+                "cadastro",
+                sessao,
+                sessao.rerun("form_cadastro_conta"),
+                validar=conta_listada,
+            )
+            if not cadastrou:
+                return
+
+            for _ in range(self.verificacoes):
+                sessao.definir_texto("select_conta_referencia", apelido_conta)
+                arquivo_bytes, nome = self.arquivos_referencia[0]
+                await sessao.enviar_arquivos(
+                    "file_verificar", [(_variar_conteudo(arquivo_bytes), nome)]
+                )
+                await self._medir(
+                    "verificacao",
+                    sessao,
+                    sessao.rerun("btn_analisar"),
+                    validar=com_recomendacao,
+                )
+        finally:
+            await sessao.fechar()
+
+    async def _executar_sessoes(self, url: str):
+        async with httpx.AsyncClient(timeout=self.timeout_rerun) as cliente_http:
+            resultados = await asyncio.gather(
+                *(self._sessao(i, cliente_http, url) for i in range(self.sessoes)),
+                return_exceptions=True,
+            )
+        for resultado in resultados:
+            if isinstance(resultado, BaseException):
+                self.medicoes.append(
+                    (
+                        "sessao",
+                        None,
+                        0,
+                        0,
+                        0,
+                        f"{type(resultado).__name__}: {resultado}",
+                    )
+                )
+
+    def executar(self) -> Dict:
+        """
+        Sobe o servidor e roda todas as sessões ao mesmo tempo
+
+        Returns:
+            Dict: Relatório (ver relatorio)
+        """
+        servidor = ServidorStreamlit(self.diretorio, self.latencia)
+        servidor.iniciar()
+        try:
+            inicio = time.perf_counter()
+            asyncio.run(self._executar_sessoes(servidor.url_base))
+            duracao = time.perf_counter() - inicio
+        finally:
+            servidor.parar()
+        return self.relatorio(duracao, servidor.ler_eventos())
+
+    def relatorio(self, duracao: float, eventos: List[Dict]) -> Dict:
+        """
+        Consolida as medições do cliente e os eventos do servidor
+
+        Returns:
+            Dict: {"configuracao", "duracao", "interacoes", "contencao_storage",
+                "contencao_ledger"}
+        """
+        execucoes = defaultdict(list)
+        for evento in eventos:
+            if evento["tipo"] == "execucao":
+                execucoes[evento["sessao"]].append(evento)
+
+        latencias, filas = defaultdict(list), defaultdict(list)
+        erros, exemplos_erro = defaultdict(int), {}
+        for interacao, id_sessao, inicio, fim, latencia, erro in self.medicoes:
+            latencias[interacao].append(latencia)
+            if erro:
+                erros[interacao] += 1
+                exemplos_erro.setdefault(interacao, erro)
+            # Fila: o que sobra da latência fora das execuções do script
+            # (um cadastro com st.rerun tem duas execuções)
+            executado = sum(
+                execucao["duracao"]
+                for execucao in execucoes.get(id_sessao, [])
+                if inicio <= execucao["inicio"] <= fim
+            )
+            filas[interacao].append(max(latencia - executado, 0.0))
+
+        interacoes = {}
+        for interacao, valores in latencias.items():
+            interacoes[interacao] = {
+                "total": len(valores),
+                "erros": erros[interacao],
+                "taxa_erro": erros[interacao] / len(valores),
+                "p50": percentil(valores, 50),
+                "p95": percentil(valores, 95),
+                "p99": percentil(valores, 99),
+                "max": max(valores),
+                "fila_p50": percentil(filas[interacao], 50),
+                "fila_p95": percentil(filas[interacao], 95),
+                "vazao_por_segundo": len(valores) / duracao,
+                "exemplo_erro": exemplos_erro.get(interacao),
+            }
+
+        duracoes = defaultdict(list)
+        falhas_ledger = defaultdict(int)
+        for evento in eventos:
+            if evento["tipo"] == "execucao":
+                continue
+            duracoes[(evento["tipo"], evento["tenant"])].append(evento["duracao"])
+            if evento.get("falhou") and evento["tipo"].endswith("_ledger"):
+                falhas_ledger[evento["tenant"]] += 1
+
+        def resumo(tipo: str, tenant: str) -> Dict:
+            valores = duracoes.get((tipo, tenant), [])
+            return {
+                "total": len(valores),
+                "soma": sum(valores),
+                "p95": percentil(valores, 95),
+                "max": max(valores, default=None),
+            }
+
+        contencao_storage, contencao_ledger = {}, {}
+        for tenant in self.tenants:
+            contencao_storage[tenant] = {
+                "espera_lock": resumo("lock_storage", tenant),
+                "leituras": resumo("leitura_storage", tenant),
+            }
+            contencao_ledger[tenant] = {
+                "escritas": resumo("escrita_ledger", tenant),
+                "leituras": resumo("leitura_ledger", tenant),
+                "falhas": falhas_ledger[tenant],
+            }
+
+        return {
+            "configuracao": {
+                "sessoes": self.sessoes,
+                "verificacoes_por_sessao": self.verificacoes,
+                "latencia_gemini": self.latencia,
+                "tenants": len(self.tenants),
+            },
+            "duracao": duracao,
+            "interacoes": interacoes,
+            "contencao_storage": contencao_storage,
+            "contencao_ledger": contencao_ledger,
+        }
+
+    def limpar(self):
+        """Remove os dados (tenants, eventos e log do servidor) do ensaio"""
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+
+def imprimir_relatorio(relatorio: Dict):
+    """Imprime o relatório em forma de tabela"""
+
+    def ms(valor: Optional[float]) -> str:
+        return "-" if valor is None else f"{valor * 1000:.0f}"
+
+    configuracao = relatorio["configuracao"]
+    print(
+        f"{configuracao['sessoes']} sessões, {configuracao['tenants']} tenant(s), "
+        f"latência Gemini {configuracao['latencia_gemini']}s, "
+        f"duração {relatorio['duracao']:.1f}s"
+    )
+    print()
+    print(
+        f"{'interação':<15}{'total':>7}{'erros':>7}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'max ms':>9}{'fila p95':>10}{'/s':>7}"
+    )
+    for interacao, medidas in relatorio["interacoes"].items():
+        print(
+            f"{interacao:<15}{medidas['total']:>7}{medidas['erros']:>7}"
+            f"{ms(medidas['p50']):>9}{ms(medidas['p95']):>9}"
+            f"{ms(medidas['p99']):>9}{ms(medidas['max']):>9}"
+            f"{ms(medidas['fila_p95']):>10}{medidas['vazao_por_segundo']:>7.2f}"
+        )
+        if medidas["exemplo_erro"]:
+            print(f"    erro: {medidas['exemplo_erro']}")
+
+    print()
+    print(
+        f"{'storage':<22}{'locks':>7}{'espera ms':>11}{'p95 ms':>9}"
+        f"{'leituras':>10}{'p95 ms':>9}"
+    )
+    for tenant, medidas in relatorio["contencao_storage"].items():
+        lock, leituras = medidas["espera_lock"], medidas["leituras"]
+        print(
+            f"{tenant:<22}{lock['total']:>7}{ms(lock['soma']):>11}"
+            f"{ms(lock['p95']):>9}{leituras['total']:>10}{ms(leituras['p95']):>9}"
+        )
+
+    print()
+    print(
+        f"{'ledger':<22}{'escritas':>9}{'p95 ms':>9}{'max ms':>9}"
+        f"{'leituras':>10}{'p95 ms':>9}{'falhas':>8}"
+    )
+    for tenant, medidas in relatorio["contencao_ledger"].items():
+        escritas, leituras = medidas["escritas"], medidas["leituras"]
+        print(
+            f"{tenant:<22}{escritas['total']:>9}{ms(escritas['p95']):>9}"
+            f"{ms(escritas['max']):>9}{leituras['total']:>10}"
+            f"{ms(leituras['p95']):>9}{medidas['falhas']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ensaio de carga da interface")
+    parser.add_argument("--sessoes", type=int, default=10)
+    parser.add_argument("--verificacoes", type=int, default=3)
+    parser.add_argument(
+        "--latencia", type=float, default=0.5, help="Latência por chamada ao Gemini"
+    )
+    parser.add_argument(
+        "--tenants",
+        type=int,
+        default=1,
+        help="Tenants entre os quais as sessões são divididas",
+    )
+    parser.add_argument("--timeout-rerun", type=float, default=60)
+    parser.add_argument("--json", default=None, help="Grava o relatório neste arquivo")
+    parser.add_argument(
+        "--max-p95",
+        type=float,
+        default=None,
+        help="Falha (código 1) se o p95 da verificação passar destes segundos",
+    )
+    parser.add_argument(
+        "--max-taxa-erro",
+        type=float,
+        default=0.0,
+        help="Falha (código 1) se alguma interação passar desta taxa de erro",
+    )
+    parser.add_argument(
+        "--manter-dados",
+        action="store_true",
+        help="Não remove os dados do ensaio (tenants, eventos e log do servidor)",
+    )
+    args = parser.parse_args()
+
+    ensaio = EnsaioCarga(
+        sessoes=args.sessoes,
+        verificacoes=args.verificacoes,
+        latencia=args.latencia,
+        tenants=args.tenants,
+        timeout_rerun=args.timeout_rerun,
+    )
+    try:
+        relatorio = ensaio.executar()
+    finally:
+        if args.manter_dados:
+            print(f"Dados do ensaio em {ensaio.diretorio}")
+        else:
+            ensaio.limpar()
+
+    imprimir_relatorio(relatorio)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    violacoes = [
+        f"{interacao}: taxa de erro {medidas['taxa_erro']:.1%}"
+        for interacao, medidas in relatorio["interacoes"].items()
+        if medidas["taxa_erro"] > args.max_taxa_erro
+    ]
+    verificacao = relatorio["interacoes"].get("verificacao")
+    if args.max_p95 is not None and verificacao and verificacao["p95"] > args.max_p95:
+        violacoes.append(f"verificacao: p95 {verificacao['p95']:.2f}s")
+    if violacoes:
+        print()
+        print("Limites excedidos: " + "; ".join(violacoes))
+        raise SystemExit(1)
@@ -0,0 +1,358 @@
+"""
+Testes offline da API HTTP, com o Gemini substituído pelo ClienteGeminiFalso
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import base64
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from app.api import criar_servidor
+from tests.gemini_falso import BOLETO_FALSO, ClienteGeminiFalso
+from app.gemini_integration import configurar_cliente
+from app.ledger import LedgerVerificacoes
+from app.storage import ContaReferenciaStorage
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AMOSTRAS = os.path.join(DIRETORIO_RAIZ, "samples")
+
+
+def _base64_amostra(nome: str) -> str:
+    with open(os.path.join(AMOSTRAS, nome), "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+class TesteApiOffline(unittest.TestCase):
+    def setUp(self):
+        self.cliente = ClienteGeminiFalso(variar_nosso_numero=True)
+        configurar_cliente(self.cliente)
+
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.servidor = criar_servidor(
+            "127.0.0.1",
+            0,
+            storage_contas=ContaReferenciaStorage(
+                os.path.join(self.diretorio.name, "contas_referencia.json")
+            ),
+            ledger_verificacoes=LedgerVerificacoes(
+                os.path.join(self.diretorio.name, "verificacoes.db")
+            ),
+            max_concorrencia=1,
+            timeout_fila=0.1,
+            token=None,
+        )
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        self.diretorio.cleanup()
+
+    def _post(self, rota: str, corpo: dict, cabecalhos: dict = None):
+        return self._requisitar(
+            rota,
+            data=json.dumps(corpo).encode(),
+            headers={"Content-Type": "application/json", **(cabecalhos or {})},
+        )
+
+    def _get(self, rota: str, cabecalhos: dict = None):
+        return self._requisitar(rota, headers=cabecalhos or {})
+
+    def _requisitar(self, rota: str, **kwargs):
+        requisicao = urllib.request.Request(
+            f"http://127.0.0.1:{self.servidor.server_address[1]}{rota}", **kwargs
+        )
+        try:
+            with urllib.request.urlopen(requisicao) as resposta:
+                return resposta.status, json.load(resposta)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def _cadastrar(
+        self,
+        apelido_conta: str,
+        nomes_arquivos=("bem-estar-jul.pdf", "bem-estar-ago.pdf"),
+        cabecalhos: dict = None,
+    ):
+        return self._post(
+            "/contas",
+            {
+                "apelido_conta": apelido_conta,
+                "boletos": [
+                    {
+                        "nome_arquivo": nome,
+                        "conteudo_base64": _base64_amostra(nome),
+                    }
+                    for nome in nomes_arquivos
+                ],
+            },
+            cabecalhos,
+        )
+
+    def _ativar_tenants(self):
+        """Tenants num diretório temporário, com um token por empresa"""
+        self.diretorio_tenants = os.path.join(self.diretorio.name, "tenants")
+        for alvo, valor in (
+            ("app.tenants.TENANTS_DIRETORIO", self.diretorio_tenants),
+            ("app.tenants._storages", {}),
+            ("app.tenants._ledgers", {}),
+        ):
+            patcher = mock.patch(alvo, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.servidor.token = "token-servidor"
+        self.servidor.tokens_tenants = {
+            "token-acme": ["acme"],
+            "token-beta": ["beta"],
+            "token-admin": ["*"],
+        }
+
+    @staticmethod
+    def _acesso(token: str, tenant: str = None) -> dict:
+        cabecalhos = {"Authorization": f"Bearer {token}"}
+        if tenant:
+            cabecalhos["X-Tenant"] = tenant
+        return cabecalhos
+
+    def test_importa_sem_api_key(self):
+        ambiente = {
+            chave: valor
+            for chave, valor in os.environ.items()
+            if chave != "GEMINI_API_KEY"
+        }
+        processo = subprocess.run(
+            [sys.executable, "-c", "import app.api, app.ui"],
+            cwd=DIRETORIO_RAIZ,
+            env=ambiente,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(processo.returncode, 0, processo.stderr)
+
+    def test_cadastra_e_verifica(self):
+        status, corpo = self._cadastrar("aluguel")
+        self.assertEqual(status, 201, corpo)
+        self.assertEqual(corpo["conta"]["numero_boletos_base"], 2)
+
+        status, corpo = self._post(
+            "/verificacoes",
+            {
+                "apelido_conta": "aluguel",
+                "conteudo_base64": _base64_amostra("bem-estar-jul.pdf"),
+            },
+        )
+        self.assertEqual(status, 200, corpo)
+        self.assertEqual(corpo["resultado"]["recomendacao"], "PAGAR")
+        self.assertGreater(self.cliente.chamadas["generate_content"], 0)
+
+    def test_conta_inexistente(self):
+        status, corpo = self._post(
+            "/verificacoes",
+            {
+                "apelido_conta": "inexistente",
+                "conteudo_base64": _base64_amostra("bem-estar-jul.pdf"),
+            },
+        )
+        self.assertEqual(status, 404, corpo)
+        self.assertEqual(corpo["codigo_erro"], "conta_nao_encontrada")
+
+    def test_bloqueio_vale_so_para_a_conta_que_reprovou(self):
+        self.cliente.dados_boleto = {
+            **BOLETO_FALSO,
+            "documento_beneficiario": "98.765.432/0001-10",
+        }
+        status, corpo = self._cadastrar("conta-a", ("1.png", "2.png"))
+        self.assertEqual(status, 201, corpo)
+        self.cliente.dados_boleto = BOLETO_FALSO
+        status, corpo = self._cadastrar("conta-b")
+        self.assertEqual(status, 201, corpo)
+
+        corpo_verificacao = {"conteudo_base64": _base64_amostra("3.png")}
+        status, corpo = self._post(
+            "/verificacoes", {**corpo_verificacao, "apelido_conta": "conta-a"}
+        )
+        self.assertEqual(corpo["resultado"]["recomendacao"], "NAO_PAGAR")
+
+        # O mesmo arquivo, contra a conta certa, não herda o bloqueio da outra
+        status, corpo = self._post(
+            "/verificacoes", {**corpo_verificacao, "apelido_conta": "conta-b"}
+        )
+        self.assertEqual(status, 200, corpo)
+        self.assertIsNone(corpo["etapa_decisiva"])
+        self.assertEqual(corpo["resultado"]["recomendacao"], "PAGAR")
+
+    def test_reimpressao_de_boleto_de_outra_conta_nao_chama_a_ia(self):
+        with open(os.path.join(AMOSTRAS, "bem-estar-fake.pdf"), "rb") as f:
+            original = f.read()
+        self.cliente.dados_boleto = {
+            **BOLETO_FALSO,
+            "linha_digitavel": "34195175230000001556078001234562110082000003507",
+        }
+        status, corpo = self._cadastrar("conta-a", ("bem-estar-fake.pdf", "1.png"))
+        self.assertEqual(status, 201, corpo)
+        uploads = self.cliente.chamadas["upload"]
+
+        # Mesmo boleto em outro arquivo (bytes diferentes, mesma linha digitável)
+        reimpressao = original + b"\n% reimpressao\n"
+        status, corpo = self._post(
+            "/contas",
+            {
+                "apelido_conta": "conta-b",
+                "boletos": [
+                    {
+                        "nome_arquivo": "reimpressao.pdf",
+                        "conteudo_base64": base64.b64encode(reimpressao).decode(),
+                    },
+                    {
+                        "nome_arquivo": "2.png",
+                        "conteudo_base64": _base64_amostra("2.png"),
+                    },
+                ],
+            },
+        )
+        self.assertEqual(status, 201, corpo)
+        self.assertEqual(self.cliente.chamadas["upload"], uploads + 1)
+        self.assertEqual([d["duplicado_de"] for d in corpo["duplicados"]], ["conta-a"])
+
+    def test_campos_opcionais_nulos_nas_referencias(self):
+        self.cliente.dados_boleto = {**BOLETO_FALSO, "agencia_codigo_cedente": None}
+        status, corpo = self._cadastrar("aluguel")
+        self.assertEqual(status, 201, corpo)
+
+        status, corpo = self._post(
+            "/verificacoes",
+            {
+                "apelido_conta": "aluguel",
+                "conteudo_base64": _base64_amostra("3.png"),
+            },
+        )
+        self.assertEqual(status, 200, corpo)
+        self.assertEqual(corpo["resultado"]["recomendacao"], "PAGAR")
+
+    def test_campos_invalidos_apos_todos_os_modelos(self):
+        status, corpo = self._cadastrar("aluguel")
+        self.assertEqual(status, 201, corpo)
+
+        # Linha digitável com dígito verificador errado em todas as respostas
+        self.cliente.dados_boleto = {
+            **BOLETO_FALSO,
+            "linha_digitavel": BOLETO_FALSO["linha_digitavel"][:-1] + "1",
+        }
+        status, corpo = self._post(
+            "/verificacoes",
+            {
+                "apelido_conta": "aluguel",
+                "conteudo_base64": _base64_amostra("bem-estar-ago.pdf"),
+            },
+        )
+        self.assertEqual(status, 200, corpo)
+        self.assertIn("linha_digitavel", corpo["campos_invalidos"])
+        self.assertEqual(corpo["resultado"]["recomendacao"], "VERIFICAR_MANUALMENTE")
+
+    def test_tenant_nao_le_outro_tenant(self):
+        self._ativar_tenants()
+        status, corpo = self._cadastrar(
+            "aluguel", cabecalhos=self._acesso("token-acme", "acme")
+        )
+        self.assertEqual(status, 201, corpo)
+
+        status, corpo = self._get("/contas", self._acesso("token-acme", "acme"))
+        self.assertEqual(status, 200, corpo)
+        self.assertEqual([c["apelido_conta"] for c in corpo["contas"]], ["aluguel"])
+
+        # Token de outra empresa: nem as contas, nem o ledger, nem a partição padrão
+        status, corpo = self._get("/contas", self._acesso("token-beta", "acme"))
+        self.assertEqual(status, 403, corpo)
+        status, corpo = self._post(
+            "/verificacoes",
+            {
+                "apelido_conta": "aluguel",
+                "conteudo_base64": _base64_amostra("bem-estar-jul.pdf"),
+            },
+            self._acesso("token-beta", "acme"),
+        )
+        self.assertEqual(status, 403, corpo)
+        status, corpo = self._get("/contas", self._acesso("token-beta"))
+        self.assertEqual(status, 403, corpo)
+        status, corpo = self._get("/contas", self._acesso("token-invalido", "acme"))
+        self.assertEqual(status, 401, corpo)
+
+        status, corpo = self._get("/contas", self._acesso("token-servidor"))
+        self.assertEqual((status, corpo["contas"]), (200, []))
+
+    def test_consulta_de_tenant_desconhecido_nao_cria_particao(self):
+        self._ativar_tenants()
+        status, corpo = self._get("/contas", self._acesso("token-admin", "acme-typo"))
+        self.assertEqual(status, 404, corpo)
+        status, corpo = self._get("/contas", self._acesso("token-beta", "beta"))
+        self.assertEqual(status, 404, corpo)
+        self.assertFalse(os.path.exists(self.diretorio_tenants))
+
+        # A partição nasce com a primeira conta
+        status, corpo = self._cadastrar(
+            "aluguel", cabecalhos=self._acesso("token-beta", "beta")
+        )
+        self.assertEqual(status, 201, corpo)
+        self.assertEqual(os.listdir(self.diretorio_tenants), ["beta"])
+
+    def test_resposta_antecipada_consome_o_corpo(self):
+        conexao = http.client.HTTPConnection(
+            "127.0.0.1", self.servidor.server_address[1]
+        )
+        try:
+            conexao.request("POST", "/naoexiste", body=json.dumps({"a": 1}))
+            resposta = conexao.getresponse()
+            resposta.read()
+            self.assertEqual(resposta.status, 404)
+
+            # Mesma conexão keep-alive: o corpo anterior não vira a próxima requisição
+            conexao.request("GET", "/saude")
+            resposta = conexao.getresponse()
+            self.assertEqual(resposta.status, 200)
+            self.assertEqual(json.load(resposta)["status"], "ok")
+        finally:
+            conexao.close()
+
+    def test_corpo_acima_do_limite(self):
+        self.servidor.max_corpo = 1024
+        status, corpo = self._post(
+            "/verificacoes", {"apelido_conta": "aluguel", "conteudo_base64": "A" * 2048}
+        )
+        self.assertEqual(status, 413, corpo)
+
+    def test_servidor_saturado_responde_503(self):
+        status, corpo = self._cadastrar("aluguel")
+        self.assertEqual(status, 201, corpo)
+
+        # A primeira verificação ocupa a única vaga por 1 s; a segunda não espera
+        self.cliente.latencia = 1.0
+        corpo_verificacao = {
+            "apelido_conta": "aluguel",
+            "conteudo_base64": _base64_amostra("bem-estar-ago.pdf"),
+        }
+        while not self.servidor.vagas._value:
+            time.sleep(0.01)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            primeira = executor.submit(self._post, "/verificacoes", corpo_verificacao)
+            while self.servidor.vagas._value:
+                time.sleep(0.01)
+            status, corpo = self._post("/verificacoes", corpo_verificacao)
+            self.assertEqual(status, 503, corpo)
+            self.assertEqual(primeira.result()[0], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Testes da divisão de carnês em um arquivo por boleto
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import ctypes
+import io
+import os
+import unittest
+
+import pypdfium2
+import pypdfium2.raw as pdfium_c
+from PIL import Image
+
+from app.carne import dividir_carne
+from tests.test_preprocessamento import _digitalizacao
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AMOSTRAS = os.path.join(DIRETORIO_RAIZ, "samples")
+
+LINHA_FAKE = "34195175230000001556078001234562110082000003507"
+# Outra linha válida do mesmo beneficiário (outra parcela do carnê)
+LINHA_PARCELA = "34195175230000001556008001234569110082000003507"
+
+
+def _amostra(nome: str) -> bytes:
+    with open(os.path.join(AMOSTRAS, nome), "rb") as f:
+        return f.read()
+
+
+def _pdf_com_texto(paginas) -> bytes:
+    """PDF A4 com uma lista de (distância do topo em pt, texto) por página"""
+    documento = pypdfium2.PdfDocument.new()
+    try:
+        for linhas in paginas:
+            pagina = documento.new_page(595, 842)
+            for topo, texto in linhas:
+                objeto = pdfium_c.FPDFPageObj_NewTextObj(
+                    documento.raw, b"Helvetica", ctypes.c_float(10)
+                )
+                utf16 = ctypes.create_string_buffer((texto + "\0").encode("utf-16-le"))
+                pdfium_c.FPDFText_SetText(
+                    objeto, ctypes.cast(utf16, ctypes.POINTER(pdfium_c.FPDF_WCHAR))
+                )
+                pdfium_c.FPDFPageObj_Transform(objeto, 1, 0, 0, 1, 50, 842 - topo)
+                pdfium_c.FPDFPage_InsertObject(pagina.raw, objeto)
+            pagina.gen_content()
+        saida = io.BytesIO()
+        documento.save(saida)
+        return saida.getvalue()
+    finally:
+        documento.close()
+
+
+def _numero_paginas(arquivo_pdf_bytes: bytes) -> int:
+    documento = pypdfium2.PdfDocument(arquivo_pdf_bytes)
+    try:
+        return len(documento)
+    finally:
+        documento.close()
+
+
+class TesteCarne(unittest.TestCase):
+    def test_digitalizacao_dividida_por_pagina(self):
+        partes = dividir_carne(_digitalizacao("1.png", "2.png", "3.png"))
+
+        self.assertEqual([parte["pagina"] for parte in partes], [1, 2, 3])
+        for parte in partes:
+            self.assertIsNone(parte["regiao"])
+            self.assertEqual(parte["linhas_digitaveis"], [])
+            self.assertEqual(_numero_paginas(parte["arquivo_bytes"]), 1)
+
+    def test_carne_com_uma_pagina_por_boleto(self):
+        partes = dividir_carne(
+            _pdf_com_texto(
+                [[(100, "Instruções")], [(100, LINHA_FAKE)], [(100, LINHA_PARCELA)]]
+            )
+        )
+
+        self.assertEqual([parte["pagina"] for parte in partes], [2, 3])
+        self.assertEqual(
+            [parte["linhas_digitaveis"] for parte in partes],
+            [[LINHA_FAKE], [LINHA_PARCELA]],
+        )
+        self.assertTrue(all(parte["arquivo_bytes"][:5] == b"%PDF-" for parte in partes))
+
+    def test_pagina_com_varios_boletos_recortada(self):
+        partes = dividir_carne(
+            _pdf_com_texto([[(100, LINHA_FAKE), (500, LINHA_PARCELA)]])
+        )
+
+        self.assertEqual(
+            [(parte["pagina"], parte["regiao"]) for parte in partes], [(1, 1), (1, 2)]
+        )
+        self.assertEqual(
+            [parte["linhas_digitaveis"] for parte in partes],
+            [[LINHA_FAKE], [LINHA_PARCELA]],
+        )
+        for parte in partes:
+            with Image.open(io.BytesIO(parte["arquivo_bytes"])) as imagem:
+                self.assertEqual(imagem.format, "JPEG")
+
+    def test_digitalizacao_de_uma_pagina_segue_inteira(self):
+        arquivo = _digitalizacao("1.png")
+        (parte,) = dividir_carne(arquivo)
+        self.assertEqual(parte["arquivo_bytes"], arquivo)
+        self.assertEqual(parte["linhas_digitaveis"], [])
+
+    def test_boleto_unico_traz_a_linha_lida(self):
+        arquivo = _amostra("bem-estar-fake.pdf")
+        (parte,) = dividir_carne(arquivo)
+        self.assertEqual(parte["arquivo_bytes"], arquivo)
+        self.assertEqual(parte["linhas_digitaveis"], [LINHA_FAKE])
+
+    def test_imagem_segue_inteira_sem_leitura(self):
+        arquivo = _amostra("1.png")
+        (parte,) = dividir_carne(arquivo)
+        self.assertEqual(parte["arquivo_bytes"], arquivo)
+        self.assertIsNone(parte["linhas_digitaveis"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Testes do ledger de verificações
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from app.ledger import LedgerVerificacoes
+
+FRAUDE = {"eh_fraudulento": True, "recomendacao": "NAO_PAGAR", "nivel_confianca": 0.9}
+LEGITIMO = {"eh_fraudulento": False, "recomendacao": "PAGAR", "nivel_confianca": 0.9}
+LINHA = "34195175230000001556078001234562110082000003507"
+
+
+class TesteLedger(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.diretorio.name, "verificacoes.db")
+        self.ledger = LedgerVerificacoes(self.arquivo)
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def _registrar_em(self, data: datetime, *args, **kwargs):
+        with mock.patch("app.ledger.datetime") as relogio:
+            relogio.now.return_value = data
+            self.assertTrue(self.ledger.registrar_verificacao(*args, **kwargs))
+
+    def test_registros_nao_podem_ser_alterados(self):
+        self.ledger.registrar_verificacao("h1", "aluguel", FRAUDE)
+        with self.assertRaisesRegex(sqlite3.DatabaseError, "append-only"):
+            self.ledger._conexao().execute(
+                "UPDATE verificacoes SET recomendacao = 'PAGAR'"
+            )
+        self.assertEqual(
+            self.ledger.buscar_por_hash("h1")[0]["recomendacao"], "NAO_PAGAR"
+        )
+
+    def test_bloqueio_so_na_conta_que_reprovou(self):
+        self.ledger.registrar_verificacao("h1", "aluguel", FRAUDE)
+        self.ledger.registrar_verificacao("h2", "aluguel", LEGITIMO)
+
+        bloqueio = self.ledger.buscar_bloqueio("h1", "aluguel")
+        self.assertEqual(
+            (bloqueio["hash_pdf"], bloqueio["eh_fraudulento"]), ("h1", True)
+        )
+        self.assertIsNone(self.ledger.buscar_bloqueio("h1", "condominio"))
+        self.assertIsNone(self.ledger.buscar_bloqueio("h2", "aluguel"))
+
+    def test_busca_pela_linha_digitavel_formatada(self):
+        self.ledger.registrar_verificacao(
+            "h1", "aluguel", LEGITIMO, dados_boleto={"linha_digitavel": LINHA}
+        )
+        self.ledger.registrar_verificacao(
+            "h2", "condominio", FRAUDE, dados_boleto={"linha_digitavel": LINHA}
+        )
+
+        formatada = "34195.17523 00000.015560 78001.234562 1 10082000003507"
+        self.assertEqual(
+            [r["hash_pdf"] for r in self.ledger.buscar_por_linha_digitavel(formatada)],
+            ["h2", "h1"],
+        )
+        (registro,) = self.ledger.buscar_por_linha_digitavel(LINHA, "aluguel")
+        self.assertEqual(registro["dados_boleto"]["linha_digitavel"], LINHA)
+        self.assertEqual(self.ledger.buscar_por_linha_digitavel("123"), [])
+
+    def test_taxa_de_fraude_por_conta_e_mes(self):
+        self._registrar_em(datetime(2024, 1, 5), "h1", "aluguel", FRAUDE)
+        self._registrar_em(datetime(2024, 1, 20), "h2", "aluguel", LEGITIMO)
+        self._registrar_em(datetime(2024, 2, 1), "h3", "aluguel", LEGITIMO)
+        self._registrar_em(datetime(2024, 1, 9), "h4", "condominio", FRAUDE)
+
+        self.assertEqual(
+            [
+                (t["apelido_conta"], t["mes"], t["fraudes"], t["total"])
+                for t in self.ledger.taxa_fraude_por_conta_mes()
+            ],
+            [
+                ("aluguel", "2024-01", 1, 2),
+                ("aluguel", "2024-02", 0, 1),
+                ("condominio", "2024-01", 1, 1),
+            ],
+        )
+        (taxa,) = self.ledger.taxa_fraude_por_conta_mes(
+            "aluguel", desde=datetime(2024, 1, 1), ate=datetime(2024, 2, 1)
+        )
+        self.assertEqual(taxa["taxa_fraude"], 0.5)
+
+    def test_retencao_remove_antigos_e_compacta(self):
+        agora = datetime.now()
+        self._registrar_em(datetime(2020, 1, 1), "antigo", "aluguel", FRAUDE)
+        self._registrar_em(agora, "recente", "aluguel", LEGITIMO)
+
+        self.assertEqual(self.ledger.aplicar_retencao(dias=30), 1)
+        self.ledger.compactar()
+
+        self.assertEqual(self.ledger.buscar_por_hash("antigo"), [])
+        self.assertEqual(len(self.ledger.buscar_por_hash("recente")), 1)
+        self.assertEqual(os.path.getsize(f"{self.arquivo}-wal"), 0)
+
+    def test_vereditos_reaproveitados_fora_da_taxa(self):
+        self.ledger.registrar_verificacao("h1", "aluguel", FRAUDE)
+        for etapa in ("duplicado", "bloqueio"):
+            self.ledger.registrar_verificacao(
+                "h1", "aluguel", FRAUDE, etapa_decisiva=etapa
+            )
+        self.ledger.registrar_verificacao(
+            "h2",
+            "aluguel",
+            {"eh_fraudulento": False, "recomendacao": "PAGAR"},
+            etapa_decisiva="texto_local",
+        )
+
+        (taxa,) = self.ledger.taxa_fraude_por_conta_mes()
+        self.assertEqual((taxa["total"], taxa["fraudes"]), (2, 1))
+        self.assertEqual(
+            [r["etapa_decisiva"] for r in self.ledger.buscar_por_hash("h1")],
+            ["bloqueio", "duplicado", None],
+        )
+
+    def test_migra_ledger_sem_etapa_decisiva(self):
+        antigo = os.path.join(self.diretorio.name, "antigo.db")
+        conexao = sqlite3.connect(antigo)
+        conexao.execute("""
+            CREATE TABLE verificacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_verificacao TEXT NOT NULL,
+                hash_pdf TEXT NOT NULL,
+                apelido_conta TEXT NOT NULL,
+                eh_fraudulento INTEGER NOT NULL,
+                recomendacao TEXT NOT NULL,
+                nivel_confianca REAL,
+                modelo TEXT,
+                tempos_etapas TEXT,
+                resultado TEXT,
+                dados_boleto TEXT
+            )
+            """)
+        conexao.execute(
+            "CREATE INDEX idx_verificacoes_conta_data "
+            "ON verificacoes (apelido_conta, data_verificacao, eh_fraudulento)"
+        )
+        conexao.execute(
+            "INSERT INTO verificacoes (data_verificacao, hash_pdf, apelido_conta, "
+            "eh_fraudulento, recomendacao) VALUES ('2024-01-10', 'h0', 'aluguel', 1, "
+            "'NAO_PAGAR')"
+        )
+        conexao.commit()
+        conexao.close()
+
+        ledger = LedgerVerificacoes(antigo)
+        ledger.registrar_verificacao(
+            "h0", "aluguel", FRAUDE, etapa_decisiva="duplicado"
+        )
+        self.assertEqual(
+            [(t["mes"], t["total"]) for t in ledger.taxa_fraude_por_conta_mes()],
+            [("2024-01", 1)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
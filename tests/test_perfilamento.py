@@ -0,0 +1,116 @@
+"""
+Testes do perfilamento de execuções (cProfile + tracemalloc)
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import json
+import os
+import tempfile
+import threading
+import tracemalloc
+import unittest
+from unittest import mock
+
+from app.perfilamento import (
+    ExecucaoPerfilada,
+    listar_execucoes_mais_lentas,
+    perfilar,
+)
+
+
+def _resumos(diretorio: str):
+    resumos = []
+    for nome in sorted(os.listdir(diretorio)):
+        if nome.endswith(".json"):
+            with open(os.path.join(diretorio, nome), encoding="utf-8") as f:
+                resumos.append(json.load(f))
+    return resumos
+
+
+class TestePerfilamento(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_desligado_devolve_contexto_nulo(self):
+        with mock.patch("app.perfilamento.PERFILAMENTO_ATIVO", False):
+            self.assertIs(perfilar("rerun"), perfilar("lote"))
+            with perfilar("rerun"):
+                pass
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_grava_perfil_e_resumo(self):
+        with ExecucaoPerfilada("lote", self.diretorio.name) as execucao:
+            dados = [bytearray(1024) for _ in range(256)]
+        del dados
+
+        self.assertFalse(tracemalloc.is_tracing())
+        caminho_base = os.path.join(self.diretorio.name, execucao.identificador)
+        self.assertTrue(os.path.exists(f"{caminho_base}.prof"))
+        (resumo,) = _resumos(self.diretorio.name)
+        self.assertEqual(resumo["nome"], "lote")
+        self.assertTrue(resumo["cprofile"])
+        self.assertIsNone(resumo["excecao"])
+        self.assertTrue(resumo["top_funcoes"])
+        self.assertGreaterEqual(resumo["top_alocacoes"][0]["tamanho_kb"], 256)
+
+    def test_excecao_registrada_e_propagada(self):
+        with self.assertRaises(KeyError):
+            with ExecucaoPerfilada("rerun", self.diretorio.name):
+                raise KeyError("falha")
+
+        (resumo,) = _resumos(self.diretorio.name)
+        self.assertEqual(resumo["excecao"], "KeyError")
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_execucoes_simultaneas_dividem_o_cprofile(self):
+        dentro = threading.Barrier(4)
+
+        def executar():
+            with ExecucaoPerfilada("lote", self.diretorio.name):
+                dentro.wait()
+                dentro.wait()
+
+        threads = [threading.Thread(target=executar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        resumos = _resumos(self.diretorio.name)
+        self.assertEqual(len(resumos), 4)
+        self.assertEqual(sum(resumo["cprofile"] for resumo in resumos), 1)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_lista_as_mais_lentas(self):
+        for nome, duracao in (("rerun", 0.2), ("lote", 3.0), ("rerun", 1.5)):
+            caminho = os.path.join(self.diretorio.name, f"{nome}-{duracao}.json")
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump({"nome": nome, "duracao": duracao}, f)
+        with open(os.path.join(self.diretorio.name, "parcial.json"), "w") as f:
+            f.write("{")
+
+        self.assertEqual(
+            [
+                r["duracao"]
+                for r in listar_execucoes_mais_lentas(diretorio=self.diretorio.name)
+            ],
+            [3.0, 1.5, 0.2],
+        )
+        self.assertEqual(
+            [
+                r["duracao"]
+                for r in listar_execucoes_mais_lentas(
+                    limite=1, nome="rerun", diretorio=self.diretorio.name
+                )
+            ],
+            [1.5],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
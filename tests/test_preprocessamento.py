@@ -0,0 +1,68 @@
+"""
+Testes do pré-processamento de arquivos antes do envio ao Gemini
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import io
+import os
+import unittest
+
+from PIL import Image
+
+from app.preprocessamento import (
+    _montar_pdf_jpeg,
+    _rasterizar_pdf_sem_texto,
+    preparar_arquivo_envio,
+    reduzir_imagem,
+)
+from config.settings import PREPROCESSAMENTO_MAX_BYTES
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AMOSTRAS = os.path.join(DIRETORIO_RAIZ, "samples")
+
+
+def _amostra(nome: str) -> bytes:
+    with open(os.path.join(AMOSTRAS, nome), "rb") as f:
+        return f.read()
+
+
+def _digitalizacao(*nomes: str) -> bytes:
+    """PDF só com imagem, uma página por amostra (como um scanner produziria)"""
+    paginas = []
+    for nome in nomes:
+        with Image.open(io.BytesIO(_amostra(nome))) as imagem:
+            saida = io.BytesIO()
+            imagem.convert("RGB").save(saida, format="JPEG", quality=95)
+            paginas.append(saida.getvalue())
+    return _montar_pdf_jpeg(paginas)
+
+
+class TestePreprocessamento(unittest.TestCase):
+    def test_pdf_com_texto_segue_intacto(self):
+        original = _amostra("bem-estar-fake.pdf")
+        self.assertIsNone(_rasterizar_pdf_sem_texto(original))
+        self.assertEqual(
+            preparar_arquivo_envio(original), (original, ".pdf", "application/pdf")
+        )
+
+    def test_digitalizacao_rasterizada_por_pagina(self):
+        paginas = _rasterizar_pdf_sem_texto(_digitalizacao("1.png", "2.png"))
+        self.assertEqual(len(paginas), 2)
+        self.assertTrue(all(pagina.mode == "L" for pagina in paginas))
+
+    def test_imagem_reduzida_para_jpeg_em_tons_de_cinza(self):
+        with Image.open(io.BytesIO(_amostra("6.png"))) as imagem:
+            reduzido = reduzir_imagem(imagem)
+        self.assertLessEqual(len(reduzido), PREPROCESSAMENTO_MAX_BYTES)
+        with Image.open(io.BytesIO(reduzido)) as imagem:
+            self.assertEqual((imagem.format, imagem.mode), ("JPEG", "L"))
+
+    def test_formato_nao_suportado(self):
+        with self.assertRaises(ValueError):
+            preparar_arquivo_envio(b"GIF89a")
+
+
+if __name__ == "__main__":
+    unittest.main()
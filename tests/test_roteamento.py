@@ -0,0 +1,89 @@
+"""
+Testes do roteamento entre modelos de extração
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import unittest
+from unittest import mock
+
+from app.roteamento import RoteadorModelos
+
+
+class TesteRoteadorModelos(unittest.TestCase):
+    def setUp(self):
+        self.agora = 1000.0
+        relogio = mock.patch(
+            "app.roteamento.time.monotonic", side_effect=lambda: self.agora
+        )
+        relogio.start()
+        self.addCleanup(relogio.stop)
+        self.roteador = RoteadorModelos(
+            ["rapido", "medio", "robusto"],
+            janela=10,
+            minimo_amostras=3,
+            limite_taxa_erro=0.5,
+            limite_latencia=10,
+            intervalo_sonda=60,
+        )
+
+    def _falhar(self, modelo: str, vezes: int = 3):
+        for _ in range(vezes):
+            self.roteador.ordem_tentativas()
+            self.roteador.registrar(modelo, 1.0, erro=True)
+
+    def test_ordem_por_nivel(self):
+        self.assertEqual(
+            self.roteador.ordem_tentativas(), ["rapido", "medio", "robusto"]
+        )
+
+    def test_poucas_amostras_nao_rebaixam(self):
+        self._falhar("rapido", vezes=2)
+        self.assertEqual(self.roteador.ordem_tentativas()[0], "rapido")
+
+    def test_rebaixa_por_taxa_de_erro(self):
+        self._falhar("rapido")
+        self.assertEqual(
+            self.roteador.ordem_tentativas(), ["medio", "robusto", "rapido"]
+        )
+        self.assertTrue(self.roteador.obter_estatisticas()["rapido"]["degradado"])
+
+    def test_rebaixa_por_latencia(self):
+        for _ in range(3):
+            self.roteador.ordem_tentativas()
+            self.roteador.registrar("medio", 30.0, erro=False)
+        self.assertEqual(
+            self.roteador.ordem_tentativas(), ["rapido", "robusto", "medio"]
+        )
+
+    def test_sonda_bem_sucedida_devolve_o_modelo(self):
+        self._falhar("rapido")
+        self.roteador.ordem_tentativas()
+
+        self.agora += 61
+        self.assertEqual(self.roteador.ordem_tentativas()[0], "rapido")
+        # Enquanto a sonda não responde, os demais pedidos seguem sem o modelo
+        self.assertEqual(self.roteador.ordem_tentativas()[-1], "rapido")
+
+        self.roteador.registrar("rapido", 1.0, erro=False)
+        self.assertEqual(self.roteador.ordem_tentativas()[0], "rapido")
+        estatisticas = self.roteador.obter_estatisticas()["rapido"]
+        self.assertEqual(estatisticas["chamadas"], 1)
+        self.assertFalse(estatisticas["degradado"])
+
+    def test_sonda_com_falha_mantem_o_rebaixamento(self):
+        self._falhar("rapido")
+        self.agora += 61
+        self.roteador.ordem_tentativas()
+        self.roteador.registrar("rapido", 1.0, erro=True)
+
+        self.assertEqual(self.roteador.ordem_tentativas()[-1], "rapido")
+        self.agora += 30
+        self.assertEqual(self.roteador.ordem_tentativas()[-1], "rapido")
+        self.agora += 31
+        self.assertEqual(self.roteador.ordem_tentativas()[0], "rapido")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Testes do storage de contas de referência
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app.storage import ContaJaExistente, ContaReferenciaStorage
+from tests.gemini_falso import BOLETO_FALSO
+
+
+def _boletos(nome_beneficiario: str):
+    return [
+        {**BOLETO_FALSO, "nome_beneficiario": nome_beneficiario, "nosso_numero": n}
+        for n in ("1", "2")
+    ]
+
+
+class TesteStorage(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.storage = ContaReferenciaStorage(
+            os.path.join(self.diretorio.name, "contas_referencia.json")
+        )
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_nao_sobrescreve_conta_existente(self):
+        self.assertTrue(
+            self.storage.salvar_conta_referencia("aluguel", _boletos("PRIMEIRA"))
+        )
+        with self.assertRaises(ContaJaExistente):
+            self.storage.salvar_conta_referencia("aluguel", _boletos("SEGUNDA"))
+        self.assertEqual(
+            self.storage.obter_conta_referencia("aluguel")["nome_beneficiario"],
+            "PRIMEIRA",
+        )
+
+    def test_cadastros_simultaneos_com_o_mesmo_nome(self):
+        largada = threading.Barrier(8)
+        salvas, recusadas = [], []
+
+        def cadastrar(indice: int):
+            largada.wait()
+            try:
+                self.storage.salvar_conta_referencia("aluguel", _boletos(str(indice)))
+                salvas.append(str(indice))
+            except ContaJaExistente:
+                recusadas.append(str(indice))
+
+        threads = [threading.Thread(target=cadastrar, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(salvas), 1)
+        self.assertEqual(len(recusadas), 7)
+        self.assertEqual(
+            self.storage.obter_conta_referencia("aluguel")["nome_beneficiario"],
+            salvas[0],
+        )
+
+    def test_releitura_apenas_quando_o_arquivo_muda(self):
+        self.storage.salvar_conta_referencia("aluguel", _boletos("PRIMEIRA"))
+        # Outra instância sobre o mesmo arquivo, como a de outro processo
+        outro = ContaReferenciaStorage(self.storage.arquivo_storage)
+        outro.conta_existe("aluguel")
+
+        with mock.patch("app.storage.json.load", wraps=json.load) as leitura:
+            for _ in range(5):
+                self.storage.obter_conta_referencia("aluguel")
+                self.storage.conta_existe("aluguel")
+            self.assertEqual(leitura.call_count, 0)
+
+            outro.salvar_conta_referencia("luz", _boletos("SEGUNDA"))
+            self.assertTrue(self.storage.conta_existe("luz"))
+            self.assertEqual(leitura.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
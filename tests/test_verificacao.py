@@ -0,0 +1,140 @@
+"""
+Testes offline do pipeline de verificação, com o Gemini substituído pelo
+ClienteGeminiFalso
+
+Uso:
+    python -m unittest discover -s tests -t .
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app.gemini_integration import configurar_cliente
+from app.ledger import LedgerVerificacoes
+from app.storage import ContaReferenciaStorage
+from app.verificacao import (
+    cadastrar_conta_referencia,
+    verificar_boleto,
+    verificar_carne,
+)
+from tests.gemini_falso import BOLETO_FALSO, ClienteGeminiFalso
+from tests.test_preprocessamento import _digitalizacao
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AMOSTRAS = os.path.join(DIRETORIO_RAIZ, "samples")
+
+
+def _amostra(nome: str) -> bytes:
+    with open(os.path.join(AMOSTRAS, nome), "rb") as f:
+        return f.read()
+
+
+class TesteVerificacao(unittest.TestCase):
+    def setUp(self):
+        self.cliente = ClienteGeminiFalso(variar_nosso_numero=True)
+        configurar_cliente(self.cliente)
+
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.storage = ContaReferenciaStorage(
+            os.path.join(self.diretorio.name, "contas_referencia.json")
+        )
+        self.ledger = LedgerVerificacoes(
+            os.path.join(self.diretorio.name, "verificacoes.db")
+        )
+        resultado, sucesso = cadastrar_conta_referencia(
+            "aluguel",
+            [(_amostra(nome), nome) for nome in ("1.png", "2.png")],
+            storage_contas=self.storage,
+        )
+        self.assertTrue(sucesso, resultado)
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def _verificar(self, arquivo_bytes: bytes):
+        verificacao, sucesso = verificar_boleto(
+            "aluguel",
+            arquivo_bytes,
+            storage_contas=self.storage,
+            ledger_verificacoes=self.ledger,
+        )
+        self.assertTrue(sucesso, verificacao)
+        return verificacao
+
+    def test_etapas_canceladas_terminam_antes_do_registro(self):
+        self._verificar(_amostra("3.png"))
+
+        # Repetição decidida pelo ledger enquanto outras etapas ainda rodariam
+        self.cliente.latencia = 0.5
+        verificacao = self._verificar(_amostra("3.png"))
+        self.assertEqual(verificacao["etapa_decisiva"], "duplicado")
+
+        tempos_devolvidos = dict(verificacao["tempos_etapas"])
+        time.sleep(0.6)
+        self.assertEqual(verificacao["tempos_etapas"], tempos_devolvidos)
+        registro = self.ledger.buscar_por_hash(verificacao["hash_pdf"])[0]
+        self.assertEqual(registro["tempos_etapas"], tempos_devolvidos)
+
+    def test_reimpressao_verificada_nao_chama_a_ia(self):
+        self.cliente.dados_boleto = {
+            **BOLETO_FALSO,
+            "codigo_banco_emissor": "341-7",
+            "linha_digitavel": "34195175230000001556078001234562110082000003507",
+        }
+        resultado, sucesso = cadastrar_conta_referencia(
+            "itau",
+            [(_amostra(nome), nome) for nome in ("4.png", "5.png")],
+            storage_contas=self.storage,
+        )
+        self.assertTrue(sucesso, resultado)
+
+        original = _amostra("bem-estar-fake.pdf")
+        verificacao, sucesso = verificar_boleto(
+            "itau",
+            original,
+            storage_contas=self.storage,
+            ledger_verificacoes=self.ledger,
+        )
+        self.assertTrue(sucesso, verificacao)
+        self.assertIsNone(verificacao["etapa_decisiva"])
+        chamadas = dict(self.cliente.chamadas)
+
+        # Mesmo boleto em outro arquivo (bytes diferentes, mesma linha digitável)
+        verificacao, sucesso = verificar_boleto(
+            "itau",
+            original + b"\n% reimpressao\n",
+            storage_contas=self.storage,
+            ledger_verificacoes=self.ledger,
+        )
+        self.assertTrue(sucesso, verificacao)
+        self.assertEqual(verificacao["etapa_decisiva"], "duplicado")
+        self.assertEqual(dict(self.cliente.chamadas), chamadas)
+
+    def _verificar_carne(self, arquivo_bytes: bytes):
+        verificacao, sucesso = verificar_carne(
+            "aluguel",
+            arquivo_bytes,
+            storage_contas=self.storage,
+            ledger_verificacoes=self.ledger,
+        )
+        self.assertTrue(sucesso, verificacao)
+        return verificacao["verificacoes"]
+
+    def test_carne_digitalizado_verificado_por_pagina(self):
+        verificacoes = self._verificar_carne(_digitalizacao("3.png", "6.png"))
+        self.assertEqual([v["pagina"] for v in verificacoes], [1, 2])
+        self.assertTrue(all(v["sucesso"] for v in verificacoes))
+
+    def test_carne_le_o_pdf_uma_unica_vez(self):
+        with mock.patch("app.verificacao.extrair_linhas_digitaveis_pdf") as leitura:
+            (verificacao,) = self._verificar_carne(_amostra("bem-estar-fake.pdf"))
+        leitura.assert_not_called()
+        self.assertTrue(verificacao["sucesso"], verificacao)
+        self.assertNotIn("texto_local", verificacao["tempos_etapas"])
+
+
+if __name__ == "__main__":
+    unittest.main()